@@ -0,0 +1 @@
+"""Offline benchmarks and the local WeatherAPI/Unsplash stub server they run against."""
@@ -0,0 +1,181 @@
+"""Rerun timings against a real ``streamlit run`` server, fragment reruns included.
+
+Usage::
+
+    python -m bench.live_rerun --rounds 20
+
+``AppTest`` always re-executes the whole script, so it cannot see what
+``@st.fragment`` saves. This harness starts the app against
+``bench.stub_server`` and speaks the browser's websocket protocol. Like the
+frontend, it sends a fragment-scoped rerun when a widget inside a fragment
+changes. After one search it times idle reruns and theme and language toggles.
+For each it reports:
+
+* wall: from sending the rerun request to the final ``script_finished``
+  message. This includes the server's message flushing.
+* exec: script execution time as reported in Streamlit's page profile
+* deltas: elements the server sent back, i.e. how much of the page was redrawn
+
+With ``--max-wall-ms`` it doubles as a regression check on rerun overhead: it
+exits with status 1 if any action's median wall time exceeds the budget.
+``tests/test_live_rerun.py`` runs the same measurement under pytest with a
+fixed, generous budget.
+"""
+import argparse
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import time
+
+from bench.run_bench import APP_PATH, configure_environment, percentiles
+from bench.stub_server import StubServer
+
+STREAM_PATH = "/_stcore/stream"
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class LiveSession:
+    """One browser session: tracks widget ids and values the way the frontend does."""
+
+    def __init__(self, ws, url):
+        self.ws = ws
+        self.url = url  # page URL the browser reports; the app derives the image proxy's host from it
+        self.widgets = {}  # widget id -> (options, fragment id)
+        self.values = {}   # widget id -> string value sent with every rerun
+
+    def widget(self, key):
+        """Returns (widget id, options, fragment id) for the widget created with ``key``."""
+        for widget_id, (options, fragment_id) in self.widgets.items():
+            if widget_id.endswith(f"-{key}") or widget_id.endswith(f"_{key}"):
+                return widget_id, options, fragment_id
+        raise KeyError(key)
+
+    async def rerun(self, changes=None, fragment_id=""):
+        """Requests a rerun and returns (wall seconds, exec seconds, deltas received)."""
+        from streamlit.proto.BackMsg_pb2 import BackMsg
+        from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+
+        self.values.update(changes or {})
+        msg = BackMsg()
+        msg.rerun_script.query_string = ""
+        msg.rerun_script.fragment_id = fragment_id
+        msg.rerun_script.context_info.url = self.url
+        for widget_id, value in self.values.items():
+            state = msg.rerun_script.widget_states.widgets.add()
+            state.id = widget_id
+            state.string_value = value
+
+        start = time.perf_counter()
+        await self.ws.send(msg.SerializeToString())
+        exec_time, deltas = 0.0, 0
+        while True:
+            reply = ForwardMsg()
+            reply.ParseFromString(await self.ws.recv())
+            kind = reply.WhichOneof("type")
+            if kind == "delta":
+                deltas += 1
+                if reply.delta.WhichOneof("type") == "new_element":
+                    element = reply.delta.new_element
+                    widget = getattr(element, element.WhichOneof("type"))
+                    if getattr(widget, "id", ""):
+                        self.widgets[widget.id] = (list(getattr(widget, "options", [])), reply.delta.fragment_id)
+            elif kind == "page_profile":
+                exec_time += reply.page_profile.exec_time / 1e6  # microseconds
+            elif kind == "script_finished" and reply.script_finished != ForwardMsg.FINISHED_EARLY_FOR_RERUN:
+                return time.perf_counter() - start, exec_time, deltas
+
+    async def toggle(self, key):
+        """Flips a two-option radio, scoped to its fragment if it lives in one."""
+        widget_id, options, fragment_id = self.widget(key)
+        current = self.values.get(widget_id)
+        choice = options[1 - options.index(current)] if current in options else options[1]
+        return await self.rerun({widget_id: choice}, fragment_id)
+
+
+def start_app(port):
+    # Page profiles (the exec time) are only produced with usage stats on; nothing leaves the host headless
+    return subprocess.Popen(
+        [sys.executable, "-m", "streamlit", "run", APP_PATH, "--server.port", str(port),
+         "--server.headless", "true", "--browser.gatherUsageStats", "true"],
+        cwd=os.path.dirname(APP_PATH), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+
+
+async def wait_until_listening(port, attempts=150):
+    for _ in range(attempts):
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+            return
+        except OSError:
+            await asyncio.sleep(0.2)
+
+
+async def measure(port, rounds, city):
+    import websockets
+
+    await wait_until_listening(port)
+    async with websockets.connect(f"ws://127.0.0.1:{port}{STREAM_PATH}", max_size=64 << 20) as ws:
+        session = LiveSession(ws, f"http://127.0.0.1:{port}/")
+        await session.rerun()
+        await session.rerun({session.widget("city_input")[0]: city})
+        await session.rerun()
+
+        samples = {"idle_rerun": [], "theme_toggle": [], "language_toggle": []}
+        for _ in range(rounds):
+            samples["idle_rerun"].append(await session.rerun())
+            samples["theme_toggle"].append(await session.toggle("theme_choice"))
+            samples["language_toggle"].append(await session.toggle("language"))
+    return {
+        action: {
+            "wall_ms": percentiles([wall for wall, _, _ in runs]),
+            "exec_ms": percentiles([exec_time for _, exec_time, _ in runs]),
+            "deltas": percentiles([deltas for _, _, deltas in runs], scale=1),
+        }
+        for action, runs in samples.items()
+    }
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m bench.live_rerun", description=__doc__.split("\n\n")[0])
+    parser.add_argument("--rounds", type=int, default=20, help="Idle/theme/language cycles to time")
+    parser.add_argument("--city", default="London", help="City searched before timing")
+    parser.add_argument("--latency-ms", type=float, default=80.0, help="Stub server mean latency")
+    parser.add_argument("--port", type=int, default=0, help="Port for the app server (default: any free port)")
+    parser.add_argument("--max-wall-ms", type=float, default=None,
+                        help="Fail (exit 1) if any action's p50 wall time exceeds this budget")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    stub = StubServer(latency=args.latency_ms / 1000, seed=0).start()
+    configure_environment(stub)
+    port = args.port or free_port()
+    app = start_app(port)
+    try:
+        results = asyncio.run(measure(port, args.rounds, args.city))
+    finally:
+        app.terminate()
+        app.wait()
+        stub.stop()
+    over_budget = []
+    for action, result in results.items():
+        print(f"{action:<16} wall p50={result['wall_ms']['p50']:6.1f}ms  exec p50={result['exec_ms']['p50']:6.1f}ms  "
+              f"deltas={result['deltas']['p50']:.0f}")
+        if args.max_wall_ms is not None and result['wall_ms']['p50'] > args.max_wall_ms:
+            over_budget.append(action)
+    if over_budget:
+        print(f"FAIL: p50 wall time over {args.max_wall_ms:.0f}ms for {', '.join(over_budget)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
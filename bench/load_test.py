@@ -0,0 +1,218 @@
+"""Concurrent-session load harness for ``corrected.py``.
+
+Usage::
+
+    python -m bench.load_test --levels 1,4,16 --rounds 3 --latency-ms 80
+
+The app runs under a real ``streamlit run`` server against ``bench.stub_server``.
+At each concurrency level, N simulated users connect to it at once, each over
+its own websocket, speaking the browser's protocol as ``bench.live_rerun``
+does. Every user searches a city, toggles the theme and the language, goes back
+to the previous round's city and then moves on to the next one, for
+``--rounds`` rounds. Users pause for an exponentially distributed think time
+between actions. The server runs every session's reruns on its own script
+thread, as it would for real browsers, so reruns waiting on the network overlap
+and only genuine contention (the GIL, locks, the worker pool) makes them queue.
+Reported per level:
+
+* throughput: completed reruns per second across all sessions
+* latency: p50/p99 as a user sees it, from sending the rerun request to the
+  final ``script_finished``, overall and for each action
+* exec: script execution time as the server's page profile reports it
+* overhead: latency minus exec. This is time spent waiting for a script thread
+  and flushing messages. When it grows with the session count, reruns are
+  queueing.
+* per-session memory: growth of the server's resident set size per connected
+  session (read from ``/proc``, so Linux only). The deep size of
+  ``st.session_state`` comes from one ``AppTest`` session driven through the
+  same actions in this process.
+
+One unmeasured warm-up session runs first. Process-wide caches persist between
+levels, as they would in a long-lived replica.
+"""
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+
+from bench.live_rerun import STREAM_PATH, LiveSession, free_port, start_app, wait_until_listening
+from bench.run_bench import APP_PATH, configure_environment, percentiles
+from bench.stub_server import StubServer
+
+
+def deep_size(value, seen=None):
+    """Approximate retained size of a container tree (``sys.getsizeof`` recursed, shared objects counted once)."""
+    seen = set() if seen is None else seen
+    if id(value) in seen:
+        return 0
+    seen.add(id(value))
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(deep_size(k, seen) + deep_size(v, seen) for k, v in value.items())
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        size += sum(deep_size(item, seen) for item in value)
+    elif hasattr(value, "__slots__"):
+        size += sum(deep_size(getattr(value, name), seen) for name in value.__slots__ if hasattr(value, name))
+    elif hasattr(value, "__dict__"):
+        size += deep_size(vars(value), seen)
+    return size
+
+
+def resident_bytes(pid):
+    """Resident set size of a process, or None where ``/proc`` is unavailable."""
+    try:
+        with open(f"/proc/{pid}/status", encoding="ascii") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+def city_for(user_id, round_index, cities):
+    return cities[(user_id * 13 + round_index * 7) % len(cities)]
+
+
+class SimulatedUser:
+    """One browser session over its own websocket."""
+
+    def __init__(self, user_id, cities, think_time=0.0, seed=None):
+        self.user_id = user_id
+        self.cities = cities
+        self.think_time = think_time
+        self.samples = {}  # action -> [(wall seconds, exec seconds)]
+        self._random = random.Random(seed)
+
+    async def run(self, port, rounds, started=None):
+        """Runs the script; ``started`` (an ``asyncio.Event``) holds every user at the first search until set."""
+        import websockets
+
+        async with websockets.connect(f"ws://127.0.0.1:{port}{STREAM_PATH}", max_size=64 << 20) as ws:
+            session = LiveSession(ws, f"http://127.0.0.1:{port}/")
+            await self._timed("first_run", session.rerun)
+            if started is not None:
+                await started.wait()
+            city_box = session.widget("city_input")[0]
+            for i in range(rounds):
+                await self._timed("search", session.rerun, {city_box: city_for(self.user_id, i, self.cities)})
+                await self._timed("theme_toggle", session.toggle, "theme_choice")
+                await self._timed("language_toggle", session.toggle, "language")
+                if i:
+                    # Back to the previous round's city, now in the shared cache
+                    previous = city_for(self.user_id, i - 1, self.cities)
+                    await self._timed("re_search", session.rerun, {city_box: previous})
+        return self
+
+    async def _timed(self, action, rerun, *args):
+        if self.think_time:
+            await asyncio.sleep(self._random.expovariate(1 / self.think_time))
+        wall, exec_time, _ = await rerun(*args)
+        self.samples.setdefault(action, []).append((wall, exec_time))
+
+
+async def run_level(port, pid, concurrency, rounds, cities, think_time, seed):
+    started = asyncio.Event()
+    rss_before = resident_bytes(pid)
+    tasks = [
+        asyncio.ensure_future(SimulatedUser(user_id, cities, think_time, seed + user_id).run(port, rounds, started))
+        for user_id in range(concurrency)
+    ]
+    start = time.perf_counter()
+    started.set()
+    users = await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - start
+    rss_after = resident_bytes(pid)
+
+    runs = [run for user in users for samples in user.samples.values() for run in samples]
+    by_action = {}
+    for user in users:
+        for action, samples in user.samples.items():
+            by_action.setdefault(action, []).extend(samples)
+    return {
+        "sessions": concurrency,
+        "reruns": len(runs),
+        "throughput_reruns_per_s": len(runs) / elapsed,
+        "latency_ms": percentiles([wall for wall, _ in runs]),
+        "exec_ms": percentiles([exec_time for _, exec_time in runs]),
+        "overhead_ms": percentiles([wall - exec_time for wall, exec_time in runs]),
+        "latency_ms_by_action": {action: percentiles([wall for wall, _ in samples])
+                                 for action, samples in by_action.items()},
+        "rss_bytes_per_session": (rss_after - rss_before) / concurrency if rss_before and rss_after else None,
+    }
+
+
+def session_state_bytes(cities, rounds):
+    """Deep size of ``st.session_state`` after one in-process ``AppTest`` session runs the same actions."""
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(APP_PATH, default_timeout=120).run()
+    for i in range(rounds):
+        at.selectbox(key="city_input").set_value(city_for(0, i, cities)).run()
+        theme = at.sidebar.radio(key="theme_choice")
+        theme.set_value(theme.options[1 - theme.options.index(theme.value)]).run()
+        language = at.sidebar.radio(key="language")
+        language.set_value("hindi" if language.value == "english" else "english").run()
+    return deep_size({key: at.session_state[key] for key in at.session_state})
+
+
+async def measure(args, port, pid, cities):
+    await wait_until_listening(port)
+    await SimulatedUser(-1, cities).run(port, 1)  # imports, process-wide caches and the gazetteer load
+    results = []
+    for concurrency in [int(level) for level in args.levels.split(",") if level.strip()]:
+        result = await run_level(port, pid, concurrency, args.rounds, cities, args.think_ms / 1000, args.seed)
+        results.append(result)
+        rss = result["rss_bytes_per_session"]
+        print(
+            f"sessions={result['sessions']:<4} reruns/s={result['throughput_reruns_per_s']:6.1f} "
+            f"p50={result['latency_ms']['p50']:7.1f}ms p99={result['latency_ms']['p99']:7.1f}ms "
+            f"(exec p50={result['exec_ms']['p50']:6.1f}ms, overhead p99={result['overhead_ms']['p99']:6.1f}ms)"
+            + (f" rss={rss / 1024:7.1f}KiB/session" if rss is not None else ""),
+            file=sys.stderr,
+        )
+    return results
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m bench.load_test", description=__doc__.split("\n\n")[0])
+    parser.add_argument("--levels", default="1,2,4,8", help="Comma-separated concurrent session counts")
+    parser.add_argument("--rounds", type=int, default=3, help="Search/toggle rounds per session")
+    parser.add_argument("--think-ms", type=float, default=500.0, help="Mean pause between a user's actions")
+    parser.add_argument("--latency-ms", type=float, default=80.0, help="Stub server mean latency")
+    parser.add_argument("--jitter-ms", type=float, default=20.0, help="Stub server latency spread")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of stub responses that fail")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--port", type=int, default=0, help="Port for the app server (default: any free port)")
+    parser.add_argument("--json", action="store_true", help="Print the full results as JSON")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    stub = StubServer(latency=args.latency_ms / 1000, jitter=args.jitter_ms / 1000, error_rate=args.error_rate,
+                      seed=args.seed).start()
+    configure_environment(stub)
+
+    from weather_now.gazetteer import Gazetteer
+
+    cities = [place.name for place in Gazetteer.from_csv().places]
+    port = args.port or free_port()
+    app = start_app(port)
+    try:
+        results = asyncio.run(measure(args, port, app.pid, cities))
+        state_bytes = session_state_bytes(cities, args.rounds)
+    finally:
+        app.terminate()
+        app.wait()
+        stub.stop()
+    print(f"session_state={state_bytes / 1024:.1f}KiB per session (AppTest)", file=sys.stderr)
+    if args.json:
+        print(json.dumps({"levels": results, "session_state_bytes": state_bytes}, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
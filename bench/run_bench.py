@@ -0,0 +1,268 @@
+"""Offline benchmark suite: search latency, Streamlit rerun cost and cache hit ratios.
+
+Usage::
+
+    python -m bench.run_bench                       # compares against the previous run
+    python -m bench.run_bench --latency-ms 150 --error-rate 0.05 --baseline none
+
+Everything runs against ``bench.stub_server`` on a random local port, so runs
+are reproducible and never touch the real APIs. Two suites run:
+
+* ``search``: a Zipf-distributed stream of city lookups through ``WeatherService``
+  and the shared cache at the given concurrency. It reports latency percentiles
+  (overall, cold and warm), throughput, upstream requests, billed lookups and
+  cache statistics. ``--bulk-window-ms`` batches concurrent cold lookups into
+  WeatherAPI bulk requests, as the app does.
+* ``rerun``: drives ``corrected.py`` through Streamlit's ``AppTest`` and times the
+  first run, an idle rerun, cold and warm searches, and theme and language toggles.
+
+Results are written to ``bench/results/<timestamp>.json``. Each metric is then
+compared with the baseline run.
+"""
+import argparse
+import glob
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from bench.stub_server import StubServer
+
+APP_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "corrected.py")
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+
+def configure_environment(stub):
+    """Points the app at ``stub`` and turns off process-wide side effects between runs.
+
+    Must run before ``weather_now.weather`` is imported: its URL constants are read at import time.
+    """
+    os.environ.update(stub.environ())
+    os.environ.update({
+        "WEATHERAPI_KEY": "bench",
+        "UNSPLASH_ACCESS_KEY": "bench",
+        "WEATHER_CACHE_DB": "",           # memory-only cache, so runs do not warm each other
+        "WEATHER_METRICS_PORT": "0",
+        "WEATHER_IMAGE_PROXY_PORT": "0",
+        "WEATHER_PREFETCH_QUOTA_SHARE": "0",
+        "WEATHERAPI_HOURLY_QUOTA": "10000000",  # the stub has no quota; keep the limiter out of the numbers
+        "UNSPLASH_HOURLY_QUOTA": "10000000",
+    })
+
+
+def percentiles(samples, scale=1000.0):
+    """Summarises durations in seconds as milliseconds."""
+    if not samples:
+        return {}
+    ordered = sorted(samples)
+
+    def pick(q):
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))] * scale
+
+    return {
+        "count": len(ordered),
+        "mean": statistics.fmean(ordered) * scale,
+        "p50": pick(0.50),
+        "p90": pick(0.90),
+        "p99": pick(0.99),
+        "max": ordered[-1] * scale,
+    }
+
+
+def zipf_workload(cities, n, seed):
+    """``n`` lookups where the k-th most popular city is requested ~1/k as often as the first."""
+    rng = random.Random(seed)
+    weights = [1 / (rank + 1) for rank in range(len(cities))]
+    return rng.choices(cities, weights=weights, k=n)
+
+
+def bench_search(args, stub):
+    from weather_now.batching import BulkDispatcher
+    from weather_now.cache import ResponseCache
+    from weather_now.gazetteer import Gazetteer
+    from weather_now.http import HttpClient
+    from weather_now.singleflight import SingleFlight
+    from weather_now.weather import UNSPLASH_API_URL, WeatherService
+
+    gazetteer = Gazetteer.from_csv()
+    cities = [place.name for place in gazetteer.places[: args.cities]] + ["Zzzville", "Qzzzq"]
+    workload = zipf_workload(cities, args.searches, args.seed)
+
+    http = HttpClient(max_retries=2, pool_size=args.concurrency)
+    cache = ResponseCache(ttls={"current": 600, "forecast": 1800, "landmark": 3600, "not_found": 86400},
+                          flights=SingleFlight())
+    batcher = BulkDispatcher(http, window=args.bulk_window_ms / 1000) if args.bulk_window_ms > 0 else None
+    service = WeatherService("bench", http, cache=cache, gazetteer=gazetteer, batcher=batcher)
+    seen = set()
+
+    def search(city):
+        _, city_key, place = service.resolve(city)
+        cold = city_key not in seen
+        seen.add(city_key)
+        start = time.perf_counter()
+        try:
+            current_data, _ = service.fetch_payloads(city)
+            if 'error' not in current_data:
+                cache.get_or_fetch("landmark", city_key, lambda: http.get_json(
+                    UNSPLASH_API_URL, params={"query": f"famous landmark in {place.name if place else city}"}))
+            failed = False
+        except Exception:
+            failed = True
+        return cold, time.perf_counter() - start, failed
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        outcomes = list(pool.map(search, workload))
+    elapsed = time.perf_counter() - started
+
+    upstream_calls = sum(stub.requests.values())
+    return {
+        "throughput_per_s": len(workload) / elapsed,
+        "latency_ms": percentiles([duration for _, duration, _ in outcomes]),
+        "cold_latency_ms": percentiles([duration for cold, duration, _ in outcomes if cold]),
+        "warm_latency_ms": percentiles([duration for cold, duration, _ in outcomes if not cold]),
+        "errors": sum(failed for _, _, failed in outcomes),
+        "upstream_calls": upstream_calls,
+        "upstream_calls_per_search": upstream_calls / len(workload),
+        # Quota cost: WeatherAPI bills every location in a bulk request
+        "billed_lookups": sum(stub.billed.values()),
+        "cache": cache.stats(),
+        **({"bulk": batcher.stats()} if batcher is not None else {}),
+    }
+
+
+def bench_rerun(args):
+    from streamlit.testing.v1 import AppTest
+
+    from weather_now.gazetteer import Gazetteer
+
+    names = [place.name for place in Gazetteer.from_csv().places]
+    timings = {}
+
+    def timed(label, element=None, value=None):
+        start = time.perf_counter()
+        if element is None:
+            at.run()
+        else:
+            element.set_value(value).run()
+        timings.setdefault(label, []).append(time.perf_counter() - start)
+        if at.exception:
+            raise RuntimeError(f"{label}: {at.exception[0].value}")
+
+    for i in range(args.reruns):
+        city = names[(i * 7) % len(names)]
+        at = AppTest.from_file(APP_PATH, default_timeout=60)
+        timed("first_run")
+        timed("idle_rerun")
+        timed("search_cold", at.selectbox(key="city_input"), city)
+        if i:
+            # The previous session's city: a new session served from the process-wide cache
+            timed("search_warm", at.selectbox(key="city_input"), names[((i - 1) * 7) % len(names)])
+        theme = at.sidebar.radio(key="theme_choice")
+        timed("theme_toggle", theme, theme.options[1 - theme.options.index(theme.value)])
+        language = at.sidebar.radio(key="language")
+        timed("language_toggle", language, "hindi" if language.value == "english" else "english")
+    return {label: percentiles(samples) for label, samples in timings.items()}
+
+
+def flatten(results, prefix=""):
+    flat = {}
+    for key, value in results.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(flatten(value, name + "."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[name] = value
+    return flat
+
+
+def find_baseline(choice, current_path):
+    if choice == "none":
+        return None
+    if choice != "latest":
+        return choice
+    previous = sorted(p for p in glob.glob(os.path.join(os.path.dirname(current_path), "*.json")) if p != current_path)
+    return previous[-1] if previous else None
+
+
+def compare(current, baseline):
+    """Prints every shared metric with its relative change against the baseline."""
+    if current["params"] != baseline.get("params"):
+        print("note: benchmark parameters differ from the baseline run")
+    suites = ("search", "rerun_ms")
+    now = flatten({k: v for k, v in current.items() if k in suites})
+    before = flatten({k: v for k, v in baseline.items() if k in suites})
+    print(f"{'metric':<44} {'baseline':>12} {'current':>12} {'change':>8}")
+    for name in sorted(now.keys() & before.keys()):
+        old, new = before[name], now[name]
+        change = f"{(new - old) / old * 100:+.1f}%" if old else "n/a"
+        print(f"{name:<44} {old:>12.2f} {new:>12.2f} {change:>8}")
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(APP_PATH), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m bench.run_bench", description=__doc__.split("\n\n")[0])
+    parser.add_argument("--cities", type=int, default=40, help="Distinct bundled cities in the workload")
+    parser.add_argument("--searches", type=int, default=400, help="Lookups in the search suite")
+    parser.add_argument("--concurrency", type=int, default=8, help="Concurrent lookups in the search suite")
+    parser.add_argument("--bulk-window-ms", type=float, default=50.0,
+                        help="Batching window for bulk lookups in the search suite (0 disables)")
+    parser.add_argument("--reruns", type=int, default=5, help="AppTest sessions in the rerun suite (0 skips it)")
+    parser.add_argument("--latency-ms", type=float, default=80.0, help="Stub server mean latency")
+    parser.add_argument("--jitter-ms", type=float, default=20.0, help="Stub server latency spread")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of stub responses that fail")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--baseline", default="latest", help="Results file to compare with, 'latest' or 'none'")
+    parser.add_argument("--output", default=RESULTS_DIR, help="Directory for the results JSON")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    stub = StubServer(latency=args.latency_ms / 1000, jitter=args.jitter_ms / 1000, error_rate=args.error_rate,
+                      seed=args.seed).start()
+    configure_environment(stub)
+
+    results = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "git_rev": git_revision(),
+        "python": platform.python_version(),
+        "params": {k: v for k, v in vars(args).items() if k not in ("baseline", "output")},
+    }
+    try:
+        results["search"] = bench_search(args, stub)
+        if args.reruns:
+            results["rerun_ms"] = bench_rerun(args)
+    finally:
+        stub.stop()
+
+    os.makedirs(args.output, exist_ok=True)
+    path = os.path.join(args.output, time.strftime("%Y%m%d-%H%M%S") + ".json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(json.dumps({k: results[k] for k in ("search", "rerun_ms") if k in results}, indent=2))
+    print(f"results written to {path}", file=sys.stderr)
+
+    baseline_path = find_baseline(args.baseline, path)
+    if baseline_path:
+        with open(baseline_path, encoding="utf-8") as f:
+            baseline = json.load(f)
+        print(f"\ncompared with {baseline_path} ({baseline.get('git_rev')})")
+        compare(results, baseline)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
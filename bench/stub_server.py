@@ -0,0 +1,218 @@
+"""Local stand-in for WeatherAPI and Unsplash that replays recorded fixtures.
+
+Usage::
+
+    python -m bench.stub_server --port 8765 --latency-ms 80 --error-rate 0.02
+
+then start the app (or the batch CLI) pointed at it::
+
+    WEATHERAPI_BASE_URL=http://127.0.0.1:8765/v1 \\
+    UNSPLASH_API_URL=http://127.0.0.1:8765/search/photos \\
+    WEATHERAPI_KEY=stub UNSPLASH_ACCESS_KEY=stub streamlit run corrected.py
+
+Every ``q`` gets the fixture payload with its location rewritten to the queried
+city (bundled gazetteer coordinates map back to their names), and forecasts are
+tiled to the requested number of ``days``. Queries containing ``zzz`` answer
+with WeatherAPI's 1006 "No matching location found." error. Each response is
+delayed by ``latency`` +/- ``jitter`` seconds, and ``error_rate`` of them fail
+with one of ``error_statuses``.
+
+A POST with ``q=bulk`` is answered like WeatherAPI's bulk request: one entry per
+location in the JSON body, each tagged with its ``custom_id``. ``billed``
+counts locations the way WeatherAPI bills them, one per location, whether it
+came in a bulk request or not.
+"""
+import argparse
+import copy
+import json
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import date, timedelta
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+
+from weather_now.gazetteer import Gazetteer, place_query
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+NOT_FOUND_MARKER = "zzz"
+
+
+def _load(name, fixtures_dir):
+    with open(os.path.join(fixtures_dir, name), encoding="utf-8") as f:
+        return json.load(f)
+
+
+class StubServer:
+    """Threaded HTTP server answering ``/v1/current.json``, ``/v1/forecast.json`` (single and bulk) and ``/search/photos``."""
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0, jitter=0.0, error_rate=0.0,
+                 error_statuses=(500, 503), seed=None, fixtures_dir=FIXTURES_DIR):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_statuses = tuple(error_statuses)
+        self.requests = Counter()  # (path, status) -> count
+        self.billed = Counter()    # path -> locations looked up
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._forecast = _load("forecast.json", fixtures_dir)
+        self._current = _load("current.json", fixtures_dir)
+        self._photos = json.dumps(_load("unsplash_search.json", fixtures_dir)).encode("utf-8")
+        self._not_found = json.dumps(_load("error_1006.json", fixtures_dir)).encode("utf-8")
+        self._places = {place_query(place): place for place in Gazetteer.from_csv().places}
+        self.render = lru_cache(maxsize=4096)(self._render)
+
+        self.httpd = ThreadingHTTPServer((host, port), self._handler())
+        self.httpd.daemon_threads = True
+        self.host, self.port = self.httpd.server_address[:2]
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name="stub-server", daemon=True)
+
+    @property
+    def base_url(self):
+        return f"http://{self.host}:{self.port}"
+
+    def environ(self):
+        """Environment variables that point the app and the CLI at this server."""
+        return {
+            "WEATHERAPI_BASE_URL": f"{self.base_url}/v1",
+            "UNSPLASH_API_URL": f"{self.base_url}/search/photos",
+        }
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def respond(self, path, params, payload=None):
+        """Returns (status, body bytes) for one request, after the injected delay; ``payload`` is a POST's JSON body."""
+        with self._lock:
+            delay = max(0.0, self.latency + self._random.uniform(-self.jitter, self.jitter))
+            failed = self._random.random() < self.error_rate
+            status = self._random.choice(self.error_statuses) if failed else 200
+        time.sleep(delay)
+        if failed:
+            body = json.dumps({"error": {"code": 9999, "message": "Injected failure."}}).encode("utf-8")
+        elif path == "/search/photos":
+            body = self._photos
+        elif path in ("/v1/current.json", "/v1/forecast.json"):
+            days = int(params.get("days", 1)) if path == "/v1/forecast.json" else 0
+            if params.get("q") == "bulk":
+                locations = (payload or {}).get("locations") or []
+                body = json.dumps({"bulk": [{"query": self._bulk_entry(location, days)} for location in locations]})
+                body, lookups = body.encode("utf-8"), len(locations)
+            else:
+                query, lookups = params.get("q", ""), 1
+                if NOT_FOUND_MARKER in query.lower():
+                    status, body = 400, self._not_found
+                else:
+                    body = self.render(query, days)
+            with self._lock:
+                self.billed[path] += lookups
+        else:
+            status, body = 404, b'{"error": {"code": 404, "message": "Unknown endpoint."}}'
+        with self._lock:
+            self.requests[(path, status)] += 1
+        return status, body
+
+    def _bulk_entry(self, location, days):
+        query = location.get("q", "")
+        tag = {"custom_id": location.get("custom_id"), "q": query}
+        if NOT_FOUND_MARKER in query.lower():
+            return {**tag, **json.loads(self._not_found)}
+        return {**tag, **json.loads(self.render(query, days))}
+
+    def _render(self, query, days):
+        place = self._places.get(query.strip())
+        location = dict(self._forecast["location"])
+        if place is not None:
+            location.update(name=place.name, country=place.country, lat=place.lat, lon=place.lon)
+        else:
+            location.update(name=query.strip().title(), region="", country="")
+        if not days:
+            return json.dumps({**self._current, "location": location}).encode("utf-8")
+
+        recorded = self._forecast["forecast"]["forecastday"]
+        start = date.fromisoformat(recorded[0]["date"])
+        forecast_days = []
+        for i in range(days):
+            day = copy.deepcopy(recorded[i % len(recorded)])
+            shift = (i - i % len(recorded)) * 86400
+            day["date"] = (start + timedelta(days=i)).isoformat()
+            day["date_epoch"] += shift
+            for hour in day["hour"]:
+                hour["time_epoch"] += shift
+                hour["time"] = f"{day['date']} {hour['time'][-5:]}"
+            forecast_days.append(day)
+        payload = {**self._forecast, "location": location, "forecast": {"forecastday": forecast_days}}
+        return json.dumps(payload).encode("utf-8")
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive, like the real APIs
+
+            def do_GET(self):
+                url = urlsplit(self.path)
+                self._reply(*server.respond(url.path, dict(parse_qsl(url.query))))
+
+            def do_POST(self):
+                url = urlsplit(self.path)
+                raw = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                try:
+                    payload = json.loads(raw or b"{}")
+                except ValueError:
+                    self._reply(400, b'{"error": {"code": 2009, "message": "Invalid JSON body."}}')
+                    return
+                self._reply(*server.respond(url.path, dict(parse_qsl(url.query)), payload))
+
+            def _reply(self, status, body):
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m bench.stub_server", description=__doc__.split("\n\n")[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=80.0, help="Mean response delay (default: 80)")
+    parser.add_argument("--jitter-ms", type=float, default=20.0, help="Uniform +/- delay spread (default: 20)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of requests that fail (default: 0)")
+    parser.add_argument("--error-status", type=int, action="append", help="Status for injected failures (repeatable)")
+    parser.add_argument("--seed", type=int, help="Seed for reproducible delays and failures")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    server = StubServer(args.host, args.port, args.latency_ms / 1000, args.jitter_ms / 1000, args.error_rate,
+                        args.error_status or (500, 503), args.seed)
+    for name, value in server.environ().items():
+        print(f"export {name}={value}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
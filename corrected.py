@@ -1,8 +1,40 @@
 import streamlit as st
 import requests
-from datetime import datetime
+import asyncio
 import base64
 import os
+import time
+from urllib.parse import urlsplit
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+
+SCRIPT_STARTED = time.perf_counter()  # start of this rerun, for the "script" latency phase
+
+from weather_now.analytics import PRECIP_RISK_WINDOW, analyze, daily_summary
+from weather_now.assets import BACKGROUND_VARIANT_WIDTH, STATIC_DIR, background_image_set, variant_name
+from weather_now.batching import BulkDispatcher
+from weather_now.cache import ResponseCache
+from weather_now.compare import iter_completed, parse_city_list
+from weather_now.conditions import classify
+from weather_now.disk_cache import DiskCache
+from weather_now.gazetteer import Gazetteer
+from weather_now.history import HistoryStore
+from weather_now.http import RETRYABLE_STATUSES, HttpClient
+from weather_now.images import ImageProxy, ImageStore
+from weather_now.metrics import Metrics, MetricsServer
+from weather_now.prefetch import PopularityTracker, PrefetchScheduler
+from weather_now.ratelimit import QuotaExceededError, RateLimiter
+from weather_now.render_cache import RenderCache
+from weather_now.singleflight import SingleFlight
+from weather_now.ui import BACKGROUND_IMAGES, KNOWN_CITIES, LANGUAGE_NAMES, AppContext
+from weather_now.weather import (
+    UNSPLASH_API_URL,
+    WEATHERAPI_BASE_URL,
+    WEATHERAPI_CURRENT_URL,
+    WEATHERAPI_FORECAST_URL,
+    WeatherService,
+    build_weather_view,
+    parse_current_conditions,
+)
 
 # ====================================================================
 # CONFIGURATION AND TRANSLATIONS
@@ -13,88 +45,99 @@ import os
 #       for 'WEATHERAPI_KEY' and 'UNSPLASH_ACCESS_KEY'.
 try:
     WEATHERAPI_KEY = st.secrets["WEATHERAPI_KEY"]
-except KeyError:
+except (KeyError, FileNotFoundError):  # no secrets.toml at all raises FileNotFoundError
     WEATHERAPI_KEY = os.environ.get("WEATHERAPI_KEY")
 
 try:
     UNSPLASH_ACCESS_KEY = st.secrets["UNSPLASH_ACCESS_KEY"]
-except KeyError:
+except (KeyError, FileNotFoundError):
     UNSPLASH_ACCESS_KEY = os.environ.get("UNSPLASH_ACCESS_KEY")
 
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
 
-WEATHERAPI_CURRENT_URL = "http://api.weatherapi.com/v1/current.json"
-WEATHERAPI_FORECAST_URL = "http://api.weatherapi.com/v1/forecast.json"
-UNSPLASH_API_URL = "https://api.unsplash.com/search/photos"
-
-# --- Dynamic Background Image URLs ---
-BACKGROUND_IMAGES = {
-    "clear": "https://images.pexels.com/photos/281260/pexels-photo-281260.jpeg?auto=compress&cs=tinysrgb&fit=crop&h=1200&w=2000",
-    "clouds": "https://images.pexels.com/photos/531767/pexels-photo-531767.jpeg?auto=compress&cs=tinysrgb&fit=crop&h=1200&w=2000",
-    "rain": "https://images.unsplash.com/photo-1610741083757-1ae88e1a17f7?q=80&w=2000&auto=format&fit=crop",
-    "drizzle": "https://images.unsplash.com/photo-1610741083757-1ae88e1a17f7?q=80&w=2000&auto=format&fit=crop",
-    "thunderstorm": "https://images.pexels.com/photos/1118873/pexels-photo-1118873.jpeg?auto=compress&cs=tinysrgb&fit=crop&h=1200&w=2000",
-    "snow": "https://images.pexels.com/photos/1144211/pexels-photo-1144211.jpeg?auto=compress&cs=tinysrgb&fit=crop&h=1200&w=2000",
-    "mist": "https://images.unsplash.com/photo-1544321045-8664165d5686?q=80&w=2000&auto=format&fit=crop",
-    "haze": "https://images.unsplash.com/photo-1544321045-8664165d5686?q=80&w=2000&auto=format&fit=crop",
-    "fog": "https://images.unsplash.com/photo-1544321045-8664165d5686?q=80&w=2000&auto=format&fit=crop",
-    "default": "https://images.pexels.com/photos/531767/pexels-photo-531767.jpeg?auto=compress&cs=tinysrgb&fit=crop&h=1200&w=2000"
-}
-
-# --- TRANSLATIONS DICTIONARY ---
-TRANSLATIONS = {
-    "english": {
-        "title": "Weather Now - Smart Forecasting",
-        "tagline": "Get real-time weather and a **3-day outlook** for any city on the globe.",
-        "input_label": "📍 Enter City Name (e.g., Dehradun, Delhi, London)",
-        "input_placeholder": "Enter City Name and press Enter",
-        "press_enter": "Press Enter to search for the city's weather!",
-        "welcome": "Welcome! Start by entering a city name above.",
-        "welcome_detail": "Enter a city to see its aesthetic weather forecast and a glimpse of its famous landmark.",
-        "weather": "Weather",
-        "landmark_unavailable": "Landmark image not available.",
-        "feels_like": "Feels Like",
-        "humidity": "Humidity",
-        "wind_speed": "Wind Speed",
-        "pressure": "Pressure",
-        "severe_alert": "🚨 Severe Weather Alert! Take precautions.",
-        "forecast_header": "📅 3-Day Forecast",
-        "forecast_error": "Error: Could not fetch 3-day forecast. Check API configuration or city name.",
-        "city_not_found": "City '{}' not found! Please try again.",
-        "error_fetching": "Error fetching weather data: {}",
-        "theme_selector": "Interface Theme",
-        "language_selector": "Select Language",
-        "light_mode": "🌞 Light Mode",
-        "dark_mode": "🌙 Dark Mode",
-        "max_temp": "Max Temp",
-        "min_temp": "Min Temp",
-    },
-    "hindi": {
-        "title": "मौसम अब - स्मार्ट पूर्वानुमान",
-        "tagline": "दुनिया के किसी भी शहर के लिए वास्तविक समय का मौसम और **3-दिन का पूर्वानुमान** प्राप्त करें।",
-        "input_label": "📍 शहर का नाम दर्ज करें (उदाहरण: देहरादून, दिल्ली, लंदन)",
-        "input_placeholder": "शहर का नाम दर्ज करें और Enter दबाएँ",
-        "press_enter": "शहर के मौसम की खोज के लिए Enter दबाएँ!",
-        "welcome": "स्वागत है! ऊपर शहर का नाम दर्ज करके शुरुआत करें।",
-        "welcome_detail": "इसके सौंदर्यपूर्ण मौसम पूर्वानुमान और प्रसिद्ध स्थल की झलक देखने के लिए एक शहर दर्ज करें।",
-        "weather": "मौसम",
-        "landmark_unavailable": "पहचान चिह्न की तस्वीर उपलब्ध नहीं है।",
-        "feels_like": "महसूस होता है",
-        "humidity": "आर्द्रता",
-        "wind_speed": "हवा की गति",
-        "pressure": "दबाव",
-        "severe_alert": "🚨 गंभीर मौसम चेतावनी! सावधानी बरतें।",
-        "forecast_header": "📅 3-दिन का पूर्वानुमान",
-        "forecast_error": "त्रुटि: 3-दिन का पूर्वानुमान प्राप्त नहीं किया जा सका। एपीआई कॉन्फ़िगरेशन या शहर का नाम जाँच करें।",
-        "city_not_found": "शहर '{}' नहीं मिला! कृपया पुनः प्रयास करें।",
-        "error_fetching": "मौसम डेटा प्राप्त करने में त्रुटि: {}",
-        "theme_selector": "इंटरफ़ेस थीम",
-        "language_selector": "भाषा चुनें",
-        "light_mode": "🌞 हल्का मोड",
-        "dark_mode": "🌙 गहरा मोड",
-        "max_temp": "अधिकतम तापमान",
-        "min_temp": "न्यूनतम तापमान",
-    }
-}
+# --- Shared Response Cache Settings ---
+CURRENT_CACHE_TTL = 600          # seconds a current.json response is considered fresh
+FORECAST_CACHE_TTL = 1800        # seconds a forecast.json response is considered fresh
+LANDMARK_CACHE_TTL = 3600        # seconds an Unsplash landmark lookup is considered fresh
+NOT_FOUND_CACHE_TTL = 86400      # seconds a name WeatherAPI did not recognise is answered locally
+CACHE_STALE_TTL = 900            # grace period during which expired entries are served while refreshing
+CACHE_MAX_BYTES = 32 * 1024 * 1024
+# SQLite file shared by every replica on the host (WAL mode); set WEATHER_CACHE_DB="" to disable
+DISK_CACHE_PATH = os.environ.get("WEATHER_CACHE_DB", os.path.join(APP_DIR, ".cache", "responses.sqlite3"))
+
+# --- Fetch Pipeline Settings ---
+# "combined": one forecast.json call supplies current + forecast data while the landmark
+#             lookup runs in parallel. "sequential": the original current -> forecast -> landmark chain.
+# "progressive": current.json and forecast.json are requested in parallel so current conditions can be
+#             painted before the larger forecast lands (a second upstream call for uncached cities).
+FETCH_MODE = os.environ.get("WEATHER_FETCH_MODE", "combined")
+FETCH_WORKERS = 8
+# Paint the main card, forecast and landmark as each arrives instead of after all of them
+# (ignored in "sequential" mode, which keeps the original blocking chain)
+PROGRESSIVE_RENDERING = os.environ.get("WEATHER_PROGRESSIVE_RENDERING", "1") == "1"
+# Days requested from forecast.json (1-14). The first three get cards; the hourly series of all of
+# them feeds the extended outlook. Plans that serve fewer days simply return fewer.
+FORECAST_DAYS = int(os.environ.get("WEATHER_FORECAST_DAYS", 14))
+FORECAST_CARD_DAYS = 3
+
+# --- Multi-City Comparison Settings ---
+COMPARE_MAX_CITIES = 50          # cities accepted per comparison
+COMPARE_CONCURRENCY = 8          # upstream lookups in flight at once
+
+# --- API Quota Settings (one token bucket per upstream key) ---
+WEATHERAPI_HOURLY_QUOTA = int(os.environ.get("WEATHERAPI_HOURLY_QUOTA", 40000))
+UNSPLASH_HOURLY_QUOTA = int(os.environ.get("UNSPLASH_HOURLY_QUOTA", 50))  # Unsplash demo apps get 50/hour
+# Buckets live in each process; replicas sharing the keys each enforce an even share of the quotas above
+REPLICAS = max(1, int(os.environ.get("WEATHER_REPLICAS", 1)))
+RATE_LIMIT_BURST_WINDOW = 300    # seconds of quota a bucket may spend in one burst
+RATE_LIMIT_BACKGROUND_RESERVE = 0.25  # share of each bucket only interactive searches may use
+RATE_LIMIT_MAX_WAIT = 1.0        # seconds an interactive call waits for a token before failing
+
+# --- Cache Warming Settings ---
+PREFETCH_TOP_N = 20              # most requested cities kept warm
+PREFETCH_LEAD_TIME = 120         # refresh entries expiring within this many seconds
+PREFETCH_INTERVAL = 30           # seconds between scheduler passes
+PREFETCH_HALF_LIFE = 3600        # seconds for a city's popularity score to halve
+PREFETCH_QUOTA_SHARE = float(os.environ.get("WEATHER_PREFETCH_QUOTA_SHARE", 0.1))  # 0 disables warming
+
+# --- Shared HTTP Client Settings ---
+HTTP_CONNECT_TIMEOUT = 3.05      # seconds to establish a connection
+HTTP_READ_TIMEOUT = 10           # seconds to wait for the response body
+HTTP_MAX_RETRIES = 2             # retries for connection errors, timeouts, 429 and 5xx
+HTTP_POOL_SIZE = 32              # keep-alive connections kept per host
+CIRCUIT_FAILURE_THRESHOLD = 5    # consecutive failures before a host's circuit opens
+CIRCUIT_RESET_TIMEOUT = 30       # seconds before a probe request is let through again
+
+# --- Bulk Lookups (concurrent searches for different cities share one WeatherAPI bulk request) ---
+# Lookups arriving while a request is already on the wire wait up to this long to be batched; 0 disables
+BULK_WINDOW_MS = float(os.environ.get("WEATHER_BULK_WINDOW_MS", 50))
+
+# --- Observation History (append-only columnar store feeding the trend chart) ---
+# Directory shared by every replica on the host; set WEATHER_HISTORY_DIR="" to disable
+HISTORY_DIR = os.environ.get("WEATHER_HISTORY_DIR", os.path.join(APP_DIR, ".cache", "history"))
+HISTORY_RETENTION_DAYS = int(os.environ.get("WEATHER_HISTORY_RETENTION_DAYS", 90))
+HISTORY_CHART_DAYS = 30          # days of observations shown in the trend chart
+HISTORY_MATCH_TOLERANCE = 3 * 3600  # how far from "a week ago" an observation may be to compare with it
+
+# --- Rendered Card Cache ---
+RENDER_CACHE_MAX_ENTRIES = 2048  # rendered main/forecast cards kept process-wide
+
+# --- Observability Settings ---
+METRICS_PORT = int(os.environ.get("WEATHER_METRICS_PORT", 9464))  # Prometheus /metrics; 0 disables
+METRICS_HOST = os.environ.get("WEATHER_METRICS_HOST", "127.0.0.1")  # "0.0.0.0" for scrapers on other hosts
+DEBUG_PANEL = os.environ.get("WEATHER_DEBUG_PANEL") == "1"         # or open the app with ?debug=1
+
+# --- Image Proxy (landmark and background images, resized and served from their own public listener) ---
+IMAGE_PROXY_PORT = int(os.environ.get("WEATHER_IMAGE_PROXY_PORT", 9465))  # /images/ only; 0 disables
+IMAGE_PROXY_HOST = os.environ.get("WEATHER_IMAGE_PROXY_HOST", "0.0.0.0")  # browsers fetch from it
+# Public base URL of the listener's /images/ route, e.g. behind a reverse proxy. Unset: the page's
+# own host at IMAGE_PROXY_PORT (plain-HTTP pages only); "off": hotlink the upstream images as before.
+IMAGE_PROXY_URL = os.environ.get("WEATHER_IMAGE_PROXY_URL", "")
+IMAGE_CACHE_DIR = os.environ.get("WEATHER_IMAGE_CACHE_DIR", os.path.join(APP_DIR, ".cache", "images"))
+IMAGE_CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+# --- Default Background (variants in static/ are built by `python -m weather_now.assets`) ---
+DEFAULT_BACKGROUND_IMAGE = "bright_day_light.jpg"
 
 # ---- INITIAL STATE SETUP ----
 if 'theme' not in st.session_state:
@@ -105,10 +148,20 @@ if 'search_triggered' not in st.session_state:
     st.session_state['search_triggered'] = False
 if 'background_url' not in st.session_state:
     st.session_state['background_url'] = None
-if 'current_weather_data' not in st.session_state:
-    st.session_state['current_weather_data'] = None
+if 'weather_view' not in st.session_state:
+    st.session_state['weather_view'] = None
+if 'weather_analytics' not in st.session_state:
+    st.session_state['weather_analytics'] = None
+if 'city_key' not in st.session_state:
+    st.session_state['city_key'] = None
 if 'city_image_url' not in st.session_state:
     st.session_state['city_image_url'] = None
+if 'pending_search' not in st.session_state:
+    st.session_state['pending_search'] = None
+if 'search_mode' not in st.session_state:
+    st.session_state['search_mode'] = 'single'
+if 'comparison_rows' not in st.session_state:
+    st.session_state['comparison_rows'] = None
 
 
 # --- UTILITY FUNCTIONS ---
@@ -123,38 +176,39 @@ def get_base64_image(image_path):
     except Exception:
         return None
 
-def get_weather_background_url(condition_text):
-    """Maps WeatherAPI condition text to a background image URL by checking keywords."""
-    condition_text = condition_text.lower()
-    
-    if "clear" in condition_text or "sunny" in condition_text:
-        return BACKGROUND_IMAGES.get("clear")
-    elif "cloud" in condition_text or "overcast" in condition_text:
-        return BACKGROUND_IMAGES.get("clouds")
-    elif "rain" in condition_text or "shower" in condition_text:
-        return BACKGROUND_IMAGES.get("rain")
-    elif "drizzle" in condition_text:
-        return BACKGROUND_IMAGES.get("drizzle")
-    elif "thunder" in condition_text or "storm" in condition_text:
-        return BACKGROUND_IMAGES.get("thunderstorm")
-    elif "snow" in condition_text or "sleet" in condition_text or "ice" in condition_text:
-        return BACKGROUND_IMAGES.get("snow")
-    elif "mist" in condition_text or "fog" in condition_text or "haze" in condition_text:
-        return BACKGROUND_IMAGES.get("mist")
-    
-    return BACKGROUND_IMAGES.get("default") # Default fallback
-
-# --- ADDED ST.CACHE_DATA FOR PERFORMANCE ---
-@st.cache_data(ttl=3600)
-def fetch_unsplash_image_url(city_name):
-    """Fetches a city landmark image from Unsplash or uses a fallback."""
-    KNOWN_CITIES = {
-        "amritsar": "https://images.pexels.com/photos/17798305/pexels-photo-17798305/free-photo-of-golden-temple-at-night.jpeg?auto=compress&cs=tinysrgb&w=800",
-        "delhi": "https://images.pexels.com/photos/3476472/pexels-photo-3476472.jpeg?auto=compress&cs=tinysrgb&w=800",
-        "mumbai": "https://images.pexels.com/photos/10203531/pexels-photo-10203531.jpeg?auto=compress&cs=tinysrgb&w=800",
-        "london": "https://images.pexels.com/photos/460672/pexels-photo-460672.jpeg?auto=compress&cs=tinysrgb&w=800",
-    }
-    
+@st.cache_resource
+def get_default_background_style(theme):
+    """
+    Resolves the CSS background for the default local image once per process, as
+    (style, preferred style or None). Prefers the pre-generated WebP/JPEG variants
+    served from static/, with the plain JPEG url() as the style every browser can
+    parse; falls back to a Base64 data URI (encoded once here, not per rerun) and
+    then to a gradient.
+    """
+    if st.get_option("server.enableStaticServing"):
+        variants = background_image_set(DEFAULT_BACKGROUND_IMAGE, static_dir=os.path.join(APP_DIR, STATIC_DIR))
+        if variants:
+            fallback, image_set = variants
+            return f"{fallback} no-repeat center center fixed", f"{image_set} no-repeat center center fixed"
+
+    base64_image = get_base64_image(DEFAULT_BACKGROUND_IMAGE)
+    if base64_image:
+        return f"url('data:image/jpeg;base64,{base64_image}') no-repeat center center fixed", None
+    if theme == 'dark':
+        return 'linear-gradient(135deg, #1C2833 0%, #2C3E50 50%, #4A637A 100%)', None
+    return 'linear-gradient(135deg, #CFD8DC 0%, #B0BEC5 50%, #78909C 100%)', None
+
+def get_weather_background_url(condition):
+    """Maps a WeatherAPI condition block (code, falling back to text) to a background image URL."""
+    return BACKGROUND_IMAGES.get(classify(condition).background, BACKGROUND_IMAGES["default"])
+
+# --- LANDMARK LOOKUP (cached in the shared response cache under "landmark") ---
+def fetch_unsplash_image_url(city_name, http=None):
+    """Fetches a city landmark image from Unsplash or uses a fallback.
+
+    Transient and quota errors are raised rather than answered with the fallback,
+    so the response cache never stores them over a good URL.
+    """
     # Check if a key is available (securely loaded or otherwise)
     if not UNSPLASH_ACCESS_KEY:
         return KNOWN_CITIES.get(city_name.lower(), None)
@@ -162,44 +216,292 @@ def fetch_unsplash_image_url(city_name):
     try:
         query = f"famous landmark in {city_name}"
         params = {"query": query, "per_page": 1, "client_id": UNSPLASH_ACCESS_KEY}
-        response = requests.get(UNSPLASH_API_URL, params=params)
-        response.raise_for_status() 
-        data = response.json()
+        data = (http or get_http_client()).get_json(UNSPLASH_API_URL, params=params)
         if data['results']:
             # Use 'small' or 'regular' depending on quality preference, 'regular' is typical for full display
             return data['results'][0]['urls']['regular'] 
         else:
             return KNOWN_CITIES.get(city_name.lower(), None)
             
-    except requests.exceptions.RequestException:
-        # Fallback to local image if Unsplash fails or key is invalid
+    except requests.exceptions.HTTPError as e:
+        if e.response is None or e.response.status_code in RETRYABLE_STATUSES:
+            raise
+        # Fallback to local image if the key or query is rejected; that answer is worth caching
         return KNOWN_CITIES.get(city_name.lower(), None)
 
+def refresh_landmark(city_key, landmark_name):
+    """Re-fetches a city's landmark into the shared cache (the prefetch scheduler's landmark warmer)."""
+    get_weather_cache().set("landmark", city_key, fetch_unsplash_image_url(landmark_name, get_http_client()))
+
+
+@st.cache_resource
+def get_weather_cache():
+    """Process-wide WeatherAPI/Unsplash response cache shared by every session.
+
+    Concurrent misses for the same (endpoint, city) from different sessions are
+    coalesced into a single upstream request, and responses are written through
+    to the on-disk store so restarted and sibling replicas start warm.
+    """
+    return ResponseCache(
+        ttls={"current": CURRENT_CACHE_TTL, "forecast": FORECAST_CACHE_TTL, "landmark": LANDMARK_CACHE_TTL,
+              "not_found": NOT_FOUND_CACHE_TTL},
+        stale_ttl=CACHE_STALE_TTL,
+        max_bytes=CACHE_MAX_BYTES,
+        flights=SingleFlight(),
+        store=DiskCache(DISK_CACHE_PATH) if DISK_CACHE_PATH else None,
+    )
+
+@st.cache_resource
+def get_fetch_executor():
+    """Process-wide worker pool used to overlap independent upstream calls."""
+    return ThreadPoolExecutor(max_workers=FETCH_WORKERS, thread_name_prefix="weather-fetch")
+
+@st.cache_resource
+def get_metrics():
+    """Process-wide latency histograms and counters."""
+    metrics = Metrics()
+    metrics.describe("weather_phase_seconds", "Wall time of each search/render phase.")
+    metrics.describe("weather_upstream_request_seconds", "Wall time of each upstream HTTP attempt.")
+    metrics.describe("weather_upstream_responses_total", "Upstream attempts by endpoint and status code or failure kind.")
+    metrics.describe("weather_upstream_retries_total", "Upstream attempts that were retries.")
+    metrics.describe("weather_bulk_lookups_total", "WeatherAPI lookups by route: direct, batched or retried_singly.")
+    metrics.describe("weather_bulk_requests_total", "Bulk requests sent to WeatherAPI.")
+    return metrics
+
+@st.cache_resource
+def get_rate_limiter():
+    """Process-wide per-key call budgets for WeatherAPI and Unsplash (this replica's share)."""
+    return RateLimiter(
+        {"WeatherAPI": WEATHERAPI_HOURLY_QUOTA / REPLICAS, "Unsplash": UNSPLASH_HOURLY_QUOTA / REPLICAS},
+        # By URL, not host: both may be served from one host (e.g. bench/stub_server.py)
+        routes={WEATHERAPI_BASE_URL: "WeatherAPI", UNSPLASH_API_URL: "Unsplash"},
+        burst_window=RATE_LIMIT_BURST_WINDOW,
+        background_reserve=RATE_LIMIT_BACKGROUND_RESERVE,
+        max_wait=RATE_LIMIT_MAX_WAIT,
+    )
+
+@st.cache_resource
+def get_http_client():
+    """Process-wide pooled HTTP client shared by WeatherAPI and Unsplash calls."""
+    return HttpClient(
+        connect_timeout=HTTP_CONNECT_TIMEOUT,
+        read_timeout=HTTP_READ_TIMEOUT,
+        max_retries=HTTP_MAX_RETRIES,
+        pool_size=HTTP_POOL_SIZE,
+        failure_threshold=CIRCUIT_FAILURE_THRESHOLD,
+        reset_timeout=CIRCUIT_RESET_TIMEOUT,
+        limiter=get_rate_limiter(),
+        metrics=get_metrics(),
+    )
+
+@st.cache_resource
+def get_bulk_dispatcher():
+    """Process-wide coalescer of concurrent WeatherAPI lookups, or None when bulk lookups are disabled."""
+    if BULK_WINDOW_MS <= 0:
+        return None
+    return BulkDispatcher(get_http_client(), window=BULK_WINDOW_MS / 1000, metrics=get_metrics())
+
+@st.cache_resource
+def get_render_cache():
+    """Process-wide cache of rendered card HTML, shared by every session viewing the same city."""
+    return RenderCache(max_entries=RENDER_CACHE_MAX_ENTRIES)
+
+@st.cache_resource
+def get_gazetteer():
+    """Bundled offline city index, loaded once per process."""
+    return Gazetteer.from_csv()
+
+@st.cache_resource
+def get_city_options():
+    """Type-ahead options for the city box: every bundled city, as one list shared by all sessions."""
+    return get_gazetteer().names()
+
+@st.cache_resource
+def get_history_store():
+    """Process-wide store of every observation and forecast fetched, or None when disabled."""
+    if not HISTORY_DIR:
+        return None
+    store = HistoryStore(HISTORY_DIR, retention=HISTORY_RETENTION_DAYS * 86400)
+    get_metrics().register("weather_history_store_bytes", "gauge", lambda: [({}, store.stats()["bytes"])],
+                           "Size of the on-disk observation history.")
+    return store
+
+@st.cache_resource
+def get_weather_service():
+    """Process-wide WeatherAPI service wired to the shared cache and HTTP client."""
+    return WeatherService(
+        WEATHERAPI_KEY,
+        get_http_client(),
+        cache=get_weather_cache(),
+        fetch_mode=FETCH_MODE,
+        forecast_days=FORECAST_DAYS,
+        gazetteer=get_gazetteer(),
+        current_url=WEATHERAPI_CURRENT_URL,
+        forecast_url=WEATHERAPI_FORECAST_URL,
+        history=get_history_store(),
+        batcher=get_bulk_dispatcher(),
+    )
+
+@st.cache_resource
+def get_prefetch_scheduler():
+    """Process-wide cache-warming thread, seeded with the cities that have bundled landmark images."""
+    tracker = PopularityTracker(half_life=PREFETCH_HALF_LIFE)
+    service = get_weather_service()
+    for name in KNOWN_CITIES:
+        _, city_key, place = service.resolve(name)
+        tracker.record(city_key, place.name if place else name, weight=0.5)
+    scheduler = PrefetchScheduler(
+        service,
+        tracker,
+        top_n=PREFETCH_TOP_N,
+        lead_time=PREFETCH_LEAD_TIME,
+        interval=PREFETCH_INTERVAL,
+        max_calls_per_hour=int(WEATHERAPI_HOURLY_QUOTA / REPLICAS * PREFETCH_QUOTA_SHARE),
+        # Without a key the landmark is a bundled image and costs no call, so there is nothing to warm
+        refresh_landmark=refresh_landmark if UNSPLASH_ACCESS_KEY else None,
+        max_landmark_calls_per_hour=int(UNSPLASH_HOURLY_QUOTA / REPLICAS * PREFETCH_QUOTA_SHARE),
+    )
+    if WEATHERAPI_KEY and scheduler.max_calls_per_hour > 0:
+        scheduler.start()
+    return scheduler
+
+@st.cache_resource
+def get_metrics_server():
+    """Starts the /metrics sidecar once per process and wires the shared components into it."""
+    metrics = get_metrics()
+    cache, http, limiter, scheduler = get_weather_cache(), get_http_client(), get_rate_limiter(), get_prefetch_scheduler()
+    metrics.register("weather_cache_events_total", "counter", lambda: (
+        ({"event": k}, v) for k, v in cache.stats().items() if k not in ("entries", "bytes", "hit_ratio")
+    ), "Response cache lookups by outcome.")
+    render_cache = get_render_cache()
+    metrics.register("weather_render_cache_events_total", "counter", lambda: (
+        ({"event": k}, render_cache.stats()[k]) for k in ("hits", "misses", "evictions")
+    ), "Rendered card cache lookups by outcome.")
+    metrics.register("weather_render_cache_saved_seconds_total", "counter",
+                     lambda: [({}, render_cache.stats()["saved_seconds"])],
+                     "Card render time avoided by render cache hits.")
+    metrics.register("weather_cache_bytes", "gauge", lambda: [({}, cache.stats()["bytes"])],
+                     "Approximate size of the in-memory response cache.")
+    metrics.register("weather_quota_tokens", "gauge", lambda: (
+        ({"key": name}, tokens) for name, (tokens, _) in limiter.remaining().items()
+    ), "Calls left in each API key's token bucket.")
+    metrics.register("weather_circuit_open", "gauge", lambda: (
+        ({"host": host}, int(state != "closed")) for host, state in http.breaker_states().items()
+    ), "1 while a host's circuit breaker is open or half-open.")
+    metrics.register("weather_prefetch_events_total", "counter", lambda: (
+        ({"event": k}, v) for k, v in scheduler.stats().items() if not k.endswith("budget_remaining")
+    ), "Cache-warming scheduler activity.")
+    if not METRICS_PORT:
+        return None
+    try:
+        return MetricsServer(metrics, host=METRICS_HOST, port=METRICS_PORT).start()
+    except OSError:
+        # Another replica on this host already owns the port; this one just isn't scraped
+        return None
+
+@st.cache_resource
+def get_image_server():
+    """Starts the public /images/ listener once per process, apart from /metrics so that stays private."""
+    if not IMAGE_PROXY_PORT:
+        return None
+    try:
+        return MetricsServer(None, host=IMAGE_PROXY_HOST, port=IMAGE_PROXY_PORT).start()
+    except OSError:
+        # Another replica on this host already serves the shared image store on this port
+        return None
+
+
+@st.cache_resource
+def get_image_proxy():
+    """Process-wide image proxy over the shared on-disk store; mounted on this process's listener if it has one."""
+    if IMAGE_PROXY_URL == "off":
+        return None
+    fallbacks = {}
+    default_background = os.path.join(
+        APP_DIR, STATIC_DIR, variant_name(DEFAULT_BACKGROUND_IMAGE, BACKGROUND_VARIANT_WIDTH, "webp")
+    )
+    if os.path.exists(default_background):
+        with open(default_background, "rb") as f:
+            fallbacks["background"] = f.read()
+    metrics = get_metrics()
+    proxy = ImageProxy(get_http_client(), ImageStore(IMAGE_CACHE_DIR, IMAGE_CACHE_MAX_BYTES),
+                       fallbacks=fallbacks, metrics=metrics)
+    metrics.describe("weather_image_proxy_total", "Image proxy requests by outcome.")
+    metrics.register("weather_image_store_bytes", "gauge", lambda: [({}, proxy.store.stats()["bytes"])],
+                     "Size of the on-disk resized image store.")
+    server = get_image_server()
+    if server is not None:
+        proxy.mount(server)
+    return proxy
+
+def image_proxy_base_url():
+    """Where the browser reaches the proxy, or None if it can't (then images are hotlinked)."""
+    if IMAGE_PROXY_URL:
+        return None if IMAGE_PROXY_URL == "off" else IMAGE_PROXY_URL.rstrip("/")
+    page = urlsplit(st.context.url or "")
+    if page.scheme != "http" or not page.hostname or not IMAGE_PROXY_PORT:
+        return None  # an https page would block the plain-HTTP listener as mixed content
+    host = f"[{page.hostname}]" if ":" in page.hostname else page.hostname
+    return f"http://{host}:{IMAGE_PROXY_PORT}"
+
+def proxied_image_url(url, variant):
+    """Rewrites a remote image URL to its resized, locally cached copy when the proxy is reachable."""
+    base = image_proxy_base_url() if url else None
+    if base is None:
+        return url
+    return base + get_image_proxy().path_for(url, variant)
+
+
+@st.cache_resource
+def get_app_context():
+    """Translations, palettes and chart specs, resolved per (language, theme) once per process."""
+    return AppContext()
+
+def current_ui():
+    """The resolved strings, palette and chart specs for this session's language and theme."""
+    return get_app_context().table(st.session_state.get('language', 'english'), st.session_state.get('theme', 'light'))
 
 def get_translation(key):
-    """Retrieves the translated text for a given key."""
-    lang = st.session_state.get('language', 'english')
-    return TRANSLATIONS.get(lang, {}).get(key, TRANSLATIONS['english'][key])
+    """Retrieves the translated text for a given key (functions using several take ``current_ui().text`` once)."""
+    return current_ui().text(key)
 
 def update_theme(theme_choice):
     """Callback to update the internal theme state."""
-    st.session_state['theme'] = 'dark' if 'Dark' in theme_choice or 'गहरा' in theme_choice else 'light'
+    st.session_state['theme'] = get_app_context().theme_by_label.get(theme_choice, 'light')
+
+def update_search_mode(mode_choice):
+    """Callback to update the internal search mode state."""
+    st.session_state['search_mode'] = get_app_context().mode_by_label.get(mode_choice, 'single')
 
 
 # ---- CRITICAL FIX: CONSOLIDATED FETCH FUNCTION ----
 
+def report_city_not_found(city):
+    """Sets the not-found error along with 'Did you mean' suggestions from the gazetteer."""
+    st.session_state['error_message'] = get_translation("city_not_found").format(city.title())
+    st.session_state['suggestions'] = [place.name for place in get_gazetteer().suggest(city)]
+
+def apply_suggestion(city_name):
+    """Callback for a suggestion button: searches for the suggested city."""
+    st.session_state['city_input'] = city_name
+    fetch_and_render_weather_data()
+
+@get_metrics().timed("search")
 def fetch_and_render_weather_data():
     """
     Handles all API calls and updates session state with weather data, background, 
     and landmark image URL.
     """
-    T = get_translation
     city = st.session_state.city_input
     
     # Clear previous error and data on new search attempt
     st.session_state['error_message'] = None
-    st.session_state['current_weather_data'] = None
+    st.session_state['suggestions'] = []
+    st.session_state['weather_view'] = None
+    st.session_state['weather_analytics'] = None
+    st.session_state['city_key'] = None
     st.session_state['background_url'] = None
+    st.session_state['pending_search'] = None
     st.session_state['search_triggered'] = False
     
     if not city:
@@ -210,47 +512,112 @@ def fetch_and_render_weather_data():
         st.session_state['error_message'] = "Weather API Key is missing. Please check your secrets configuration."
         return
 
+    cache = get_weather_cache()
+    http = get_http_client()  # resolved here: the landmark lookup may run on a worker thread
+    service = get_weather_service()
+
+    metrics = get_metrics()
+
+    # Resolve spelling variants to one canonical place; known-bad names never reach the network
+    with metrics.span("resolve"):
+        _, city_key, place = service.resolve(city)
+    if cache.get("not_found", city_key):
+        report_city_not_found(city)
+        return
+    st.session_state['city_key'] = city_key  # names the city's series in the history store
+    landmark_name = place.name if place else city
+
+    def fetch_landmark():
+        try:
+            return cache.get_or_fetch("landmark", city_key, lambda: fetch_unsplash_image_url(landmark_name, http))
+        except requests.exceptions.RequestException:
+            # Unsplash is down or over quota: the last image seen, however old, then the bundled one
+            return cache.last_known("landmark", city_key) or KNOWN_CITIES.get(landmark_name.lower(), None)
+
+    if PROGRESSIVE_RENDERING and FETCH_MODE != "sequential":
+        # Only start the work here; render_progressive_results() paints each part as it lands
+        start_progressive_search(service, city, city_key, landmark_name, fetch_landmark)
+        return
+
     try:
-        # 1. Fetch Current Weather
-        current_url = f"{WEATHERAPI_CURRENT_URL}?key={WEATHERAPI_KEY}&q={city}&aqi=no"
-        current_res = requests.get(current_url)
-        current_res.raise_for_status() 
-        current_data = current_res.json()
+        # 1. In combined mode, start the landmark lookup on the worker pool right away;
+        #    it does not depend on the weather data
+        image_future = get_fetch_executor().submit(fetch_landmark) if FETCH_MODE == "combined" else None
 
+        # 2. Fetch Current Weather and Forecast (served from the shared cache when possible)
+        with metrics.span("weather"):
+            current_data, forecast_data = service.fetch_payloads(city)
         if 'error' in current_data:
-            st.session_state['error_message'] = T("city_not_found").format(city.title())
+            report_city_not_found(city)
             return
-        
-        # 2. Update Dynamic Background URL in state
-        main_condition_text = current_data['current']['condition']['text']
-        bg_url = get_weather_background_url(main_condition_text)
+        get_prefetch_scheduler().tracker.record(city_key, landmark_name)
+
+        # 3. Update Dynamic Background URL in state
+        bg_url = get_weather_background_url(current_data['current']['condition'])
         st.session_state['background_url'] = bg_url
-        
-        # 3. Fetch Forecast Data
-        forecast_url = f"{WEATHERAPI_FORECAST_URL}?key={WEATHERAPI_KEY}&q={city}&days=3"
-        forecast_res = requests.get(forecast_url)
-        forecast_res.raise_for_status() 
-        forecast_data = forecast_res.json()
-        
-        # 4. Fetch City Landmark Image (using cached function)
-        city_image_url = fetch_unsplash_image_url(city)
+
+        # 4. Fetch City Landmark Image (already in flight in combined mode)
+        with metrics.span("landmark"):
+            city_image_url = image_future.result() if image_future else fetch_landmark()
         st.session_state['city_image_url'] = city_image_url
         
-        # 5. Save ALL data to state
-        st.session_state['current_weather_data'] = current_data
-        st.session_state['forecast_data'] = forecast_data
+        # 5. Save the compact parsed view to state (raw payloads stay in the shared cache)
+        st.session_state['weather_view'] = build_weather_view(current_data, forecast_data)
+        with metrics.span("analytics"):
+            st.session_state['weather_analytics'] = analyze(forecast_data)
         st.session_state['search_triggered'] = True
         
-    except requests.exceptions.HTTPError as e:
+    except Exception as e:
+        st.session_state['error_message'] = describe_fetch_error(e)
+
+def describe_fetch_error(e):
+    """Maps an exception raised while fetching a city to the message shown to the user."""
+    T = current_ui().text
+    if isinstance(e, requests.exceptions.HTTPError):
         # Handles 400 (Bad Request), 401 (Unauthorized - usually bad key), 404, etc.
-        error_msg = f"API Request Failed ({e.response.status_code}). Check city name or API Key."
-        st.session_state['error_message'] = error_msg
-    except requests.exceptions.RequestException as e:
+        return f"API Request Failed ({e.response.status_code}). Check city name or API Key."
+    if isinstance(e, QuotaExceededError):
+        # Nothing cached to fall back on and no budget left to ask upstream
+        return T("quota_exhausted")
+    if isinstance(e, requests.exceptions.RequestException):
         # Handles Network issues (connection refused, timeouts)
-        st.session_state['error_message'] = T("error_fetching").format(f"Network error: {e}")
-    except Exception as e:
-        # General catch for unexpected errors
-        st.session_state['error_message'] = T("error_fetching").format(f"An unexpected error occurred: {e}")
+        return T("error_fetching").format(f"Network error: {e}")
+    # General catch for unexpected errors
+    return T("error_fetching").format(f"An unexpected error occurred: {e}")
+
+def split_future(future):
+    """Turns a future of (current_data, forecast_data) into one future per payload."""
+    current_future, forecast_future = Future(), Future()
+
+    def done(f):
+        if f.exception() is not None:
+            current_future.set_exception(f.exception())
+            forecast_future.set_exception(f.exception())
+        else:
+            current_data, forecast_data = f.result()
+            current_future.set_result(current_data)
+            forecast_future.set_result(forecast_data)
+
+    future.add_done_callback(done)
+    return current_future, forecast_future
+
+def start_progressive_search(service, city, city_key, landmark_name, fetch_landmark):
+    """Submits the weather and landmark lookups and leaves their futures in session state."""
+    executor = get_fetch_executor()
+    if FETCH_MODE == "progressive":
+        current_future = executor.submit(service.fetch_current, city)
+        forecast_future = executor.submit(service.fetch_forecast, city)
+    else:
+        current_future, forecast_future = split_future(executor.submit(service.fetch_payloads, city))
+    st.session_state['pending_search'] = {
+        "city_key": city_key,
+        "landmark_name": landmark_name,
+        "current": current_future,
+        "forecast": forecast_future,
+        "landmark": executor.submit(fetch_landmark),
+        "started": time.perf_counter(),
+    }
+    st.session_state['search_triggered'] = True
 
 
 # ---- PAGE CONFIG ----
@@ -259,366 +626,637 @@ st.set_page_config(page_title="Weather Now", page_icon="☁️", layout="wide")
 
 # ---- DYNAMIC CSS FUNCTION ----
 
-def apply_dynamic_css(dynamic_bg_style):
-    
-    is_dark = st.session_state.theme == 'dark'
-    
-    # Define colors based on theme
-    bg_color_main = "#1e1e1e" if is_dark else "#333333"
-    text_color = "#f0f2f6" if is_dark else "#333333"
-    accent_color = "#4CAF50" if is_dark else "#6A5ACD"
-    card_bg = "rgba(0, 0, 0, 0.4)" if is_dark else "rgba(255, 255, 255, 0.7)"
-    input_bg = "rgba(50, 50, 50, 0.7)" if is_dark else "rgba(255, 255, 255, 0.4)"
-    border_color = "rgba(255, 255, 255, 0.2)" if is_dark else "rgba(255, 255, 255, 0.8)"
-    metric_bg = "rgba(50, 50, 50, 0.7)" if is_dark else "rgba(255, 255, 255, 0.4)"
-    
-    css = f"""
+# Theme-independent rules; every color and the background come from the theme's variables
+# (weather_now.ui.THEME_PALETTES, emitted by render_theme_selector())
+STATIC_STYLESHEET = """
     <style>
     /* 1. App background: Dynamic injection of image or gradient */
-    .stApp {{
+    .stApp {
         background: none !important;
-        color: {bg_color_main};
+        color: var(--main-color);
         backdrop-filter: blur(0px); 
         -webkit-backdrop-filter: blur(0px);
         transition: color 0.5s;
-    }}
+    }
 
     /* New CSS rule for the blurred background image (pseudo-element) */
-    .stApp::before {{
+    .stApp::before {
         content: "";
         position: fixed; 
         top: 0;
         left: 0;
         width: 100%;
         height: 100%;
-        background: {dynamic_bg_style} !important;
+        background: var(--app-bg) !important;
         background-size: cover !important;
         z-index: -1; 
         transition: background-image 1s ease-in-out, filter 0.5s;
         /* Darken and blur the background image */
-        filter: blur(8px) brightness({0.6 if is_dark else 1.0}); 
-        -webkit-filter: blur(8px) brightness({0.6 if is_dark else 1.0});
-    }}
+        filter: blur(8px) brightness(var(--bg-brightness)); 
+        -webkit-filter: blur(8px) brightness(var(--bg-brightness));
+    }
+    /* Typed image-set() (WebP first) where the browser parses it; a var() it cannot parse would
+       blank the background rather than fall back, so --app-bg keeps a plain url() for the rest */
+    @supports (background-image: image-set(url("a.webp") type("image/webp"))) {
+        .stApp::before {
+            background: var(--app-bg-set, var(--app-bg)) !important;
+            background-size: cover !important;
+        }
+    }
 
     /* 2. Text color for general elements (dynamic based on theme) */
-    .stText, .stMarkdown, .stSubheader, .stTitle, h1, h2, h3, h4, p, label {{
-        color: {text_color} !important;
-    }}
+    .stText, .stMarkdown, .stSubheader, .stTitle, h1, h2, h3, h4, p, label {
+        color: var(--text-color) !important;
+    }
     
     /* FIX: Sidebar Headers and Radio Labels MUST be white (Light & Dark Mode) */
     [data-testid="stSidebarContent"] h2,
     [data-testid="stSidebarContent"] label,
-    [data-testid="stSidebarContent"] div p {{ 
+    [data-testid="stSidebarContent"] div p { 
         color: white !important;
-    }}
+    }
 
     /* Title Color */
-    .centered-title h1 {{
+    .centered-title h1 {
         text-align: center; !important;
         font-weight: 900;
         letter-spacing: 2px;
-        color: {accent_color};
+        color: var(--accent-color);
         text-shadow: 2px 2px 4px rgba(0, 0, 0, 0.1);
-    }}
+    }
     
     /* Input Styling */
-    .stTextInput input {{
-        color: {text_color} !important;
-        background-color: {input_bg} !important;
-        border: 1px solid {border_color} !important;
+    .stSelectbox [data-baseweb="select"] > div {
+        color: var(--text-color) !important;
+        background-color: var(--input-bg) !important;
+        border: 1px solid var(--border-color) !important;
         padding: 10px;
         border-radius: 10px;
-    }}
+    }
     
     /* 3. Floating 'Glassmorphism' card effect for all components */
-    .card {{
-        background: {card_bg};
+    .card {
+        background: var(--card-bg);
         backdrop-filter: blur(10px);
         border-radius: 20px;
         padding: 20px;
         margin-bottom: 15px;
         box-shadow: 0 8px 32px 0 rgba(0, 0, 0, 0.1);
-        border: 1px solid {border_color};
+        border: 1px solid var(--border-color);
         transition: transform 0.3s, box-shadow 0.3s;
-    }}
+    }
     
     /* 5. Metric component styling */
-    div[data-testid="stMetric"] > div {{
-        background: {metric_bg};
-        border: 1px solid {border_color};
+    div[data-testid="stMetric"] > div {
+        background: var(--metric-bg);
+        border: 1px solid var(--border-color);
         border-radius: 15px;
         padding: 8px 10px;
         text-align: center;
         transition: transform 0.3s, box-shadow 0.3s;
-    }}
-    div[data-testid="stMetric"] label {{
-        color: {accent_color} !important;
+    }
+    div[data-testid="stMetric"] label {
+        color: var(--accent-color) !important;
         font-weight: bold;
         font-size: 0.9rem;
         margin-bottom: -5px;
-    }}
-    div[data-testid="stMetric"] div:nth-child(2) {{
-        color: {text_color} !important;
+    }
+    div[data-testid="stMetric"] div:nth-child(2) {
+        color: var(--text-color) !important;
         font-size: 1.5rem;
-    }}
+    }
     
     /* H1 (Temperature) margin */
-    .main-weather-card h1 {{
+    .main-weather-card h1 {
         font-size: 5rem;
-        color: {text_color};
+        color: var(--text-color);
         margin-bottom: -15px !important;
         margin-top: 0px !important;
-    }}
+    }
     /* H3 (Condition) margin */
-    .main-weather-card h3 {{
-        color: {accent_color};
+    .main-weather-card h3 {
+        color: var(--accent-color);
         margin-top: 5px !important;
         margin-bottom: 5px !important;
-    }}
+    }
     
     /* Style for the date in forecast cards */
-    .forecast-card .date-text {{
+    .forecast-card .date-text {
         font-size: 0.85rem;
-        color: {accent_color} !important;
+        color: var(--accent-color) !important;
         margin: -5px 0 5px 0 !important;
-    }}
+    }
     
     /* Hide the default Streamlit footer elements */
-    .stDeployButton, .st-emotion-cache-1r6r8q0 {{ 
+    .stDeployButton, .st-emotion-cache-1r6r8q0 { 
         display: none !important; 
-    }}
+    }
     
     /* Hover effects */
-    .forecast-card:hover, div[data-testid="stMetric"] > div:hover {{
+    .forecast-card:hover, div[data-testid="stMetric"] > div:hover {
         transform: translateY(-8px);
         box-shadow: 0 20px 40px 0 rgba(0, 0, 0, 0.2);
-    }}
-    div[data-testid="stMetric"] > div:hover {{
+    }
+    div[data-testid="stMetric"] > div:hover {
         transform: translateY(-5px);
         box-shadow: 0 10px 20px 0 rgba(0, 0, 0, 0.15);
-    }}
-    .main-weather-card {{
+    }
+    .main-weather-card {
         transition: none !important;
         transform: none !important;
         box-shadow: 0 8px 32px 0 rgba(0, 0, 0, 0.1) !important;
-    }}
-    .stTextInput label {{
-        display: none;
-    }}
+    }
+    /* Skeleton placeholders shown while progressive results are still loading */
+    .skeleton {
+        background: linear-gradient(90deg, var(--metric-bg) 25%, var(--border-color) 50%, var(--metric-bg) 75%);
+        background-size: 200% 100%;
+        animation: skeleton-shimmer 1.2s ease-in-out infinite;
+        border-radius: 10px;
+    }
+    .skeleton-line {
+        height: 1rem;
+        margin: 12px auto;
+    }
+    .skeleton-image {
+        height: 280px;
+    }
+    @keyframes skeleton-shimmer {
+        0% { background-position: 200% 0; }
+        100% { background-position: -200% 0; }
+    }
 
     </style>
-    """
-    st.markdown(css, unsafe_allow_html=True)
+"""
 
-# ---- DYNAMIC BACKGROUND LOGIC (Run Before Content) ----
+def background_variables(style, preferred_style=None):
+    """The background's CSS variables; ``initial`` clears a previous image-set so ``--app-bg`` applies."""
+    return f"--app-bg: {style}; --app-bg-set: {preferred_style or 'initial'};"
 
-# 1. Determine the default background
-local_image_path = "bright_day_light.jpg"
-base64_image = get_base64_image(local_image_path)
+def build_theme_css(theme_variables, bg_variables):
+    """The small variables block: the theme's pre-rendered declarations plus the background."""
+    return f"<style>:root {{ {theme_variables}{bg_variables} }}</style>"
 
-if base64_image:
-    default_bg = f"url('data:image/jpeg;base64,{base64_image}') no-repeat center center fixed"
-else:
-    if st.session_state.theme == 'dark':
-        default_bg = 'linear-gradient(135deg, #1C2833 0%, #2C3E50 50%, #4A637A 100%)'
-    else:
-        default_bg = 'linear-gradient(135deg, #CFD8DC 0%, #B0BEC5 50%, #78909C 100%)' 
+def build_background_css(bg_variables):
+    """Overrides only the background variables, leaving the theme colors to render_theme_selector()."""
+    return f"<style>:root {{ {bg_variables} }}</style>"
 
-# 2. Use the fetched background URL if available, otherwise use default/theme-based
-dynamic_bg_style = default_bg
-if st.session_state.get('background_url'):
-    dynamic_bg_style = f"url('{st.session_state.background_url}') no-repeat center center fixed"
-        
-# --- Apply CSS after background is determined ---
-apply_dynamic_css(dynamic_bg_style)
+# ---- DYNAMIC BACKGROUND LOGIC ----
+
+def current_background_variables():
+    """The fetched weather background if there is one, else the default (resolved once per process and theme)."""
+    if st.session_state.get('background_url'):
+        return background_variables(
+            f"url('{proxied_image_url(st.session_state.background_url, 'background')}') no-repeat center center fixed"
+        )
+    return background_variables(*get_default_background_style(st.session_state.theme))
+
+# --- Static rules once per full run; the variables are emitted by render_theme_selector() ---
+with get_metrics().span("css"):
+    st.markdown(STATIC_STYLESHEET, unsafe_allow_html=True)
 
 
 # ---- SIDEBAR FOR THEME AND LANGUAGE ----
 
-def format_language_display(lang_key):
-    if lang_key == 'english':
-        return 'English'
-    return 'हिंदी (Hindi)'
+ui = current_ui()  # this rerun's language; the theme selector resolves its own table
 
-st.sidebar.markdown(f"## {get_translation('language_selector')}")
+st.sidebar.markdown(f"## {ui.text('language_selector')}")
 st.sidebar.radio(
     " ",
     ['english', 'hindi'], 
     key='language',
     index=0 if st.session_state.language == 'english' else 1,
-    format_func=format_language_display
+    format_func=LANGUAGE_NAMES.get
 )
 
 st.sidebar.markdown("---")
 
-st.sidebar.markdown(f"## {get_translation('theme_selector')}")
+@st.fragment
+def render_theme_selector():
+    """
+    Theme radio plus the theme's CSS variables. Every color on the page reads those
+    variables, so a toggle reruns only this fragment instead of the whole script.
+    """
+    with get_metrics().span("theme"):
+        ui = current_ui()
+        st.markdown(build_theme_css(ui.theme_variables, current_background_variables()), unsafe_allow_html=True)
+        st.markdown(f"## {ui.text('theme_selector')}")
+        st.radio(
+            " ",
+            ui.theme_options,
+            key='theme_choice',
+            index=0 if st.session_state.theme == 'light' else 1,
+            on_change=lambda: update_theme(st.session_state.theme_choice)
+        )
+
+# Language and mode change every label or the whole layout, so they stay full reruns
+with st.sidebar:
+    render_theme_selector()
+
+st.sidebar.markdown("---")
+
+st.sidebar.markdown(f"## {ui.text('mode_selector')}")
 st.sidebar.radio(
     " ",
-    [get_translation('light_mode'), get_translation('dark_mode')],
-    key='theme_choice',
-    index=0 if st.session_state.theme == 'light' else 1,
-    on_change=lambda: update_theme(st.session_state.theme_choice)
+    ui.mode_options,
+    key='search_mode_choice',
+    index=0 if st.session_state.search_mode == 'single' else 1,
+    on_change=lambda: update_search_mode(st.session_state.search_mode_choice)
 )
 
+st.sidebar.markdown("---")
+
+st.sidebar.markdown(f"## {ui.text('api_budget')}")
+for name, (tokens_left, capacity) in get_rate_limiter().remaining().items():
+    st.sidebar.caption(ui.text('api_budget_detail').format(name, int(tokens_left), int(capacity)))
+
 
 # ---- RENDER FUNCTIONS ----
 
 def render_weather_results():
     """Renders the main weather content using data from session state."""
     
-    T = get_translation
+    T = current_ui().text
     
+    # A search started by the progressive path is still landing; paint it piece by piece
+    if st.session_state.get('pending_search'):
+        render_progressive_results(st.session_state.pending_search)
+        return
+
     # Check if data is available
-    if not st.session_state.get('current_weather_data') or not st.session_state.get('forecast_data'):
+    view = st.session_state.get('weather_view')
+    if not view:
         # If search was triggered but data is missing (due to an error), we exit render.
         return 
     
     city = st.session_state.city_input
-    current_res = st.session_state.current_weather_data
-    forecast_res = st.session_state.forecast_data
     image_url = st.session_state.city_image_url # Use the URL fetched and cached in the state
     
-    # Get dynamic colors for inlined HTML
-    accent = "#4CAF50" if st.session_state.theme == 'dark' else "#6A5ACD"
-    text = "#f0f2f6" if st.session_state.theme == 'dark' else "#333333"
-
-    
     # --- Columns and Content ---
     left_col_main, right_col_main = st.columns([1.5, 3]) 
 
     # --- LEFT COLUMN: IMAGE ---
     with left_col_main:
-        if image_url:
-            # Using st.image for better Streamlit compatibility, although custom CSS is applied to the HTML element
-            st.markdown(f'<img class="card city-image" style="width:100%; height:auto;" src="{image_url}" alt="{city} landmark">', unsafe_allow_html=True)
-        else:
-            st.markdown(f"<div class='card' style='text-align: center;'><h2 style='color: {accent};'>🏙️ {city.title()} {T('weather')}</h2><p style='color: {text};'>{T('landmark_unavailable')}</p></div>", unsafe_allow_html=True)
+        render_landmark(city, image_url, with_heading=True)
 
-    # --- RIGHT COLUMN: MAIN WEATHER DATA (WeatherAPI Parsing) ---
-    current = current_res['current']
-    
-    temp = current['temp_c']
-    feels_like = current['feelslike_c']
-    humidity = current['humidity']
-    wind_speed = current['wind_kph'] * 1000 / 3600 # Convert kph to m/s
-    pressure = current['pressure_mb'] * 1.0 # Convert mb to hPa (1mb = 1hPa)
-    condition_description = current['condition']['text'].title()
-    main_condition_text = current['condition']['text'].lower()
-    
+    # --- RIGHT COLUMN: MAIN WEATHER DATA (parsed once at fetch time) ---
     with right_col_main:
-        st.markdown('<div class="card main-weather-card">', unsafe_allow_html=True)
-        
-        # 1. City Heading (only if image is present on the left)
-        if image_url: 
-             st.markdown(f"<h2 style='color: {accent}; margin-top: 0px;'>🏙️ {city.title()} {T('weather')}</h2>", unsafe_allow_html=True)
-        
-        # 2. Temperature and Condition
-        st.markdown(f"""
-            <h1 class="main-temp">
-                {temp:.0f} °C
-            </h1>
-            <h3 class="main-condition">
-                {condition_description}
-            </h3>
-        """, unsafe_allow_html=True)
-        
-        # 3. Metrics Row
-        col1, col2, col3, col4 = st.columns(4)
-        col1.metric(T("feels_like"), f"{feels_like:.0f} °C")
-        col2.metric(T("humidity"), f"{humidity} %")
-        col3.metric(T("wind_speed"), f"{wind_speed:.1f} m/s")
-        col4.metric(T("pressure"), f"{pressure:.0f} hPa")
-        
-        st.markdown('</div>', unsafe_allow_html=True) # End of Main Card
+        # City heading only if the image is present on the left
+        render_main_card(city, view, with_heading=bool(image_url))
 
     # Severe alert
-    if any(keyword in main_condition_text for keyword in ["thunder", "rain", "heavy", "snow", "sleet"]):
+    if view.severe:
         st.error(T("severe_alert"))
         
     st.markdown("---") 
 
     # ---- 3-DAY FORECAST ----
-    st.markdown(f"<h2 style='color: {accent};'>{T('forecast_header')}</h2>", unsafe_allow_html=True)
+    render_forecast_header()
+    render_forecast_cards(city, view.forecast)
+
+    # ---- EXTENDED OUTLOOK (hourly analytics) ----
+    render_outlook(st.session_state.get('weather_analytics'))
+
+    # ---- OBSERVED HISTORY ----
+    render_history(st.session_state.get('city_key'), view)
+
+
+def render_landmark(city, image_url, with_heading):
+    """Landmark image, or a fallback card when none is available."""
+    T = current_ui().text
+    if image_url:
+        # Using st.image for better Streamlit compatibility, although custom CSS is applied to the HTML element
+        src = proxied_image_url(image_url, "landmark")
+        st.markdown(f'<img class="card city-image" style="width:100%; height:auto;" src="{src}" alt="{city} landmark">', unsafe_allow_html=True)
+    else:
+        heading = f"<h2 style='color: var(--accent-color);'>🏙️ {city.title()} {T('weather')}</h2>" if with_heading else ""
+        st.markdown(f"<div class='card' style='text-align: center;'>{heading}<p style='color: var(--text-color);'>{T('landmark_unavailable')}</p></div>", unsafe_allow_html=True)
+
+
+def card_key(kind, city, data):
+    """
+    Render cache key: the city, the parsed data itself (its own version) and the language.
+    The theme is not part of it: cards only reference the theme's CSS variables.
+    """
+    return (kind, city.title(), data, st.session_state.language)
+
+
+def render_main_card(city, view, with_heading):
+    """Temperature, condition and the metrics row."""
+    heading_html, metric_row = get_render_cache().get_or_render(
+        card_key("main", city, (view._replace(forecast=None), with_heading)),
+        lambda: build_main_card(city, view, with_heading),
+    )
+
+    st.markdown('<div class="card main-weather-card">', unsafe_allow_html=True)
+    st.markdown(heading_html, unsafe_allow_html=True)
     
-    if 'forecast' in forecast_res and 'forecastday' in forecast_res['forecast']:
-        
-        forecast_days = forecast_res['forecast']['forecastday']
-        forecast_cols = st.columns(min(len(forecast_days), 3)) 
+    # Metrics Row
+    for col, (label, value) in zip(st.columns(4), metric_row):
+        col.metric(label, value)
+    
+    st.markdown('</div>', unsafe_allow_html=True) # End of Main Card
+
+
+def build_main_card(city, view, with_heading):
+    """Returns (heading HTML, ((metric label, value), ...)) for the main card."""
+    T = current_ui().text
+    
+    # 1. City Heading
+    heading = ""
+    if with_heading: 
+        heading = f"<h2 style='color: var(--accent-color); margin-top: 0px;'>🏙️ {city.title()} {T('weather')}</h2>"
+    
+    # 2. Temperature and Condition
+    heading_html = f"""{heading}
+        <h1 class="main-temp">
+            {view.temp:.0f} °C
+        </h1>
+        <h3 class="main-condition">
+            {view.condition_description}
+        </h3>
+    """
+    
+    # 3. Metrics Row
+    metric_row = (
+        (T("feels_like"), f"{view.feels_like:.0f} °C"),
+        (T("humidity"), f"{view.humidity} %"),
+        (T("wind_speed"), f"{view.wind_speed:.1f} m/s"),
+        (T("pressure"), f"{view.pressure:.0f} hPa"),
+    )
+    return heading_html, metric_row
+
+
+def render_forecast_header():
+    st.markdown(f"<h2 style='color: var(--accent-color);'>{get_translation('forecast_header')}</h2>", unsafe_allow_html=True)
+
+
+def render_forecast_cards(city, forecast_days):
+    """One card for each of the first forecast days, or a warning when the forecast could not be fetched."""
+    if forecast_days is None:
+        st.warning(get_translation("forecast_error"))
+        return
+
+    # Only the carded days are built and keyed on; the rest of the horizon only feeds the outlook
+    shown = tuple(forecast_days[:FORECAST_CARD_DAYS])
+    cards = get_render_cache().get_or_render(card_key("forecast", city, shown), lambda: build_forecast_cards(shown))
+    for col, card_html in zip(st.columns(len(cards)), cards):
+        col.markdown(card_html, unsafe_allow_html=True)
+
+
+def render_outlook(analytics):
+    """Hourly charts and a per-day table over the whole forecast horizon."""
+    if analytics is None:
+        return
+    ui = current_ui()
+    T = ui.text
+    st.markdown(
+        f"<h2 style='color: var(--accent-color);'>{T('outlook_header').format(len(analytics.dates))}</h2>",
+        unsafe_allow_html=True,
+    )
+
+    # The analytics are already columns; the charts take them as they are, under the table's prebuilt specs
+    st.caption(T("outlook_temperature"))
+    st.vega_lite_chart(
+        chart_data(ui, "outlook_temperature", analytics.time,
+                   (analytics.temp_c, analytics.heat_index_c, analytics.dew_point_c)),
+        ui.charts["outlook_temperature"],
+    )
+    comfort, rain_risk = ui.chart_series["outlook_comfort"]
+    st.caption(T("outlook_comfort").format(PRECIP_RISK_WINDOW))
+    st.vega_lite_chart(
+        chart_data(ui, "outlook_comfort", analytics.time, (analytics.comfort, analytics.precip_risk * 100)),
+        ui.charts["outlook_comfort"],
+    )
+
+    daily = daily_summary(analytics)
+    st.dataframe(
+        {
+            T("date"): daily["date"],
+            T("min_temp"): daily["min_temp_c"],
+            T("max_temp"): daily["max_temp_c"],
+            T("max_heat_index"): daily["max_heat_index_c"],
+            comfort: daily["mean_comfort"],
+            rain_risk: daily["max_precip_risk"] * 100,
+            T("precipitation"): daily["precip_mm"],
+        },
+        hide_index=True,
+        column_config={
+            T("min_temp"): st.column_config.NumberColumn(format="%.0f °C"),
+            T("max_temp"): st.column_config.NumberColumn(format="%.0f °C"),
+            T("max_heat_index"): st.column_config.NumberColumn(format="%.0f °C"),
+            comfort: st.column_config.ProgressColumn(min_value=0, max_value=100, format="%.0f"),
+            rain_risk: st.column_config.NumberColumn(format="%.0f %%"),
+            T("precipitation"): st.column_config.NumberColumn(format="%.1f"),
+        },
+    )
+
+
+def render_history(city_key, view):
+    """Trend of the city's stored observations, and how now compares with a week earlier."""
+    store = get_history_store()
+    index = store.index(city_key) if store is not None and city_key else None
+    if index is None or "current" not in index["series"]:
+        return
+    ui = current_ui()
+    T = ui.text
+    st.markdown(f"<h2 style='color: var(--accent-color);'>{T('history_header')}</h2>", unsafe_allow_html=True)
+
+    # Anchored on the latest stored observation rather than the clock, like the API's own timestamps
+    latest = index["series"]["current"]["last"]
+    week_ago = store.nearest(city_key, latest - 7 * 86400, HISTORY_MATCH_TOLERANCE)
+    if week_ago is not None:
+        st.metric(T("vs_last_week"), f"{view.temp:.0f} °C", delta=f"{view.temp - week_ago['temp_c']:+.1f} °C")
+
+    observed = store.query(city_key, "current", start=latest - HISTORY_CHART_DAYS * 86400,
+                           columns=("temp_c", "feels_like_c"))
+    if len(observed["time"]) < 2:
+        st.caption(T("history_empty"))
+        return
+    local_time = (observed["time"] + index.get("utc_offset", 0)).astype("datetime64[s]")
+    st.caption(T("history_caption").format(HISTORY_CHART_DAYS))
+    st.vega_lite_chart(
+        chart_data(ui, "history", local_time, (observed["temp_c"], observed["feels_like_c"])), ui.charts["history"]
+    )
+
+
+def chart_data(ui, chart, time_column, columns):
+    """Names ``columns`` by the chart's translated series labels, next to the shared "time" column."""
+    return {"time": time_column, **dict(zip(ui.chart_series[chart], columns))}
+
+
+def build_forecast_cards(forecast_days):
+    """Returns the HTML of each forecast day's card."""
+    cards = []
+    for day in forecast_days:
         
-        icon_map = {
-             "clear": "☀️", "sunny": "☀️","cloud": "☁️", "rain": "🌧️", 
-             "drizzle": "☔", "thunder": "⛈️", "snow": "❄️", 
-             "mist": "🌫️", "fog": "🌫️", "haze": "🌫️",
-        }
+        date_formatted_day = day.date.strftime("%a")
+        date_formatted_date = day.date.strftime("%b %d") 
         
-        for i, daily_info in enumerate(forecast_days):
-            
-            date = daily_info["date"]
-            date_obj = datetime.strptime(date, "%Y-%m-%d")
-            date_formatted_day = date_obj.strftime("%a")
-            date_formatted_date = date_obj.strftime("%b %d") 
-            
-            day_data = daily_info["day"]
-            condition_text = day_data["condition"]["text"].lower()
-            temp_max = day_data["maxtemp_c"]
-            temp_min = day_data["mintemp_c"]
-            
-            icon = "❓"
-            for keyword, emoji in icon_map.items():
-                if keyword in condition_text:
-                    icon = emoji
-                    break
-
-            with forecast_cols[i]:
-                translated_condition = day_data["condition"]["text"].title()
-                
-                st.markdown(
-                    f"""
-                    <div class="card forecast-card" style="padding: 15px; text-align: center;">
-                        <h4 style='margin-bottom: 0px; color: {accent};'>{date_formatted_day}</h4>
-                        <p class="date-text">{date_formatted_date}</p> <p style='font-size: 2rem; margin-top: 0; margin-bottom: 10px;'>{icon}</p>
-                        <p style='font-size: 1.5rem; font-weight: bold; margin: 0; color: {text};'>{temp_max:.0f}°C / {temp_min:.0f}°C</p>
-                        <p style='font-size: 0.8rem; opacity: 0.8; margin-top: 5px; color: {text};'>{translated_condition}</p>
-                    </div>
-                    """, unsafe_allow_html=True
-                )
-    else:
-        st.warning(T("forecast_error"))
+        cards.append(f"""
+                <div class="card forecast-card" style="padding: 15px; text-align: center;">
+                    <h4 style='margin-bottom: 0px; color: var(--accent-color);'>{date_formatted_day}</h4>
+                    <p class="date-text">{date_formatted_date}</p> <p style='font-size: 2rem; margin-top: 0; margin-bottom: 10px;'>{day.icon}</p>
+                    <p style='font-size: 1.5rem; font-weight: bold; margin: 0; color: var(--text-color);'>{day.max_temp:.0f}°C / {day.min_temp:.0f}°C</p>
+                    <p style='font-size: 0.8rem; opacity: 0.8; margin-top: 5px; color: var(--text-color);'>{day.condition}</p>
+                </div>
+                """)
+    return tuple(cards)
 
 
-def display_app_content():
+# ---- PROGRESSIVE RENDERING ----
+
+SKELETON_LANDMARK = '<div class="card skeleton skeleton-image"></div>'
+SKELETON_MAIN_CARD = """
+    <div class="card main-weather-card">
+        <div class="skeleton skeleton-line" style="width: 55%; height: 2rem;"></div>
+        <div class="skeleton skeleton-line" style="width: 35%; height: 5rem;"></div>
+        <div class="skeleton skeleton-line" style="width: 45%;"></div>
+        <div class="skeleton skeleton-line" style="width: 90%; height: 4rem;"></div>
+    </div>
+"""
+SKELETON_FORECAST_CARD = """
+    <div class="card forecast-card" style="padding: 15px;">
+        <div class="skeleton skeleton-line" style="width: 40%;"></div>
+        <div class="skeleton skeleton-line" style="width: 30%; height: 2rem;"></div>
+        <div class="skeleton skeleton-line" style="width: 70%; height: 1.5rem;"></div>
+    </div>
+"""
+
+def render_progressive_results(pending):
+    """
+    Lays out skeletons, then fills the main card as soon as current conditions arrive
+    and the forecast and landmark placeholders in whichever order they complete.
+    """
+    T = current_ui().text
+    metrics = get_metrics()
+    city = st.session_state.city_input
+
+    left_col_main, right_col_main = st.columns([1.5, 3])
+    with left_col_main:
+        landmark_slot = st.empty()
+        landmark_slot.markdown(SKELETON_LANDMARK, unsafe_allow_html=True)
+    with right_col_main:
+        main_slot = st.empty()
+        main_slot.markdown(SKELETON_MAIN_CARD, unsafe_allow_html=True)
+    alert_slot = st.empty()
+    st.markdown("---")
+    render_forecast_header()
+    forecast_slot = st.empty()
+    with forecast_slot.container():
+        for col in st.columns(3):
+            col.markdown(SKELETON_FORECAST_CARD, unsafe_allow_html=True)
+    outlook_slot = st.empty()
+    history_slot = st.empty()
+
+    # 1. Current conditions: first meaningful paint
+    try:
+        current_data = pending["current"].result()
+    except Exception as e:
+        finish_progressive_search(error=describe_fetch_error(e))
+        return
+    if 'error' in current_data:
+        report_city_not_found(city)
+        finish_progressive_search()
+        return
+
+    view = build_weather_view(current_data, None)
+    with main_slot.container():
+        render_main_card(city, view, with_heading=True)
+    if view.severe:
+        alert_slot.error(T("severe_alert"))
+    bg_url = get_weather_background_url(current_data['current']['condition'])
+    st.session_state['background_url'] = bg_url
+    # The theme selector's variables were emitted before the condition was known
+    bg_style = f"url('{proxied_image_url(bg_url, 'background')}') no-repeat center center fixed"
+    st.markdown(build_background_css(background_variables(bg_style)), unsafe_allow_html=True)
+    metrics.observe("weather_phase_seconds", time.perf_counter() - pending["started"], phase="first_paint")
+
+    # 2. Forecast and landmark, in completion order
+    image_url = None
+    analytics = None
+    for future in as_completed([pending["forecast"], pending["landmark"]]):
+        try:
+            result = future.result()
+        except Exception:
+            result = None  # a missing forecast or image degrades to the fallback card
+        if future is pending["forecast"]:
+            view = build_weather_view(current_data, result)
+            with forecast_slot.container():
+                render_forecast_cards(city, view.forecast)
+            with metrics.span("analytics"):
+                analytics = analyze(result)
+            with outlook_slot.container():
+                render_outlook(analytics)
+        else:
+            image_url = result
+            with landmark_slot.container():
+                render_landmark(city, image_url, with_heading=False)
+    with history_slot.container():
+        render_history(pending["city_key"], view)
+    metrics.observe("weather_phase_seconds", time.perf_counter() - pending["started"], phase="complete")
+
+    get_prefetch_scheduler().tracker.record(pending["city_key"], pending["landmark_name"])
+    st.session_state['weather_view'] = view
+    st.session_state['weather_analytics'] = analytics
+    st.session_state['city_image_url'] = image_url
+    st.session_state['pending_search'] = None
+
+def finish_progressive_search(error=None):
+    """Drops a failed progressive search and reruns so the error shows under the input."""
+    st.session_state['pending_search'] = None
+    st.session_state['search_triggered'] = False
+    if error:
+        st.session_state['error_message'] = error
+    st.rerun()
+
+
+def render_header():
+    """Title and tagline; they depend only on the language, never on the theme or the search."""
+    T = current_ui().text
+    st.markdown('<div class="centered-title">', unsafe_allow_html=True)
+    st.title(T("title"))
+    st.markdown('</div>', unsafe_allow_html=True)
     
-    T = get_translation
+    st.markdown(
+        f"""
+        <div style="text-align: center; color: var(--text-color); margin-top: -10px;">
+            {T('tagline')}
+        </div>
+        """, 
+        unsafe_allow_html=True
+    )
+
+def display_app_content():
     
-    accent = "#4CAF50" if st.session_state.theme == 'dark' else "#6A5ACD"
-    text = "#f0f2f6" if st.session_state.theme == 'dark' else "#333333"
+    T = current_ui().text
 
     col_left_pad, col_center_content, col_right_pad = st.columns([1, 5, 1]) 
     
     with col_center_content:
         
         # --- App Header (Title and Tagline) ---
-        st.markdown('<div class="centered-title">', unsafe_allow_html=True)
-        st.title(T("title"))
-        st.markdown('</div>', unsafe_allow_html=True)
-        
-        st.markdown(
-            f"""
-            <div style="text-align: center; color: {text}; margin-top: -10px;">
-                {T('tagline')}
-            </div>
-            """, 
-            unsafe_allow_html=True
-        )
+        render_header()
         
         st.markdown("---")
         
+        if st.session_state.get('search_mode') == 'compare':
+            # 2b. Multi-city input; the grid itself is rendered full width by render_comparison()
+            st.text_area(T("compare_label").format(COMPARE_MAX_CITIES), key="compare_input", height=120)
+            st.button(T("compare_button"), key="compare_submit")
+            return
+
         # 2. City Input (CRITICAL: on_change calls the fetch function)
-        st.text_input(
-            T("input_label"), 
-            key="city_input", 
+        # The browser narrows the bundled cities by prefix as the user types; any other name is accepted as typed
+        st.selectbox(
+            T("input_label"),
+            get_city_options(),
+            index=None,
+            key="city_input",
             on_change=fetch_and_render_weather_data, # Calls the consolidated fetch function
-            placeholder=T("input_placeholder")
+            placeholder=T("input_placeholder"),
+            label_visibility="collapsed",
+            accept_new_options=True,
+            filter_mode="prefix",
         )
         
         # 3. Display Errors or Info/Results
@@ -626,24 +1264,170 @@ def display_app_content():
             # Display any error message generated during fetch
             st.error(st.session_state.error_message)
             st.session_state['error_message'] = None # Clear after display
+
+            if st.session_state.get('suggestions'):
+                st.caption(T("did_you_mean"))
+                for col, name in zip(st.columns(len(st.session_state.suggestions)), st.session_state.suggestions):
+                    col.button(name, key=f"suggestion_{name}", on_click=apply_suggestion, args=(name,))
+                st.session_state['suggestions'] = []
         
         elif st.session_state.get('city_input') and not st.session_state.get('search_triggered'):
-            # The search hasn't executed yet (user has typed, but not pressed Enter)
+            # The search hasn't executed yet (a city is in the box, but none was chosen since)
             st.info(T("press_enter"))
         
         elif not st.session_state.get('search_triggered'):
             # Initial Welcome Card 
             st.markdown(f'''
                 <div class="card" style="text-align: center; padding: 50px;">
-                    <h2 style="color: {accent};">{T('welcome')}</h2>
-                    <p style="color: {text};">{T('welcome_detail')}</p>
+                    <h2 style="color: var(--accent-color);">{T('welcome')}</h2>
+                    <p style="color: var(--text-color);">{T('welcome_detail')}</p>
                 </div>
             ''', unsafe_allow_html=True)
         
+# ---- MULTI-CITY COMPARISON ----
+
+def build_comparison_row(city, current_data, forecast_data):
+    """Flattens one city's payloads into a comparison-grid row using the shared parsing."""
+    conditions = parse_current_conditions(current_data)
+    forecast_days = (forecast_data or {}).get('forecast', {}).get('forecastday') or [{}]
+    today = forecast_days[0].get('day', {})
+    return {
+        "city": (current_data.get('location') or {}).get('name') or city.title(),
+        "condition": conditions['condition_description'],
+        "temp": conditions['temp'],
+        "feels_like": conditions['feels_like'],
+        "humidity": conditions['humidity'],
+        "wind_speed": round(conditions['wind_speed'], 1),
+        "pressure": conditions['pressure'],
+        "max_temp": today.get('maxtemp_c'),
+        "min_temp": today.get('mintemp_c'),
+        "error": None,
+    }
+
+def build_comparison_error_row(city, error):
+    """Row shown in place of a city whose lookup failed."""
+    T = current_ui().text
+    if error is None:
+        message = T("city_not_found").format(city.title())
+    elif isinstance(error, requests.exceptions.HTTPError):
+        message = f"API Request Failed ({error.response.status_code})."
+    else:
+        message = T("error_fetching").format(error)
+    return {"city": city.title(), "error": message}
+
+def fetch_comparison_rows(cities, on_row):
+    """
+    Fetches all cities concurrently (bounded by COMPARE_CONCURRENCY) and calls
+    on_row(row) on the script thread as each city completes.
+    """
+    service = get_weather_service()
+
+    async def collect():
+        async for city, result, error in iter_completed(cities, service.fetch_payloads, COMPARE_CONCURRENCY):
+            if error is None and 'error' not in result[0]:
+                on_row(build_comparison_row(city, *result))
+            else:
+                on_row(build_comparison_error_row(city, error))
+
+    asyncio.run(collect())
+
+def show_comparison_grid(container, rows):
+    """Draws the sortable comparison grid into a placeholder."""
+    T = current_ui().text
+    container.dataframe(
+        rows,
+        hide_index=True,
+        column_config={
+            "city": st.column_config.TextColumn(T("city")),
+            "condition": st.column_config.TextColumn(T("condition")),
+            "temp": st.column_config.NumberColumn(T("temperature"), format="%.0f °C"),
+            "feels_like": st.column_config.NumberColumn(T("feels_like"), format="%.0f °C"),
+            "humidity": st.column_config.NumberColumn(T("humidity"), format="%d %%"),
+            "wind_speed": st.column_config.NumberColumn(T("wind_speed"), format="%.1f m/s"),
+            "pressure": st.column_config.NumberColumn(T("pressure"), format="%.0f hPa"),
+            "max_temp": st.column_config.NumberColumn(T("max_temp"), format="%.0f °C"),
+            "min_temp": st.column_config.NumberColumn(T("min_temp"), format="%.0f °C"),
+            "error": st.column_config.TextColumn(T("error")),
+        },
+    )
+
+def render_comparison():
+    """Runs a comparison when requested, filling the grid as each city lands; otherwise redraws the last one."""
+    T = current_ui().text
+
+    if not st.session_state.get('compare_submit'):
+        if st.session_state.get('comparison_rows'):
+            show_comparison_grid(st.empty(), st.session_state.comparison_rows)
+        return
+
+    cities = parse_city_list(st.session_state.get('compare_input', ''), COMPARE_MAX_CITIES)
+    if not cities:
+        st.info(T("compare_empty"))
+        return
+    if not WEATHERAPI_KEY:
+        st.error("Weather API Key is missing. Please check your secrets configuration.")
+        return
+
+    rows = []
+    progress = st.progress(0.0)
+    grid = st.empty()
+
+    def on_row(row):
+        rows.append(row)
+        progress.progress(len(rows) / len(cities), text=T("compare_progress").format(len(rows), len(cities)))
+        show_comparison_grid(grid, rows)
+
+    fetch_comparison_rows(cities, on_row)
+    progress.empty()
+    st.session_state['comparison_rows'] = rows
+
+
+# ---- DEBUG PANEL ----
+def render_debug_panel():
+    """Sidebar view of the process-wide metrics; shown with WEATHER_DEBUG_PANEL=1 or ?debug=1."""
+    if not (DEBUG_PANEL or st.query_params.get("debug") == "1"):
+        return
+    metrics = get_metrics()
+    with st.sidebar.expander("🛠️ Debug metrics", expanded=True):
+        st.caption("Phase latency (ms)")
+        st.dataframe(
+            [
+                {"phase": phase, "count": row["count"], "p50": row["p50"] * 1000, "p95": row["p95"] * 1000,
+                 "p99": row["p99"] * 1000}
+                for phase, row in sorted(metrics.summary().items())
+            ],
+            hide_index=True,
+            column_config={p: st.column_config.NumberColumn(format="%.1f") for p in ("p50", "p95", "p99")},
+        )
+        st.caption("Upstream responses (endpoint, status)")
+        st.json(metrics.counters("weather_upstream_responses_total"), expanded=False)
+        st.caption("Response cache")
+        st.json(get_weather_cache().stats(), expanded=False)
+        st.caption("Rendered card cache")
+        st.json(get_render_cache().stats(), expanded=False)
+        if get_history_store() is not None:
+            st.caption("Observation history")
+            st.json(get_history_store().stats(), expanded=False)
+        if get_bulk_dispatcher() is not None:
+            st.caption("Bulk lookups")
+            st.json(get_bulk_dispatcher().stats(), expanded=False)
+        if METRICS_PORT:
+            st.caption(f"Prometheus: http://{METRICS_HOST}:{METRICS_PORT}/metrics")
+
+
 # ---- App Execution Flow ----
+get_metrics_server()
+get_image_proxy()  # mounts /images/ on its listener before any page references it
 display_app_content()
 
 # RENDER content using data already stored in session state
-if st.session_state.get('search_triggered'):
+if st.session_state.get('search_mode') == 'compare':
+    with get_metrics().span("compare"):
+        render_comparison()
+elif st.session_state.get('search_triggered'):
     # The render function will use the full width and check if data exists
-    render_weather_results()
\ No newline at end of file
+    with get_metrics().span("render"):
+        render_weather_results()
+
+get_metrics().observe("weather_phase_seconds", time.perf_counter() - SCRIPT_STARTED, phase="script")
+render_debug_panel()
\ No newline at end of file
@@ -0,0 +1,127 @@
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+import requests
+
+from bench.stub_server import StubServer
+from weather_now.batching import BulkDispatcher
+from weather_now.http import HttpClient
+
+PATH = "/v1/current.json"
+CITIES = ["51.51,-0.13", "48.86,2.35", "35.69,139.69", "28.61,77.21"]
+
+
+class BulkForbiddenStub(StubServer):
+    """Answers bulk POSTs like a free-plan key does."""
+
+    def respond(self, path, params, payload=None):
+        if params.get("q") == "bulk":
+            with self._lock:
+                self.requests[(path, 403)] += 1
+            return 403, b'{"error": {"code": 2008, "message": "API key is not allowed to use bulk requests."}}'
+        return super().respond(path, params, payload)
+
+
+@pytest.fixture
+def stub():
+    server = StubServer(latency=0.1).start()
+    yield server
+    server.stop()
+
+
+def lookup_while_busy(dispatcher, url, queries):
+    """
+    Looks ``queries[0]`` up on its own, then the rest while it is on the wire.
+    Returns query -> (seconds taken, payload or the exception raised).
+    """
+    def timed(query):
+        start = time.perf_counter()
+        try:
+            result = dispatcher.get_json(url, {"key": "test", "q": query})
+        except Exception as e:
+            result = e
+        return time.perf_counter() - start, result
+
+    with ThreadPoolExecutor(len(queries)) as pool:
+        futures = {queries[0]: pool.submit(timed, queries[0])}
+        while not dispatcher.stats()["direct"]:
+            time.sleep(0.001)
+        futures.update((query, pool.submit(timed, query)) for query in queries[1:])
+        return {query: future.result() for query, future in futures.items()}
+
+
+def single_payload(stub, query):
+    return json.loads(stub.render(query, 0))
+
+
+def test_leader_waits_out_the_window_then_sends_one_bulk_request(stub):
+    dispatcher = BulkDispatcher(HttpClient(max_retries=0), window=0.3)
+    results = lookup_while_busy(dispatcher, stub.base_url + PATH, CITIES[:3])
+
+    for query in CITIES[1:3]:
+        elapsed, payload = results[query]
+        assert payload == single_payload(stub, query)
+        assert elapsed >= 0.3
+    assert stub.requests[(PATH, 200)] == 2  # one direct GET, one bulk POST
+    assert stub.billed[PATH] == 3
+    assert dispatcher.stats() == {
+        "direct": 1, "batched": 2, "retried_singly": 0, "bulk_requests": 1, "pending": 0, "bulk_supported": True,
+    }
+
+
+def test_full_batch_is_sent_without_waiting_for_the_window(stub):
+    dispatcher = BulkDispatcher(HttpClient(max_retries=0), window=10.0, max_batch=3)
+    results = lookup_while_busy(dispatcher, stub.base_url + PATH, CITIES)
+
+    for query in CITIES[1:]:
+        elapsed, payload = results[query]
+        assert payload == single_payload(stub, query)
+        assert elapsed < 2.0
+    assert dispatcher.stats()["bulk_requests"] == 1
+
+
+def test_lone_waiter_is_retried_on_its_own(stub):
+    dispatcher = BulkDispatcher(HttpClient(max_retries=0), window=0.05)
+    results = lookup_while_busy(dispatcher, stub.base_url + PATH, CITIES[:2])
+
+    assert results[CITIES[1]][1] == single_payload(stub, CITIES[1])
+    assert stub.requests[(PATH, 200)] == 2  # two GETs; a bulk of one is never posted
+    assert dispatcher.stats()["retried_singly"] == 1
+    assert dispatcher.stats()["bulk_requests"] == 0
+
+
+def test_forbidden_bulk_turns_batching_off():
+    stub = BulkForbiddenStub(latency=0.1).start()
+    try:
+        dispatcher = BulkDispatcher(HttpClient(max_retries=0), window=0.05)
+        url = stub.base_url + PATH
+        results = lookup_while_busy(dispatcher, url, CITIES[:3])
+
+        for query in CITIES[1:3]:
+            assert results[query][1] == single_payload(stub, query)
+        assert stub.requests[(PATH, 403)] == 1
+        assert dispatcher.stats()["retried_singly"] == 2
+        assert dispatcher.bulk_supported is False
+
+        lookup_while_busy(dispatcher, url, CITIES[:3])
+        assert stub.requests[(PATH, 403)] == 1  # no further bulk attempts
+        assert dispatcher.stats()["direct"] == 4
+    finally:
+        stub.stop()
+
+
+def test_failed_location_raises_like_a_single_request(stub):
+    dispatcher = BulkDispatcher(HttpClient(max_retries=0), window=0.05)
+    url = stub.base_url + PATH
+    results = lookup_while_busy(dispatcher, url, [CITIES[0], "Zzzville", CITIES[1]])
+
+    _, error = results["Zzzville"]
+    assert isinstance(error, requests.exceptions.HTTPError)
+    with pytest.raises(requests.exceptions.HTTPError) as single:
+        HttpClient(max_retries=0).get_json(url, params={"key": "test", "q": "Zzzville"})
+    assert error.response.status_code == single.value.response.status_code == 400
+    assert error.response.json() == single.value.response.json()
+    assert results[CITIES[1]][1] == single_payload(stub, CITIES[1])  # its batch-mate is unaffected
+    assert dispatcher.stats()["bulk_requests"] == 1
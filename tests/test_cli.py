@@ -0,0 +1,27 @@
+import io
+import json
+
+from weather_now.cli import run_batch
+
+
+class PayloadService:
+    """Answers from a dict of city -> (current_data, forecast_data)."""
+
+    def __init__(self, payloads):
+        self.payloads = payloads
+
+    def fetch_payloads(self, city):
+        return self.payloads[city]
+
+
+def test_malformed_payload_becomes_an_error_record():
+    service = PayloadService({
+        "Broken": ({"location": {"name": "Broken"}}, None),          # no 'current' block
+        "Unknown": ({"error": {"code": 1006, "message": "No matching location found."}}, None),
+    })
+    out = io.StringIO()
+    succeeded, failed = run_batch(["Broken", "Unknown"], service, out, concurrency=2)
+    records = {record["query"]: record for record in map(json.loads, out.getvalue().splitlines())}
+    assert (succeeded, failed) == (0, 2)
+    assert records["Broken"]["error"].startswith("KeyError")
+    assert records["Unknown"]["error"] == "No matching location found."
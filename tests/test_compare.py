@@ -0,0 +1,10 @@
+from weather_now.compare import parse_city_list
+
+
+def test_commas_stay_inside_a_city_name():
+    text = "Paris, France\nPortland, OR; Delhi\n\n  paris,  france ;"
+    assert parse_city_list(text) == ["Paris, France", "Portland, OR", "Delhi"]
+
+
+def test_limit_caps_the_list():
+    assert parse_city_list("a;b;c;d", limit=2) == ["a", "b"]
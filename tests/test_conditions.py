@@ -0,0 +1,46 @@
+import pytest
+
+from weather_now.conditions import (
+    CLOUDS, CONDITION_CODES, RAIN, SNOW, THUNDER, UNKNOWN, classify, classify_text,
+)
+
+
+@pytest.mark.parametrize("code, text, expected", [(code, text, cond) for code, (text, cond) in CONDITION_CODES.items()])
+def test_code_and_text_agree(code, text, expected):
+    assert classify({"code": code}) == expected
+    assert classify_text(text) == expected
+    assert classify({"text": text}) == expected  # payloads without a code fall back to the text rules
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("Patchy light rain with thunder", THUNDER),
+    ("Moderate or heavy rain with thunder", THUNDER),
+    ("Patchy rain", RAIN),
+    ("Patchy rain nearby", RAIN),
+    ("Overcast", CLOUDS),
+    ("Light sleet", SNOW),
+    ("sleet", SNOW),
+])
+def test_text_rule_order(text, expected):
+    assert classify_text(text) == expected
+
+
+# The severe-weather alert the app always raised: any of these words in the condition text
+ALERT_KEYWORDS = ("thunder", "rain", "heavy", "snow", "sleet")
+
+
+@pytest.mark.parametrize("text, expected", [(text, cond) for text, cond in CONDITION_CODES.values()])
+def test_severity_matches_the_original_alert(text, expected):
+    assert expected.severe == any(keyword in text.lower() for keyword in ALERT_KEYWORDS)
+    assert classify_text(text).severe == expected.severe
+
+
+def test_light_and_moderate_precipitation_is_severe():
+    assert RAIN.severe and SNOW.severe
+    assert classify({"code": 1183, "text": "Light rain"}).severe
+    assert classify({"text": "Light sleet"}).severe
+
+
+def test_unknown_text_and_code():
+    assert classify({"code": 9999, "text": "Volcanic ash"}) == UNKNOWN
+    assert classify({}) == UNKNOWN
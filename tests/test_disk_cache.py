@@ -0,0 +1,16 @@
+from weather_now.disk_cache import DiskCache
+
+
+def test_writes_purge_long_expired_rows_on_schedule(tmp_path):
+    now = [1000.0]
+    cache = DiskCache(str(tmp_path / "responses.db"), retention=100, purge_interval=500, clock=lambda: now[0])
+    cache.set("forecast", "paris", {"t": 1}, ttl=10)
+
+    now[0] = 1200.0  # paris is purgeable, but the next purge is not due until 1500
+    cache.set("forecast", "oslo", {"t": 2}, ttl=1000)
+    assert cache.get("forecast", "paris") is not None
+
+    now[0] = 1600.0
+    cache.set("forecast", "delhi", {"t": 3}, ttl=1000)
+    assert cache.get("forecast", "paris") is None
+    assert cache.get("forecast", "oslo")[0] == {"t": 2}
@@ -0,0 +1,35 @@
+from weather_now.history import HistoryStore
+
+DAY = 86400
+
+
+def observation(when, temp_c=20.0):
+    return {
+        "time": [when], "temp_c": [temp_c], "feels_like_c": [temp_c], "humidity": [50],
+        "wind_kph": [5], "pressure_mb": [1013], "precip_mm": [0],
+    }
+
+
+def test_sweep_expires_cities_that_are_never_fetched_again(tmp_path):
+    now = [100 * DAY]
+    store = HistoryStore(str(tmp_path), retention=10 * DAY, compact_slack=DAY, clock=lambda: now[0])
+    store.append("paris", "current", observation(now[0] - DAY))
+    store.append("oslo", "current", observation(now[0] - DAY))
+
+    now[0] += 5 * DAY
+    store.append("oslo", "current", observation(now[0]))
+    now[0] += 20 * DAY
+    store.append("delhi", "current", observation(now[0]))  # past sweep_interval: sweeps every city
+
+    assert [index["city_key"] for index in store.cities()] == ["delhi"]
+    assert store.stats()["removed_cities"] == 2
+
+
+def test_byte_count_tracks_appends_without_walking(tmp_path):
+    store = HistoryStore(str(tmp_path), clock=lambda: 100 * DAY)
+    store.append("paris", "current", observation(100 * DAY - 60))
+    store.append("paris", "current", observation(100 * DAY))
+
+    expected = sum(path.stat().st_size for path in tmp_path.rglob("*") if path.is_file())
+    assert store.stats()["bytes"] == expected > 0
+    assert HistoryStore(str(tmp_path), clock=lambda: 100 * DAY).stats()["bytes"] == expected
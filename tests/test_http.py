@@ -0,0 +1,80 @@
+import pytest
+import requests
+
+from weather_now.http import CircuitOpenError, HttpClient
+from weather_now.ratelimit import QuotaExceededError
+
+URL = "http://api.example.test/v1/forecast.json"
+
+
+class ScriptedLimiter:
+    """Rejects the calls whose 1-based numbers are in ``reject``."""
+
+    def __init__(self, reject=()):
+        self.reject = set(reject)
+        self.calls = 0
+
+    def acquire(self, url, cost=1):
+        self.calls += 1
+        if self.calls in self.reject:
+            raise QuotaExceededError(f"Call budget for {url} is exhausted")
+
+
+def ok_response():
+    response = requests.models.Response()
+    response.status_code = 200
+    response._content = b"{}"
+    return response
+
+
+def make_client(limiter, monkeypatch, outcomes, reset_timeout=0.0):
+    client = HttpClient(max_retries=0, failure_threshold=1, reset_timeout=reset_timeout, limiter=limiter)
+
+    def fake_request(method, url, **kwargs):
+        outcome = outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    monkeypatch.setattr(client.session, "request", fake_request)
+    return client
+
+
+def test_quota_rejected_probe_does_not_wedge_the_circuit(monkeypatch):
+    limiter = ScriptedLimiter(reject={2})
+    client = make_client(limiter, monkeypatch, [requests.exceptions.ConnectionError("down"), ok_response()])
+
+    with pytest.raises(requests.exceptions.ConnectionError):
+        client.get(URL)                      # opens the breaker; reset_timeout=0 makes it half-open at once
+    with pytest.raises(QuotaExceededError):
+        client.get(URL)                      # the probe is turned away by the limiter before it is sent
+    assert client.get(URL).status_code == 200  # so the next request may still probe
+    assert client.breaker_states() == {"api.example.test": "closed"}
+
+
+def test_open_circuit_fails_fast_without_spending_quota(monkeypatch):
+    limiter = ScriptedLimiter()
+    client = make_client(limiter, monkeypatch, [requests.exceptions.ConnectionError("down")], reset_timeout=3600.0)
+
+    with pytest.raises(requests.exceptions.ConnectionError):
+        client.get(URL)
+    with pytest.raises(CircuitOpenError):
+        client.get(URL)
+    assert limiter.calls == 1
+
+
+def status_response(status):
+    response = ok_response()
+    response.status_code = status
+    return response
+
+
+def test_throttled_probe_does_not_wedge_the_circuit(monkeypatch):
+    client = make_client(ScriptedLimiter(), monkeypatch, [status_response(503), status_response(429), ok_response()])
+    client.max_retries = 1
+    monkeypatch.setattr(client, "_backoff", lambda attempt: 0.0)
+
+    # 503 opens the breaker (threshold 1); the retry is the half-open probe and gets a 429
+    assert client.get(URL).status_code == 429
+    assert client.get(URL).status_code == 200  # a later request may still probe
+    assert client.breaker_states() == {"api.example.test": "closed"}
@@ -0,0 +1,39 @@
+import os
+import time
+
+from weather_now.images import SOURCE_SUFFIX, ImageStore
+
+
+def directory_bytes(path, suffix=""):
+    return sum(entry.stat().st_size for entry in os.scandir(path) if entry.name.endswith(suffix))
+
+
+def test_replicas_sharing_a_directory_stay_under_one_cap(tmp_path):
+    replicas = [ImageStore(str(tmp_path), max_bytes=1000) for _ in range(3)]
+    for i in range(12):
+        replicas[i % 3].put(f"landmark-{i}", b"x" * 300)
+    assert directory_bytes(tmp_path) <= 1000
+    assert replicas[2].get("landmark-11") is not None  # the newest image survives
+
+
+def test_source_records_are_never_evicted(tmp_path):
+    store = ImageStore(str(tmp_path), max_bytes=1000)
+    store.put("abc" + SOURCE_SUFFIX, b"https://example.test/a.jpg")
+    for i in range(10):
+        store.put(f"landmark-{i}", b"x" * 300)
+    assert ImageStore(str(tmp_path)).get("abc" + SOURCE_SUFFIX) == b"https://example.test/a.jpg"
+    assert store.stats()["pinned"] == 1
+    assert store.stats()["bytes"] <= 1000
+
+
+def test_reads_refresh_recency(tmp_path):
+    store = ImageStore(str(tmp_path), max_bytes=700)
+    store.put("old", b"x" * 300)
+    store.put("newer", b"x" * 300)
+    past = time.time() - 60
+    os.utime(tmp_path / "old", (past, past))
+    os.utime(tmp_path / "newer", (past + 1, past + 1))
+    store.get("old")  # now the most recently used
+    store.put("newest", b"x" * 300)
+    assert store.get("old") is not None
+    assert store.get("newer") is None
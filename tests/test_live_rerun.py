@@ -0,0 +1,33 @@
+import asyncio
+import os
+from unittest import mock
+
+import pytest
+
+from bench.live_rerun import free_port, measure, start_app
+from bench.run_bench import configure_environment
+from bench.stub_server import StubServer
+
+pytest.importorskip("websockets")
+
+# Several times the usual p50, so only a genuinely slower rerun fails (a whole-page redraw on a
+# fragment toggle, a blocking network call on a rerun), not a busy CI machine
+MAX_P50_WALL_MS = 1500
+
+
+def test_rerun_wall_time_stays_within_budget():
+    stub = StubServer(latency=0.08, seed=0).start()
+    with mock.patch.dict(os.environ):
+        configure_environment(stub)
+        port = free_port()
+        app = start_app(port)
+    try:
+        results = asyncio.run(asyncio.wait_for(measure(port, rounds=5, city="London"), timeout=180))
+    finally:
+        app.terminate()
+        app.wait()
+        stub.stop()
+
+    for action, result in results.items():
+        assert result["wall_ms"]["p50"] < MAX_P50_WALL_MS, f"{action}: {result['wall_ms']}"
+    assert results["theme_toggle"]["deltas"]["p50"] < results["idle_rerun"]["deltas"]["p50"]  # fragment rerun
@@ -0,0 +1,69 @@
+from weather_now.cache import ResponseCache
+from weather_now.prefetch import PopularityTracker, PrefetchScheduler
+
+
+class FakeService:
+    def __init__(self, cache, fetch_mode):
+        self.cache = cache
+        self.fetch_mode = fetch_mode
+        self.refreshed = []
+
+    @property
+    def calls_per_fetch(self):
+        return 1 if self.fetch_mode == "combined" else 2
+
+    @property
+    def cached_namespaces(self):
+        return ("forecast",) if self.fetch_mode == "combined" else ("current", "forecast")
+
+    def refresh(self, label):
+        self.refreshed.append(label)
+        self.cache.set("current", label, {})
+        self.cache.set("forecast", label, {})
+
+
+def make_scheduler(fetch_mode, now):
+    cache = ResponseCache(ttls={"current": 600, "forecast": 1800}, clock=lambda: now[0])
+    tracker = PopularityTracker(clock=lambda: now[0])
+    tracker.record("london", "london")
+    service = FakeService(cache, fetch_mode)
+    service.refresh("london")
+    service.refreshed.clear()
+    return PrefetchScheduler(service, tracker, lead_time=120, max_calls_per_hour=100, clock=lambda: now[0]), service
+
+
+def test_sequential_mode_refreshes_when_current_nears_expiry():
+    now = [0.0]
+    scheduler, service = make_scheduler("sequential", now)
+    now[0] = 500.0  # "current" expires in 100 s, "forecast" in 1300 s
+    scheduler.run_once()
+    assert service.refreshed == ["london"]
+    assert scheduler.remaining_budget() == 98
+
+
+def test_combined_mode_only_watches_the_forecast():
+    now = [0.0]
+    scheduler, service = make_scheduler("combined", now)
+    now[0] = 500.0
+    scheduler.run_once()
+    assert service.refreshed == []
+
+
+
+def test_landmarks_are_warmed_within_their_own_budget():
+    now = [0.0]
+    scheduler, service = make_scheduler("combined", now)
+    for city in ("paris", "oslo"):
+        scheduler.tracker.record(city, city)
+    warmed = []
+
+    def refresh_landmark(key, label):
+        warmed.append(label)
+        service.cache.set("landmark", key, f"https://images.example.test/{key}.jpg")
+
+    scheduler.refresh_landmark = refresh_landmark
+    scheduler.max_landmark_calls_per_hour = 2
+    scheduler.run_once()
+    assert len(warmed) == 2  # the third city waits for budget
+    assert scheduler.remaining_landmark_budget() == 0
+    assert scheduler.stats()["skipped_budget"] == 1
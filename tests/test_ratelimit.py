@@ -0,0 +1,46 @@
+import pytest
+
+from weather_now.ratelimit import QuotaExceededError, RateLimiter, background_traffic
+
+STUB = "http://127.0.0.1:8765"
+
+
+def make_limiter(**kwargs):
+    return RateLimiter(
+        {"WeatherAPI": 3600, "Unsplash": 36},
+        routes={f"{STUB}/v1": "WeatherAPI", f"{STUB}/search/photos": "Unsplash"},
+        burst_window=100.0, max_wait=0.0, clock=lambda: 0.0, **kwargs,
+    )
+
+
+def test_keys_sharing_a_host_keep_separate_buckets():
+    limiter = make_limiter()
+    limiter.acquire(f"{STUB}/search/photos?query=x")
+    with pytest.raises(QuotaExceededError):
+        limiter.acquire(f"{STUB}/search/photos?query=y")  # Unsplash's burst is a single call
+    for _ in range(100):
+        limiter.acquire(f"{STUB}/v1/forecast.json?q=London")
+    assert limiter.remaining() == {"WeatherAPI": (0.0, 100.0), "Unsplash": (0.0, 1.0)}
+
+
+def test_unrouted_urls_are_unlimited():
+    limiter = make_limiter()
+    for _ in range(10):
+        limiter.acquire("http://example.test/other")
+    assert limiter.stats()["granted"] == 0
+
+
+def test_background_traffic_leaves_the_reserve():
+    limiter = make_limiter(background_reserve=0.5)
+    with background_traffic():
+        for _ in range(50):
+            limiter.acquire(f"{STUB}/v1/forecast.json")
+        with pytest.raises(QuotaExceededError):
+            limiter.acquire(f"{STUB}/v1/forecast.json")
+    limiter.acquire(f"{STUB}/v1/forecast.json")  # interactive calls may dig into it
+
+
+def test_bulk_cost_is_charged_per_location():
+    limiter = make_limiter()
+    limiter.acquire(f"{STUB}/v1/forecast.json?q=bulk", cost=40)
+    assert limiter.remaining()["WeatherAPI"] == (60.0, 100.0)
@@ -0,0 +1 @@
+"""Shared, session-independent building blocks for the Weather Now app."""
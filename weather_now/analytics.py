@@ -0,0 +1,142 @@
+"""Hourly forecast analytics over columnar NumPy arrays.
+
+``load_hourly`` copies the hourly rows of a forecast.json payload into one array
+per field, in a single pass over the payload. Every derived metric (dew point,
+heat index, comfort score, rolling precipitation risk, daily summaries) is then
+a vectorized expression over whole arrays, so a 14-day x 24-hour outlook costs
+about as much to compute as the 3-day one did.
+"""
+from collections import namedtuple
+
+import numpy as np
+
+# Fields read from every hourly row; anything missing becomes NaN
+HOURLY_FIELDS = ("temp_c", "humidity", "wind_kph", "chance_of_rain", "precip_mm")
+
+# Magnus formula coefficients (Alduchov & Eskridge, 1996), valid for -40..50 °C
+MAGNUS_A = 17.625
+MAGNUS_B = 243.04
+
+# Comfort score: 100 at COMFORT_IDEAL_C in still, dry, rain-free air, minus these penalties
+COMFORT_IDEAL_C = 21.0
+COMFORT_TEMP_BAND_C = 3.0          # no temperature penalty within +-3 °C of ideal
+COMFORT_TEMP_PENALTY = 6.0         # points per °C beyond the band
+COMFORT_MUGGY_DEW_POINT_C = 16.0   # dew points above this start to feel sticky
+COMFORT_MUGGY_PENALTY = 5.0        # points per °C of dew point above it
+COMFORT_WIND_KPH = 25.0            # wind above this starts to be unpleasant
+COMFORT_WIND_PENALTY = 1.0         # points per kph above it
+COMFORT_RAIN_PENALTY = 0.3         # points per percent chance of rain
+
+PRECIP_RISK_WINDOW = 6             # hours looked ahead by precip_risk
+
+HourlySeries = namedtuple("HourlySeries", ["time", *HOURLY_FIELDS, "day_starts", "dates"])
+HourlyAnalytics = namedtuple("HourlyAnalytics", [
+    "time", "temp_c", "dew_point_c", "heat_index_c", "comfort", "precip_risk", "precip_mm", "day_starts", "dates",
+])
+
+
+def load_hourly(forecast_data):
+    """
+    Returns the payload's hourly rows as a HourlySeries of parallel arrays, or None
+    when it has no hourly data. ``time`` is local wall-clock time (datetime64[m]);
+    ``day_starts`` holds the index of each day's first hour, for ``np.*.reduceat``.
+    """
+    forecast_days = ((forecast_data or {}).get('forecast') or {}).get('forecastday') or []
+    hours = [hour for day in forecast_days for hour in day.get('hour') or ()]
+    if not hours:
+        return None
+    day_lengths = np.fromiter((len(day.get('hour') or ()) for day in forecast_days), dtype=np.intp)
+    kept = day_lengths > 0
+    day_starts = np.concatenate(([0], np.cumsum(day_lengths)[:-1]))[kept]
+    dates = np.array([day['date'] for day in forecast_days], dtype='datetime64[D]')[kept]
+
+    # One pass over the rows; a tuple per row transposes into one column per field
+    rows = np.array(
+        [tuple(hour.get(field, np.nan) for field in HOURLY_FIELDS) for hour in hours], dtype=np.float64
+    )
+    time = np.array([hour['time'].replace(' ', 'T') for hour in hours], dtype='datetime64[m]')
+    return HourlySeries(time, *rows.T, day_starts, dates)
+
+
+def dew_point(temp_c, humidity):
+    """Dew point in °C from temperature (°C) and relative humidity (%), by the Magnus formula."""
+    rh = np.clip(humidity, 1.0, 100.0) / 100.0  # log(0) is undefined; 1 % is below any real reading
+    gamma = np.log(rh) + MAGNUS_A * temp_c / (MAGNUS_B + temp_c)
+    return MAGNUS_B * gamma / (MAGNUS_A - gamma)
+
+
+def heat_index(temp_c, humidity):
+    """
+    Heat index in °C, following the US National Weather Service: Steadman's simple
+    formula, replaced by the Rothfusz regression (with its low and high humidity
+    adjustments) where the simple estimate reaches 80 °F.
+    """
+    t = np.asarray(temp_c, dtype=np.float64) * 9 / 5 + 32
+    rh = np.asarray(humidity, dtype=np.float64)
+    simple = 0.5 * (t + 61.0 + (t - 68.0) * 1.2 + rh * 0.094)
+    rothfusz = (-42.379 + 2.04901523 * t + 10.14333127 * rh - 0.22475541 * t * rh
+                - 6.83783e-3 * t * t - 5.481717e-2 * rh * rh + 1.22874e-3 * t * t * rh
+                + 8.5282e-4 * t * rh * rh - 1.99e-6 * t * t * rh * rh)
+    dry = (rh < 13) & (t >= 80) & (t <= 112)
+    rothfusz -= np.where(dry, (13 - rh) / 4 * np.sqrt(np.clip(17 - np.abs(t - 95), 0, None) / 17), 0.0)
+    humid = (rh > 85) & (t >= 80) & (t <= 87)
+    rothfusz += np.where(humid, (rh - 85) / 10 * (87 - t) / 5, 0.0)
+    index_f = np.where((simple + t) / 2 >= 80, rothfusz, simple)
+    return (index_f - 32) * 5 / 9
+
+
+def comfort_score(temp_c, dew_point_c, wind_kph, chance_of_rain):
+    """0-100 score of how pleasant it is outdoors; see the COMFORT_* constants for the weights."""
+    temp_excess = np.clip(np.abs(temp_c - COMFORT_IDEAL_C) - COMFORT_TEMP_BAND_C, 0, None)
+    muggy = np.clip(dew_point_c - COMFORT_MUGGY_DEW_POINT_C, 0, None)
+    windy = np.clip(wind_kph - COMFORT_WIND_KPH, 0, None)
+    penalty = (temp_excess * COMFORT_TEMP_PENALTY + muggy * COMFORT_MUGGY_PENALTY
+               + windy * COMFORT_WIND_PENALTY + np.nan_to_num(chance_of_rain) * COMFORT_RAIN_PENALTY)
+    return np.clip(100.0 - penalty, 0.0, 100.0)
+
+
+def precip_risk(chance_of_rain, window=PRECIP_RISK_WINDOW):
+    """
+    Chance (0-1) of rain at some point in the ``window`` hours starting at each hour,
+    treating hours as independent: 1 - prod(1 - p). The products are differences of
+    one cumulative sum of log(1 - p), so every window costs O(1).
+    """
+    p = np.clip(np.nan_to_num(chance_of_rain) / 100.0, 0.0, 1.0 - 1e-9)  # keep log1p finite
+    cumulative = np.concatenate(([0.0], np.cumsum(np.log1p(-p))))
+    n = len(p)
+    ends = np.minimum(np.arange(n) + window, n)  # windows are truncated at the end of the forecast
+    return 1.0 - np.exp(cumulative[ends] - cumulative[:n])
+
+
+def analyze(forecast_data, window=PRECIP_RISK_WINDOW):
+    """Returns the HourlyAnalytics of a forecast.json payload, or None without hourly data."""
+    series = load_hourly(forecast_data)
+    if series is None:
+        return None
+    dew_point_c = dew_point(series.temp_c, series.humidity)
+    # Stored per session: float32 halves the footprint and is far finer than the inputs
+    return HourlyAnalytics(
+        series.time,
+        series.temp_c.astype(np.float32),
+        dew_point_c.astype(np.float32),
+        heat_index(series.temp_c, series.humidity).astype(np.float32),
+        comfort_score(series.temp_c, dew_point_c, series.wind_kph, series.chance_of_rain).astype(np.float32),
+        precip_risk(series.chance_of_rain, window).astype(np.float32),
+        series.precip_mm.astype(np.float32),
+        series.day_starts,
+        series.dates,
+    )
+
+
+def daily_summary(analytics):
+    """Per-day aggregates of ``analytics`` as a dict of equal-length arrays (one row per day)."""
+    starts = analytics.day_starts
+    return {
+        "date": analytics.dates,
+        "min_temp_c": np.minimum.reduceat(analytics.temp_c, starts),
+        "max_temp_c": np.maximum.reduceat(analytics.temp_c, starts),
+        "max_heat_index_c": np.maximum.reduceat(analytics.heat_index_c, starts),
+        "mean_comfort": np.add.reduceat(analytics.comfort, starts) / np.diff(starts, append=len(analytics.time)),
+        "max_precip_risk": np.maximum.reduceat(analytics.precip_risk, starts),
+        "precip_mm": np.add.reduceat(np.nan_to_num(analytics.precip_mm), starts),
+    }
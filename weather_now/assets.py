@@ -0,0 +1,72 @@
+"""Pre-generated, statically served variants of the default background image.
+
+The background is shown blurred, so a downscaled copy is visually identical to the
+full-size JPEG. Variants live in ``static/`` and are served by Streamlit's static
+file handler (``server.enableStaticServing``) at ``app/static/<name>``, which lets
+the browser cache them instead of receiving a base64 data URI on every rerun.
+
+Regenerate after changing the source image (requires Pillow)::
+
+    python -m weather_now.assets bright_day_light.jpg
+"""
+import argparse
+import os
+
+BACKGROUND_VARIANT_WIDTH = 960
+STATIC_DIR = "static"
+STATIC_URL_PREFIX = "app/static"
+
+# (extension, Pillow format, MIME type, save options), in order of browser preference
+VARIANT_FORMATS = (
+    ("webp", "WEBP", "image/webp", {"quality": 75, "method": 6}),
+    ("jpg", "JPEG", "image/jpeg", {"quality": 80, "optimize": True, "progressive": True}),
+)
+
+
+def variant_name(source_path, width, ext):
+    stem = os.path.splitext(os.path.basename(source_path))[0]
+    return f"{stem}-{width}.{ext}"
+
+
+def build_background_variants(source_path, static_dir=STATIC_DIR, width=BACKGROUND_VARIANT_WIDTH):
+    """Writes downscaled WebP and JPEG copies of ``source_path`` into ``static_dir``."""
+    from PIL import Image  # optional: only needed to regenerate the committed variants
+
+    os.makedirs(static_dir, exist_ok=True)
+    written = []
+    with Image.open(source_path) as img:
+        img = img.convert("RGB")
+        if img.width > width:
+            img = img.resize((width, round(img.height * width / img.width)), Image.LANCZOS)
+        for ext, fmt, _, options in VARIANT_FORMATS:
+            path = os.path.join(static_dir, variant_name(source_path, width, ext))
+            img.save(path, fmt, **options)
+            written.append(path)
+    return written
+
+
+def background_image_set(source_path, static_dir=STATIC_DIR, width=BACKGROUND_VARIANT_WIDTH):
+    """
+    Returns ``(fallback, image_set)`` CSS values over the static variants, or None if any is missing.
+
+    ``fallback`` is a plain ``url()`` of the last (most widely supported) variant, for browsers
+    that cannot parse ``image-set()`` with ``type()`` (Safari before 17, Chrome before 113).
+    """
+    candidates = []
+    for ext, _, mime, _ in VARIANT_FORMATS:
+        name = variant_name(source_path, width, ext)
+        if not os.path.exists(os.path.join(static_dir, name)):
+            return None
+        candidates.append((f"url('{STATIC_URL_PREFIX}/{name}')", mime))
+    image_set = ", ".join(f"{url} type('{mime}')" for url, mime in candidates)
+    return candidates[-1][0], f"image-set({image_set})"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate static background image variants.")
+    parser.add_argument("source", help="Path to the full-size background image")
+    parser.add_argument("--static-dir", default=STATIC_DIR)
+    parser.add_argument("--width", type=int, default=BACKGROUND_VARIANT_WIDTH)
+    args = parser.parse_args()
+    for path in build_background_variants(args.source, args.static_dir, args.width):
+        print(f"{path}: {os.path.getsize(path) // 1024} KiB")
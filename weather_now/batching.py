@@ -0,0 +1,173 @@
+"""Coalesces concurrent WeatherAPI lookups for different cities into bulk requests.
+
+WeatherAPI accepts up to 50 locations in one POST to an endpoint with
+``q=bulk`` and a JSON body of ``{"locations": [{"q": ..., "custom_id": ...}]}``.
+It answers ``{"bulk": [{"query": {"custom_id": ..., "q": ..., <payload>}}]}``.
+``BulkDispatcher`` sends a lookup straight away while the endpoint is idle,
+so a lone search pays no extra latency. While a request to the endpoint is
+still on the wire, later lookups collect in a batch for up to ``window``
+seconds, or until ``max_batch`` of them are waiting. The batch then goes out as
+one bulk POST, and each result or error is routed back to the thread that
+asked for it. This is the same trade as Nagle's algorithm: batching only
+happens once there is load to batch.
+
+The first lookup to join a batch (the leader) waits out the window and sends
+it; the others block on their futures. A bulk-unsupported answer (401/403; the
+bulk endpoint needs a paid plan) turns batching off for the process, and those
+lookups, like any missing from a bulk answer, are retried one by one.
+"""
+import json
+import threading
+from concurrent.futures import Future
+from contextlib import nullcontext
+
+import requests
+
+from weather_now.ratelimit import INTERACTIVE, background_traffic, current_priority
+
+MAX_BULK_LOCATIONS = 50              # WeatherAPI's limit per bulk request
+BULK_UNSUPPORTED_STATUSES = frozenset({401, 403})
+
+
+class _RetrySingly(Exception):
+    """Set on a waiter's future when its lookup has to be sent on its own after all."""
+
+
+class _Batch:
+    __slots__ = ("lookups", "full")
+
+    def __init__(self):
+        self.lookups = []  # (custom_id, q, future, priority)
+        self.full = threading.Event()
+
+
+def bulk_error(url, error):
+    """An ``HTTPError`` shaped like the one a single request for the failed location would have raised."""
+    response = requests.models.Response()
+    response.status_code = 400
+    response.url = url
+    response._content = json.dumps({"error": error}).encode("utf-8")
+    response.headers["Content-Type"] = "application/json"
+    return requests.exceptions.HTTPError(f"400 Client Error: {error.get('message')} for url: {url}", response=response)
+
+
+class BulkDispatcher:
+    """Drop-in for ``http.get_json(url, params=params)`` that batches lookups sharing an endpoint and params."""
+
+    def __init__(self, http, window=0.05, max_batch=MAX_BULK_LOCATIONS, metrics=None):
+        self.http = http
+        self.window = window
+        self.max_batch = min(max_batch, MAX_BULK_LOCATIONS)
+        self.metrics = metrics
+        self.bulk_supported = True
+        self._lock = threading.Lock()
+        self._in_flight = {}  # batch key -> requests on the wire
+        self._pending = {}    # batch key -> _Batch still collecting lookups
+        self._counters = {"direct": 0, "batched": 0, "retried_singly": 0, "bulk_requests": 0}
+
+    def get_json(self, url, params):
+        """Returns the payload for ``params["q"]``, raising what a single GET would have raised."""
+        # Everything but the location must match to share a bulk request (the API key, days, aqi, ...)
+        key = (url, tuple(sorted((name, str(value)) for name, value in params.items() if name != "q")))
+        with self._lock:
+            batch = self._pending.get(key)
+            if batch is None and (not self._in_flight.get(key) or not self.bulk_supported or self.window <= 0):
+                self._in_flight[key] = self._in_flight.get(key, 0) + 1
+                direct = True
+            else:
+                direct = False
+                leader = batch is None
+                if leader:
+                    batch = self._pending[key] = _Batch()
+                future = Future()
+                batch.lookups.append((str(len(batch.lookups)), params["q"], future, current_priority()))
+                if len(batch.lookups) >= self.max_batch:
+                    del self._pending[key]
+                    batch.full.set()
+
+        if direct:
+            self._count("direct")
+            try:
+                return self.http.get_json(url, params=params)
+            finally:
+                self._done(key)
+
+        if leader:
+            batch.full.wait(self.window)
+            with self._lock:
+                if self._pending.get(key) is batch:
+                    del self._pending[key]
+                self._in_flight[key] = self._in_flight.get(key, 0) + 1
+            try:
+                self._send(url, params, batch.lookups)
+            finally:
+                self._done(key)
+
+        try:
+            return future.result()
+        except _RetrySingly:
+            self._count("retried_singly")
+            return self.http.get_json(url, params=params)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+            stats["pending"] = sum(len(batch.lookups) for batch in self._pending.values())
+        stats["bulk_supported"] = self.bulk_supported
+        return stats
+
+    def _send(self, url, params, lookups):
+        """POSTs one batch and settles every lookup's future."""
+        if len(lookups) == 1 or not self.bulk_supported:
+            # A bulk of one is just a slower single request
+            for _, _, future, _ in lookups:
+                future.set_exception(_RetrySingly())
+            return
+        self._count("batched", len(lookups))
+        self._count("bulk_requests")
+        body = {"locations": [{"q": q, "custom_id": custom_id} for custom_id, q, _, _ in lookups]}
+        # Sent at interactive priority if any waiting lookup is interactive
+        interactive = any(priority == INTERACTIVE for _, _, _, priority in lookups)
+        try:
+            with nullcontext() if interactive else background_traffic():
+                # Every location is one call against the quota, bulk or not
+                response = self.http.request("POST", url, params={**params, "q": "bulk"}, json=body,
+                                             cost=len(lookups))
+            if response.status_code in BULK_UNSUPPORTED_STATUSES:
+                self.bulk_supported = False
+                results = {}
+            else:
+                response.raise_for_status()
+                results = {
+                    str(entry["query"].get("custom_id")): entry["query"]
+                    for entry in response.json().get("bulk", []) if isinstance(entry.get("query"), dict)
+                }
+        except Exception as e:
+            for _, _, future, _ in lookups:
+                future.set_exception(e)
+            return
+
+        for custom_id, _, future, _ in lookups:
+            result = results.get(custom_id)
+            if result is None:
+                future.set_exception(_RetrySingly())
+            elif "error" in result:
+                future.set_exception(bulk_error(url, result["error"]))
+            else:
+                future.set_result({name: value for name, value in result.items() if name not in ("custom_id", "q")})
+
+    def _done(self, key):
+        with self._lock:
+            self._in_flight[key] -= 1
+            if not self._in_flight[key]:
+                del self._in_flight[key]
+
+    def _count(self, event, amount=1):
+        with self._lock:
+            self._counters[event] += amount
+        if self.metrics is None:
+            return
+        if event == "bulk_requests":
+            self.metrics.inc("weather_bulk_requests_total", amount)
+        else:
+            self.metrics.inc("weather_bulk_lookups_total", amount, route=event)
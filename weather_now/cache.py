@@ -0,0 +1,239 @@
+"""Process-wide TTL/LRU cache for upstream API responses.
+
+Entries are grouped by namespace (e.g. ``"current"`` and ``"forecast"``), each
+with its own TTL. Expired entries are kept for a grace period and served
+immediately while a background refresh replaces them (stale-while-revalidate).
+When a ``SingleFlight`` group is supplied, concurrent misses for the same key share
+one upstream fetch. An optional persistent ``store`` (see ``disk_cache.DiskCache``)
+acts as a write-through second tier consulted on memory misses.
+"""
+import json
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from weather_now.ratelimit import background_traffic
+
+
+def normalize_city(city):
+    """Returns the cache key for a free-text city name ("  São-Paulo " -> "sao paulo")."""
+    chars = []
+    for ch in str(city).casefold():
+        # Drop accents from Latin letters only; Devanagari vowel signs are combining marks too
+        folded = "".join(c for c in unicodedata.normalize("NFKD", ch) if not unicodedata.combining(c))
+        ch = folded if folded and folded.isascii() else ch
+        chars.append(ch if ch in ",.-" or ch.isspace() or unicodedata.category(ch[:1])[0] in "LNM" else " ")
+    text = "".join(chars)
+    # Keep '.' and '-' only where they belong to coordinates ("28.61,-77.2")
+    text = re.sub(r"\.(?!\d)|(?<!\d)\.|-(?![\d.])", " ", text)
+    return re.sub(r"\s*,\s*", ",", " ".join(text.split()))
+
+
+def estimate_size(value):
+    """Approximates the memory footprint of a JSON-like value by its encoded length."""
+    try:
+        return len(json.dumps(value, separators=(",", ":"), default=str))
+    except (TypeError, ValueError):
+        return 1024
+
+
+class _Entry:
+    __slots__ = ("value", "size", "stored_at", "expires_at", "refreshing")
+
+    def __init__(self, value, size, stored_at, expires_at):
+        self.value = value
+        self.size = size
+        self.stored_at = stored_at
+        self.expires_at = expires_at
+        self.refreshing = False
+
+
+class ResponseCache:
+    """Thread-safe LRU cache bounded by an approximate byte budget."""
+
+    def __init__(self, ttls=None, default_ttl=600, stale_ttl=900, max_bytes=32 * 1024 * 1024,
+                 refresh_workers=2, flights=None, store=None, clock=time.monotonic):
+        self.ttls = dict(ttls or {})
+        self.default_ttl = default_ttl
+        self.stale_ttl = stale_ttl
+        self.max_bytes = max_bytes
+        self.flights = flights
+        self.store = store
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._refresher = ThreadPoolExecutor(max_workers=refresh_workers, thread_name_prefix="cache-refresh")
+        self._counters = {"hits": 0, "stale_hits": 0, "disk_hits": 0, "expired_hits": 0, "misses": 0,
+                          "evictions": 0, "refreshes": 0, "refresh_errors": 0}
+
+    # --- Public API ---
+
+    def ttl_for(self, namespace):
+        return self.ttls.get(namespace, self.default_ttl)
+
+    def get(self, namespace, key, allow_stale=False):
+        """Returns a cached value (memory, then the persistent store) or None. Does not trigger refreshes."""
+        with self._lock:
+            entry = self._entries.get((namespace, key))
+        if entry is None and self.store is not None and self._promote(namespace, key):
+            with self._lock:
+                entry = self._entries.get((namespace, key))
+        if entry is None:
+            return None
+        now = self._clock()
+        if now < entry.expires_at or (allow_stale and now < entry.expires_at + self.stale_ttl):
+            return entry.value
+        return None
+
+    def set(self, namespace, key, value, size=None):
+        size = estimate_size(value) if size is None else size
+        ttl = self.ttl_for(namespace)
+        now = self._clock()
+        with self._lock:
+            self._store(namespace, key, _Entry(value, size, now, now + ttl))
+        if self.store is not None:
+            self.store.set(namespace, key, value, ttl)
+
+    def get_or_fetch(self, namespace, key, fetch):
+        """Returns the cached value for ``key``, calling ``fetch()`` on a miss.
+
+        Stale entries are returned as-is and refreshed in the background. Exceptions
+        raised by ``fetch`` propagate to the caller and are never cached.
+        """
+        found, value = self._lookup(namespace, key, fetch)
+        if not found and self.store is not None and self._promote(namespace, key):
+            found, value = self._lookup(namespace, key, fetch)
+        if found:
+            return value
+
+        with self._lock:
+            self._counters["misses"] += 1
+        return self._load(namespace, key, fetch)
+
+    def last_known(self, namespace, key):
+        """Returns the most recent value still held in memory or the store, however old, or None.
+
+        Used as a last resort when the upstream cannot be called (e.g. the quota is spent).
+        """
+        with self._lock:
+            entry = self._entries.get((namespace, key))
+            if entry is not None:
+                self._counters["expired_hits"] += 1
+                return entry.value
+        persisted = self.store.get(namespace, key) if self.store is not None else None
+        if persisted is None:
+            return None
+        with self._lock:
+            self._counters["expired_hits"] += 1
+        return persisted[0]
+
+    def refresh(self, namespace, key, fetch):
+        """Calls ``fetch()`` unconditionally and stores the result; used for cache warming."""
+        value = self._load(namespace, key, fetch)
+        with self._lock:
+            self._counters["refreshes"] += 1
+        return value
+
+    def ttl_remaining(self, namespace, key):
+        """Seconds until the in-memory entry expires (negative once stale), or None if absent."""
+        with self._lock:
+            entry = self._entries.get((namespace, key))
+            return None if entry is None else entry.expires_at - self._clock()
+
+    def expiring_within(self, namespace, seconds):
+        """Lists keys in ``namespace`` whose entries expire in the next ``seconds``."""
+        deadline = self._clock() + seconds
+        with self._lock:
+            return [k for (ns, k), e in self._entries.items() if ns == namespace and e.expires_at <= deadline]
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+            stats["entries"] = len(self._entries)
+            stats["bytes"] = self._bytes
+        lookups = stats["hits"] + stats["stale_hits"] + stats["misses"]
+        stats["hit_ratio"] = (stats["hits"] + stats["stale_hits"]) / lookups if lookups else 0.0
+        return stats
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    # --- Internals ---
+
+    def _lookup(self, namespace, key, fetch):
+        """Returns (found, value) from memory, scheduling a refresh for stale entries."""
+        cache_key = (namespace, key)
+        with self._lock:
+            entry = self._entries.get(cache_key)
+            now = self._clock()
+            if entry is not None and now < entry.expires_at:
+                self._entries.move_to_end(cache_key)
+                self._counters["hits"] += 1
+                return True, entry.value
+            if entry is not None and now < entry.expires_at + self.stale_ttl:
+                self._entries.move_to_end(cache_key)
+                self._counters["stale_hits"] += 1
+                if not entry.refreshing:
+                    entry.refreshing = True
+                    self._refresher.submit(self._refresh, namespace, key, fetch)
+                return True, entry.value
+        return False, None
+
+    def _promote(self, namespace, key):
+        """Copies a persisted entry (fresh or within the stale window) into memory."""
+        persisted = self.store.get(namespace, key)
+        if persisted is None:
+            return False
+        value, remaining = persisted
+        if remaining <= -self.stale_ttl:
+            return False
+        now = self._clock()
+        with self._lock:
+            self._store(namespace, key, _Entry(value, estimate_size(value), now, now + remaining))
+            self._counters["disk_hits"] += 1
+        return True
+
+    def _load(self, namespace, key, fetch):
+        def load():
+            value = fetch()
+            self.set(namespace, key, value)
+            return value
+
+        if self.flights is None:
+            return load()
+        return self.flights.do((namespace, key), load)
+
+    def _refresh(self, namespace, key, fetch):
+        try:
+            # Nobody is waiting on a stale-while-revalidate refresh, so it yields to user traffic
+            with background_traffic():
+                self._load(namespace, key, fetch)
+        except Exception:
+            with self._lock:
+                self._counters["refresh_errors"] += 1
+                entry = self._entries.get((namespace, key))
+                if entry is not None:
+                    entry.refreshing = False
+            return
+        with self._lock:
+            self._counters["refreshes"] += 1
+
+    def _store(self, namespace, key, entry):
+        cache_key = (namespace, key)
+        old = self._entries.pop(cache_key, None)
+        if old is not None:
+            self._bytes -= old.size
+        if entry.size > self.max_bytes:
+            return
+        self._entries[cache_key] = entry
+        self._bytes += entry.size
+        while self._bytes > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= evicted.size
+            self._counters["evictions"] += 1
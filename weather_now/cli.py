@@ -0,0 +1,146 @@
+"""Headless batch lookups that stream one NDJSON record per city to stdout.
+
+Usage::
+
+    python -m weather_now.cli cities.txt --concurrency 16 > weather.ndjson
+    cat cities.txt | python -m weather_now.cli -
+
+Reads one city per line (blank lines and ``#`` comments are skipped). Records are
+written in completion order as each city finishes; only ``2 * concurrency``
+lookups are held in memory at a time, so input of any length streams through.
+The API key is read from ``--api-key`` or the ``WEATHERAPI_KEY`` environment variable.
+With ``--hourly-quota`` the run is paced by a token bucket instead of exhausting the key.
+"""
+import argparse
+import json
+import os
+import sys
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import requests
+
+from weather_now.cache import ResponseCache
+from weather_now.disk_cache import DiskCache
+from weather_now.gazetteer import Gazetteer
+from weather_now.http import HttpClient
+from weather_now.ratelimit import QuotaExceededError, RateLimiter
+from weather_now.singleflight import SingleFlight
+from weather_now.weather import WEATHERAPI_BASE_URL, WeatherService, build_weather_record
+
+
+def iter_cities(stream):
+    for line in stream:
+        city = " ".join(line.split())
+        if city and not city.startswith("#"):
+            yield city
+
+
+def lookup(service, city):
+    """Returns the NDJSON record for one city; failures become records with an ``error``."""
+    try:
+        current_data, forecast_data = service.fetch_payloads(city)
+        if 'error' in current_data:
+            return {"query": city, "error": current_data['error'].get('message', 'not found')}
+        return build_weather_record(city, current_data, forecast_data)
+    except requests.exceptions.HTTPError as e:
+        return {"query": city, "error": f"HTTP {e.response.status_code}: {_upstream_message(e.response)}"}
+    except QuotaExceededError as e:
+        return {"query": city, "error": f"quota: {e}"}
+    except requests.exceptions.RequestException as e:
+        return {"query": city, "error": f"network: {e}"}
+    except Exception as e:
+        # One malformed payload must not end the stream for every other city
+        return {"query": city, "error": f"{type(e).__name__}: {e}"}
+
+
+def _upstream_message(response):
+    try:
+        return response.json()['error']['message']
+    except (ValueError, KeyError, TypeError):
+        return response.reason
+
+
+def run_batch(cities, service, out, concurrency):
+    """Streams records for ``cities`` to ``out``; returns (succeeded, failed) counts."""
+    succeeded = failed = 0
+    window = max(1, concurrency) * 2
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="batch") as pool:
+        pending = set()
+        for city in cities:
+            pending.add(pool.submit(lookup, service, city))
+            if len(pending) >= window:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                succeeded, failed = _write(done, out, succeeded, failed)
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            succeeded, failed = _write(done, out, succeeded, failed)
+    return succeeded, failed
+
+
+def _write(done, out, succeeded, failed):
+    for future in done:
+        record = future.result()
+        out.write(json.dumps(record, ensure_ascii=False) + "\n")
+        if record.get("error"):
+            failed += 1
+        else:
+            succeeded += 1
+    out.flush()
+    return succeeded, failed
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m weather_now.cli", description=__doc__.split("\n\n")[0])
+    parser.add_argument("input", nargs="?", default="-", help="File with one city per line, or '-' for stdin")
+    parser.add_argument("--api-key", default=os.environ.get("WEATHERAPI_KEY"), help="WeatherAPI key (default: $WEATHERAPI_KEY)")
+    parser.add_argument("--concurrency", type=int, default=8, help="Lookups in flight at once (default: 8)")
+    parser.add_argument("--connect-timeout", type=float, default=3.05, help="Connect timeout in seconds")
+    parser.add_argument("--read-timeout", type=float, default=10.0, help="Read timeout in seconds")
+    parser.add_argument("--retries", type=int, default=2, help="Retries for transient upstream failures")
+    parser.add_argument("--days", type=int, default=3, help="Forecast days per city (default: 3)")
+    parser.add_argument("--hourly-quota", type=int, default=int(os.environ.get("WEATHERAPI_HOURLY_QUOTA", 0)),
+                        help="WeatherAPI calls allowed per hour, 0 for unlimited (default: $WEATHERAPI_HOURLY_QUOTA)")
+    parser.add_argument("--no-cache", action="store_true", help="Disable response caching entirely")
+    parser.add_argument("--no-gazetteer", action="store_true",
+                        help="Send names to WeatherAPI verbatim instead of resolving bundled cities to coordinates")
+    parser.add_argument("--cache-db", default=os.environ.get("WEATHER_CACHE_DB"),
+                        help="SQLite response cache shared with the app (default: $WEATHER_CACHE_DB)")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if not args.api_key:
+        print("error: WeatherAPI key missing; pass --api-key or set WEATHERAPI_KEY", file=sys.stderr)
+        return 2
+
+    limiter = None
+    if args.hourly_quota > 0:
+        # The batch is the only traffic in this process, so it may wait for tokens instead of failing fast
+        limiter = RateLimiter({"WeatherAPI": args.hourly_quota}, routes={WEATHERAPI_BASE_URL: "WeatherAPI"},
+                              background_reserve=0.0, max_wait=3600.0 / args.hourly_quota * 2)
+    http = HttpClient(connect_timeout=args.connect_timeout, read_timeout=args.read_timeout,
+                      max_retries=args.retries, pool_size=max(args.concurrency, 1), limiter=limiter)
+    cache = None
+    if not args.no_cache:
+        store = DiskCache(args.cache_db) if args.cache_db else None
+        cache = ResponseCache(ttls={"current": 600, "forecast": 1800, "not_found": 86400},
+                              flights=SingleFlight(), store=store)
+    gazetteer = None if args.no_gazetteer else Gazetteer.from_csv()
+    service = WeatherService(args.api_key, http, cache=cache, forecast_days=args.days, gazetteer=gazetteer)
+
+    stream = sys.stdin if args.input == "-" else open(args.input, encoding="utf-8")
+    try:
+        succeeded, failed = run_batch(iter_cities(stream), service, sys.stdout, args.concurrency)
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+    print(f"{succeeded} succeeded, {failed} failed", file=sys.stderr)
+    if limiter is not None:
+        tokens_left, capacity = limiter.remaining()["WeatherAPI"]
+        print(f"{int(tokens_left)} of {int(capacity)} burst calls left for WeatherAPI", file=sys.stderr)
+    return 1 if failed and not succeeded else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
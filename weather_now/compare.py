@@ -0,0 +1,42 @@
+"""Bounded-concurrency fetching for the multi-city comparison view."""
+import asyncio
+import re
+
+from weather_now.cache import normalize_city
+
+
+def parse_city_list(text, limit=50):
+    """
+    Splits newline or semicolon separated input into unique city names, keeping order.
+
+    Commas are not separators: they belong to names like "Paris, France" or "Portland, OR".
+    """
+    cities, seen = [], set()
+    for raw in re.split(r"[\n;]+", text or ""):
+        city = " ".join(raw.split())
+        key = normalize_city(city)
+        if city and key not in seen:
+            seen.add(key)
+            cities.append(city)
+            if len(cities) >= limit:
+                break
+    return cities
+
+
+async def iter_completed(items, fetch, limit):
+    """
+    Runs the blocking ``fetch(item)`` on worker threads, at most ``limit`` at a time,
+    and yields ``(item, result, error)`` in completion order.
+    """
+    semaphore = asyncio.Semaphore(limit)
+
+    async def run(item):
+        async with semaphore:
+            try:
+                return item, await asyncio.to_thread(fetch, item), None
+            except Exception as e:
+                return item, None, e
+
+    tasks = [asyncio.create_task(run(item)) for item in items]
+    for next_done in asyncio.as_completed(tasks):
+        yield await next_done
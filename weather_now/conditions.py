@@ -0,0 +1,107 @@
+"""Weather condition classification keyed by WeatherAPI's numeric ``condition.code``.
+
+Each code maps to its background image key, forecast icon and whether it raises
+the severe-weather alert, so one dict lookup replaces the separate keyword scans
+the app used to run. Payloads without a known code fall back to ordered keyword
+rules over the condition text; those results are memoized.
+
+Severity keeps the app's original rule: a condition whose text mentions
+thunder, rain, snow, sleet or anything heavy raises the alert.
+"""
+from collections import namedtuple
+from functools import lru_cache
+
+Condition = namedtuple("Condition", ["background", "icon", "severe"])
+
+CLEAR = Condition("clear", "☀️", False)
+CLOUDS = Condition("clouds", "☁️", False)
+MIST = Condition("mist", "🌫️", False)
+DRIZZLE = Condition("drizzle", "☔", False)
+HEAVY_DRIZZLE = Condition("drizzle", "☔", True)
+RAIN = Condition("rain", "🌧️", True)
+SNOW = Condition("snow", "❄️", True)
+ICE = Condition("snow", "❄️", False)  # ice pellets and blizzards: wintry, but none of the alert's words
+THUNDER = Condition("thunderstorm", "⛈️", True)
+UNKNOWN = Condition("default", "❓", False)
+
+# Every code from https://www.weatherapi.com/docs/weather_conditions.json, with its day text
+CONDITION_CODES = {
+    1000: ("Sunny", CLEAR),
+    1003: ("Partly cloudy", CLOUDS),
+    1006: ("Cloudy", CLOUDS),
+    1009: ("Overcast", CLOUDS),
+    1030: ("Mist", MIST),
+    1063: ("Patchy rain possible", RAIN),
+    1066: ("Patchy snow possible", SNOW),
+    1069: ("Patchy sleet possible", SNOW),
+    1072: ("Patchy freezing drizzle possible", DRIZZLE),
+    1087: ("Thundery outbreaks possible", THUNDER),
+    1114: ("Blowing snow", SNOW),
+    1117: ("Blizzard", ICE),
+    1135: ("Fog", MIST),
+    1147: ("Freezing fog", MIST),
+    1150: ("Patchy light drizzle", DRIZZLE),
+    1153: ("Light drizzle", DRIZZLE),
+    1168: ("Freezing drizzle", DRIZZLE),
+    1171: ("Heavy freezing drizzle", HEAVY_DRIZZLE),
+    1180: ("Patchy light rain", RAIN),
+    1183: ("Light rain", RAIN),
+    1186: ("Moderate rain at times", RAIN),
+    1189: ("Moderate rain", RAIN),
+    1192: ("Heavy rain at times", RAIN),
+    1195: ("Heavy rain", RAIN),
+    1198: ("Light freezing rain", RAIN),
+    1201: ("Moderate or heavy freezing rain", RAIN),
+    1204: ("Light sleet", SNOW),
+    1207: ("Moderate or heavy sleet", SNOW),
+    1210: ("Patchy light snow", SNOW),
+    1213: ("Light snow", SNOW),
+    1216: ("Patchy moderate snow", SNOW),
+    1219: ("Moderate snow", SNOW),
+    1222: ("Patchy heavy snow", SNOW),
+    1225: ("Heavy snow", SNOW),
+    1237: ("Ice pellets", ICE),
+    1240: ("Light rain shower", RAIN),
+    1243: ("Moderate or heavy rain shower", RAIN),
+    1246: ("Torrential rain shower", RAIN),
+    1249: ("Light sleet showers", SNOW),
+    1252: ("Moderate or heavy sleet showers", SNOW),
+    1255: ("Light snow showers", SNOW),
+    1258: ("Moderate or heavy snow showers", SNOW),
+    1261: ("Light showers of ice pellets", ICE),
+    1264: ("Moderate or heavy showers of ice pellets", SNOW),
+    1273: ("Patchy light rain with thunder", THUNDER),
+    1276: ("Moderate or heavy rain with thunder", THUNDER),
+    1279: ("Patchy light snow with thunder", THUNDER),
+    1282: ("Moderate or heavy snow with thunder", THUNDER),
+}
+
+CONDITIONS_BY_CODE = {code: condition for code, (_, condition) in CONDITION_CODES.items()}
+
+# Fallback for payloads without a known code. Order matters: "rain with thunder" is a storm.
+TEXT_RULES = (
+    (("thunder", "storm"), THUNDER),
+    (("snow", "sleet", "heavy showers of ice"), SNOW),
+    (("ice", "blizzard"), ICE),
+    (("heavy freezing drizzle",), HEAVY_DRIZZLE),
+    (("drizzle",), DRIZZLE),
+    (("rain", "shower"), RAIN),
+    (("mist", "fog", "haze"), MIST),
+    (("cloud", "overcast"), CLOUDS),
+    (("clear", "sunny"), CLEAR),
+)
+
+
+@lru_cache(maxsize=256)
+def classify_text(condition_text):
+    text = (condition_text or "").lower()
+    for keywords, condition in TEXT_RULES:
+        if any(keyword in text for keyword in keywords):
+            return condition
+    return UNKNOWN
+
+
+def classify(condition):
+    """Returns the Condition for a WeatherAPI ``condition`` block ({"text": ..., "code": ...})."""
+    found = CONDITIONS_BY_CODE.get(condition.get("code"))
+    return found if found is not None else classify_text(condition.get("text"))
@@ -0,0 +1,96 @@
+"""SQLite-backed response store shared by every process on a host.
+
+Used as the second tier behind ``ResponseCache``: restarted or newly started
+replicas read responses other processes already paid for instead of calling the
+upstream again. The database runs in WAL mode so readers never block the single
+writer, and each thread keeps its own connection. Expiry uses wall-clock
+timestamps so entries stay meaningful across processes and restarts. Rows
+long expired are purged at startup and then by a write every
+``purge_interval`` seconds, so a long-lived replica's database stays bounded.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    namespace  TEXT NOT NULL,
+    key        TEXT NOT NULL,
+    value      TEXT NOT NULL,
+    stored_at  REAL NOT NULL,
+    expires_at REAL NOT NULL,
+    PRIMARY KEY (namespace, key)
+) WITHOUT ROWID
+"""
+
+
+class DiskCache:
+    """Persistent (namespace, key) -> JSON value store with per-entry expiry."""
+
+    def __init__(self, path, busy_timeout=5.0, retention=24 * 3600, purge_interval=3600, clock=time.time):
+        self.path = path
+        self.busy_timeout = busy_timeout
+        self.retention = retention
+        self.purge_interval = purge_interval
+        self._clock = clock
+        self._local = threading.local()
+        self._purge_lock = threading.Lock()
+        self._next_purge = clock() + purge_interval
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        conn = self._connection()
+        conn.execute(SCHEMA)
+        self.purge()
+
+    def get(self, namespace, key):
+        """Returns (value, seconds_until_expiry) or None. Expired rows are returned with a negative TTL."""
+        try:
+            row = self._connection().execute(
+                "SELECT value, expires_at FROM responses WHERE namespace = ? AND key = ?", (namespace, key)
+            ).fetchone()
+        except sqlite3.Error:
+            return None
+        if row is None:
+            return None
+        return json.loads(row[0]), row[1] - self._clock()
+
+    def set(self, namespace, key, value, ttl):
+        now = self._clock()
+        try:
+            self._connection().execute(
+                "INSERT OR REPLACE INTO responses (namespace, key, value, stored_at, expires_at) VALUES (?, ?, ?, ?, ?)",
+                (namespace, key, json.dumps(value, separators=(",", ":")), now, now + ttl),
+            )
+        except (sqlite3.Error, TypeError, ValueError):
+            # A failed write only costs a future upstream call; never fail the request for it.
+            pass
+        if self._purge_due(now):
+            self.purge()
+
+    def purge(self):
+        """Deletes rows that expired more than ``retention`` seconds ago."""
+        try:
+            self._connection().execute("DELETE FROM responses WHERE expires_at < ?", (self._clock() - self.retention,))
+        except sqlite3.Error:
+            pass
+
+    def _purge_due(self, now):
+        """True for the one write that claims the next scheduled purge."""
+        if now < self._next_purge:
+            return False
+        with self._purge_lock:
+            if now < self._next_purge:
+                return False
+            self._next_purge = now + self.purge_interval
+            return True
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=self.busy_timeout, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
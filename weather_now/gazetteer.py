@@ -0,0 +1,82 @@
+"""Bundled offline gazetteer: canonical city resolution and prefix autocomplete.
+
+Free-text input ("delhi ", "New Delhi", "Bombay") is resolved to one canonical
+place before any network call, so every spelling shares a single cache entry and
+WeatherAPI is queried by coordinates. The index is a sorted tuple of normalized
+names and aliases; prefix lookups are a ``bisect`` plus a short forward scan.
+"""
+import bisect
+import csv
+import os
+from collections import namedtuple
+
+from weather_now.cache import normalize_city
+
+DEFAULT_GAZETTEER_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "cities.csv")
+
+Place = namedtuple("Place", ["name", "country", "lat", "lon"])
+
+
+def place_query(place):
+    """WeatherAPI ``q`` value for a place; also used as its canonical cache key."""
+    return f"{place.lat:.2f},{place.lon:.2f}"
+
+
+class Gazetteer:
+    """Read-only name -> Place index with prefix completion."""
+
+    def __init__(self, rows):
+        """``rows`` is an iterable of (name, country, lat, lon, aliases) tuples."""
+        self.places = []
+        lookup = {}
+        for name, country, lat, lon, aliases in rows:
+            place = Place(name, country, float(lat), float(lon))
+            self.places.append(place)
+            for label in [name, *aliases]:
+                # First row wins for ambiguous names; the data file lists larger cities first
+                lookup.setdefault(normalize_city(label), place)
+        self._lookup = lookup
+        self._keys = tuple(sorted(lookup))
+
+    @classmethod
+    def from_csv(cls, path=DEFAULT_GAZETTEER_PATH):
+        with open(path, encoding="utf-8", newline="") as f:
+            return cls(
+                (row["name"], row["country"], row["lat"], row["lon"], [a for a in row["aliases"].split(";") if a])
+                for row in csv.DictReader(f)
+            )
+
+    def __len__(self):
+        return len(self.places)
+
+    def names(self):
+        """Canonical names of every bundled place, larger cities first (the data file's order)."""
+        return [place.name for place in self.places]
+
+    def resolve(self, text):
+        """Returns the canonical Place for a name or alias, or None if it is not bundled."""
+        return self._lookup.get(normalize_city(text))
+
+    def complete(self, prefix, limit=5):
+        """Returns up to ``limit`` distinct places whose name or alias starts with ``prefix``."""
+        prefix = normalize_city(prefix)
+        if not prefix:
+            return []
+        results = []
+        i = bisect.bisect_left(self._keys, prefix)
+        while i < len(self._keys) and self._keys[i].startswith(prefix) and len(results) < limit:
+            place = self._lookup[self._keys[i]]
+            if place not in results:
+                results.append(place)
+            i += 1
+        return results
+
+    def suggest(self, text, limit=5):
+        """Completes ``text``, dropping trailing characters until something matches ("Dehradn" -> Dehradun)."""
+        prefix = normalize_city(text)
+        while len(prefix) >= 2:
+            results = self.complete(prefix, limit)
+            if results:
+                return results
+            prefix = prefix[:-1]
+        return []
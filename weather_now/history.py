@@ -0,0 +1,307 @@
+"""Append-only, columnar on-disk history of the weather every fetch returned.
+
+A search used to be forgotten as soon as the next one started. ``HistoryStore``
+keeps one directory per city::
+
+    <directory>/<digest>/index.json             city key, name, UTC offset, rows and time span per series
+    <directory>/<digest>/current/<column>.bin   one row per new current-conditions observation
+    <directory>/<digest>/forecast/<column>.bin  one row per forecast day, per forecast issue
+
+Every column is a flat little-endian array grown by plain appends and read back
+through ``np.memmap``. A range query is a ``searchsorted`` on the time column
+followed by slicing the columns it asks for; nothing is parsed. Rows older than
+``retention`` are dropped by rewriting a series once its oldest row is
+``compact_slack`` past the cutoff, so compaction is rare and its cost amortized.
+Appends compact the series they touch; a sweep every ``sweep_interval``
+seconds (and once at startup) does the same for every city, so cities nobody
+searches any more expire too, and removes cities left with no rows at all.
+The store keeps a running total of its size on disk, recounted by each sweep.
+
+Appends are serialized per process. Processes sharing the directory may, rarely,
+duplicate an observation or lose one that races a compaction; either only
+costs a point on a trend chart.
+"""
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+# Column name -> dtype, per series; "time" (epoch seconds, non-decreasing) comes first
+SERIES = {
+    # time: when WeatherAPI last updated the observation
+    "current": (
+        ("time", "<i8"), ("temp_c", "<f4"), ("feels_like_c", "<f4"), ("humidity", "<f4"),
+        ("wind_kph", "<f4"), ("pressure_mb", "<f4"), ("precip_mm", "<f4"),
+    ),
+    # time: when the forecast was issued; valid: midnight (UTC epoch) of the day it is for
+    "forecast": (
+        ("time", "<i8"), ("valid", "<i8"), ("max_temp_c", "<f4"), ("min_temp_c", "<f4"),
+        ("precip_mm", "<f4"), ("chance_of_rain", "<f4"),
+    ),
+}
+INDEX_FILE = "index.json"
+
+
+def city_digest(city_key):
+    """Directory name for a city key (keys are free text, coordinates or ids)."""
+    return hashlib.sha256(city_key.encode("utf-8")).hexdigest()[:24]
+
+
+def utc_offset(location):
+    """Seconds the location's local time is ahead of UTC, from a payload's ``location`` block (or None)."""
+    try:
+        local = datetime.strptime(location['localtime'], "%Y-%m-%d %H:%M").replace(tzinfo=timezone.utc)
+        offset = local.timestamp() - location['localtime_epoch']
+    except (KeyError, TypeError, ValueError):
+        return None
+    return int(round(offset / 900) * 900)  # localtime is rounded to the minute; offsets are in quarter hours
+
+
+def current_rows(current_data):
+    """Columns of the one observation in a current.json-style payload, or None without a timestamp."""
+    current = (current_data or {}).get('current') or {}
+    if current.get('last_updated_epoch') is None:
+        return None
+    return {
+        "time": [current['last_updated_epoch']],
+        "temp_c": [current.get('temp_c', np.nan)],
+        "feels_like_c": [current.get('feelslike_c', np.nan)],
+        "humidity": [current.get('humidity', np.nan)],
+        "wind_kph": [current.get('wind_kph', np.nan)],
+        "pressure_mb": [current.get('pressure_mb', np.nan)],
+        "precip_mm": [current.get('precip_mm', np.nan)],
+    }
+
+
+def forecast_rows(forecast_data):
+    """Columns of a forecast.json payload's daily outlook, all stamped with its issue time, or None."""
+    issued = ((forecast_data or {}).get('current') or {}).get('last_updated_epoch')
+    forecast_days = ((forecast_data or {}).get('forecast') or {}).get('forecastday') or []
+    if issued is None or not forecast_days:
+        return None
+    return {
+        "time": [issued] * len(forecast_days),
+        "valid": [day['date_epoch'] for day in forecast_days],
+        "max_temp_c": [day['day'].get('maxtemp_c', np.nan) for day in forecast_days],
+        "min_temp_c": [day['day'].get('mintemp_c', np.nan) for day in forecast_days],
+        "precip_mm": [day['day'].get('totalprecip_mm', np.nan) for day in forecast_days],
+        "chance_of_rain": [day['day'].get('daily_chance_of_rain', np.nan) for day in forecast_days],
+    }
+
+
+def _tree_bytes(directory):
+    """Total size of the files under ``directory`` (0 if it does not exist)."""
+    total = 0
+    for root, _, files in os.walk(directory):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass  # removed by another process mid-walk
+    return total
+
+
+def _read_column(path, dtype, rows=None):
+    """Memory-maps a column file (the first ``rows`` rows if given); empty or missing files give an empty array."""
+    dtype = np.dtype(dtype)
+    try:
+        available = os.path.getsize(path) // dtype.itemsize
+    except OSError:
+        available = 0
+    rows = available if rows is None else min(rows, available)
+    if rows == 0:
+        return np.empty(0, dtype)
+    return np.memmap(path, dtype=dtype, mode="r", shape=(rows,))
+
+
+class HistoryStore:
+    """Per-city columnar series of past observations and forecasts, bounded by ``retention`` seconds."""
+
+    def __init__(self, directory, retention=90 * 86400, compact_slack=86400, sweep_interval=3600, clock=time.time):
+        self.directory = directory
+        self.retention = retention
+        self.compact_slack = compact_slack
+        self.sweep_interval = sweep_interval
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._counters = {"appended": 0, "skipped": 0, "compactions": 0, "removed_cities": 0, "write_errors": 0}
+        self._bytes = 0
+        self._next_sweep = 0.0
+        os.makedirs(directory, exist_ok=True)
+        self.sweep()
+
+    def record(self, city_key, current_data=None, forecast_data=None):
+        """
+        Appends whatever in the payloads is newer than the city's stored rows; returns the rows added.
+        Cached payloads are passed in again and again, so repeats are the normal case and cost one
+        memory-mapped read of the last timestamp.
+        """
+        location = (current_data or {}).get('location') or (forecast_data or {}).get('location') or {}
+        added = 0
+        for series, columns in (("current", current_rows(current_data)), ("forecast", forecast_rows(forecast_data))):
+            if columns is not None:
+                added += self.append(city_key, series, columns, location)
+        return added
+
+    def append(self, city_key, series, columns, location=None):
+        """Appends ``columns`` (name -> equal-length values) unless they are not newer than the last row."""
+        dtypes = dict(SERIES[series])
+        city_dir = os.path.join(self.directory, city_digest(city_key))
+        series_dir = os.path.join(city_dir, series)
+        with self._lock:
+            try:
+                rows = self._repair(series_dir, dtypes)
+                last = _read_column(os.path.join(series_dir, "time.bin"), dtypes["time"], rows)[-1:]
+                if len(last) and columns["time"][0] <= last[0]:
+                    self._counters["skipped"] += 1
+                    return 0
+                before = _tree_bytes(city_dir)
+                os.makedirs(series_dir, exist_ok=True)
+                # "time" last: a torn append leaves it shortest, and _repair trims the rest back to it
+                for name in sorted(dtypes, key=lambda name: name == "time"):
+                    with open(os.path.join(series_dir, f"{name}.bin"), "ab") as f:
+                        f.write(np.asarray(columns[name], dtype=dtypes[name]).tobytes())
+                self._counters["appended"] += len(columns["time"])
+                self._compact(series_dir, dtypes)
+                self._write_index(city_dir, city_key, location or {})
+                self._bytes += _tree_bytes(city_dir) - before
+            except OSError:
+                self._counters["write_errors"] += 1
+                return 0
+        if self._clock() >= self._next_sweep:
+            self.sweep()
+        return len(columns["time"])
+
+    def sweep(self):
+        """
+        Compacts every city's series, removes cities with no rows left and recounts the bytes on
+        disk. Runs at construction and then from ``append`` every ``sweep_interval`` seconds.
+        """
+        with self._lock:
+            self._next_sweep = self._clock() + self.sweep_interval
+            try:
+                entries = [entry.path for entry in os.scandir(self.directory) if entry.is_dir()]
+            except OSError:
+                self._counters["write_errors"] += 1
+                return
+            for city_dir in entries:
+                try:
+                    self._sweep_city(city_dir)
+                except OSError:
+                    self._counters["write_errors"] += 1
+            self._bytes = _tree_bytes(self.directory)
+
+    def query(self, city_key, series="current", start=None, end=None, columns=None):
+        """
+        Returns {column: array} for rows with ``start <= time <= end`` (epoch seconds, either bound
+        optional), oldest first. The arrays are copies, independent of later appends and compactions.
+        """
+        dtypes = dict(SERIES[series])
+        series_dir = os.path.join(self.directory, city_digest(city_key), series)
+        names = ["time", *(name for name in (columns or dtypes) if name != "time")]
+        loaded = {name: _read_column(os.path.join(series_dir, f"{name}.bin"), dtypes[name]) for name in names}
+        rows = min(len(column) for column in loaded.values())
+        time_column = loaded["time"][:rows]
+        lo = 0 if start is None else int(np.searchsorted(time_column, start, side="left"))
+        hi = rows if end is None else int(np.searchsorted(time_column, end, side="right"))
+        return {name: np.array(loaded[name][lo:hi]) for name in names}
+
+    def nearest(self, city_key, when, tolerance, series="current"):
+        """Returns the row (column -> value) closest to ``when`` within ``tolerance`` seconds, or None."""
+        window = self.query(city_key, series, when - tolerance, when + tolerance)
+        if not len(window["time"]):
+            return None
+        i = int(np.argmin(np.abs(window["time"] - when)))
+        return {name: column[i].item() for name, column in window.items()}
+
+    def index(self, city_key):
+        """The city's index (name, UTC offset, per-series rows and time span), or None if it has no history."""
+        return self._read_index(os.path.join(self.directory, city_digest(city_key)))
+
+    def cities(self):
+        """Indexes of every city with stored history."""
+        indexes = (self._read_index(entry.path) for entry in os.scandir(self.directory) if entry.is_dir())
+        return [index for index in indexes if index is not None]
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+            stats["bytes"] = self._bytes
+        return stats
+
+    def _sweep_city(self, city_dir):
+        index = self._read_index(city_dir)
+        if index is None:
+            return  # mid-creation by another writer, or not ours
+        for series, columns in SERIES.items():
+            series_dir = os.path.join(city_dir, series)
+            if os.path.isdir(series_dir):
+                dtypes = dict(columns)
+                self._repair(series_dir, dtypes)
+                self._compact(series_dir, dtypes)
+        self._write_index(city_dir, index["city_key"], {})
+        if not self._read_index(city_dir)["series"]:
+            shutil.rmtree(city_dir, ignore_errors=True)
+            self._counters["removed_cities"] += 1
+
+    def _repair(self, series_dir, dtypes):
+        """Trims every column to the shortest one (after a torn append) and returns the row count."""
+        sizes = {}
+        for name, dtype in dtypes.items():
+            try:
+                sizes[name] = os.path.getsize(os.path.join(series_dir, f"{name}.bin")) // np.dtype(dtype).itemsize
+            except OSError:
+                sizes[name] = 0
+        rows = min(sizes.values())
+        for name, size in sizes.items():
+            if size > rows:
+                os.truncate(os.path.join(series_dir, f"{name}.bin"), rows * np.dtype(dtypes[name]).itemsize)
+        return rows
+
+    def _compact(self, series_dir, dtypes):
+        """Drops rows older than the retention window once enough of them have piled up."""
+        cutoff = self._clock() - self.retention
+        time_column = _read_column(os.path.join(series_dir, "time.bin"), dtypes["time"])
+        if not len(time_column) or time_column[0] >= cutoff - self.compact_slack:
+            return
+        keep_from = int(np.searchsorted(time_column, cutoff, side="left"))
+        del time_column
+        for name, dtype in dtypes.items():
+            path = os.path.join(series_dir, f"{name}.bin")
+            kept = np.array(_read_column(path, dtype)[keep_from:])
+            tmp = f"{path}.{threading.get_ident()}.tmp"
+            kept.tofile(tmp)
+            os.replace(tmp, path)
+        self._counters["compactions"] += 1
+
+    def _write_index(self, city_dir, city_key, location):
+        index = self._read_index(city_dir) or {"city_key": city_key}
+        if location.get('name'):
+            index["name"] = location['name']
+        offset = utc_offset(location)
+        if offset is not None:
+            index["utc_offset"] = offset
+        index["series"] = {}
+        for series, columns in SERIES.items():
+            time_column = _read_column(os.path.join(city_dir, series, "time.bin"), dict(columns)["time"])
+            if len(time_column):
+                index["series"][series] = {
+                    "rows": len(time_column), "first": int(time_column[0]), "last": int(time_column[-1]),
+                }
+        tmp = os.path.join(city_dir, f"{INDEX_FILE}.{threading.get_ident()}.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(index, f)
+        os.replace(tmp, os.path.join(city_dir, INDEX_FILE))  # readers never see a half-written index
+
+    @staticmethod
+    def _read_index(city_dir):
+        try:
+            with open(os.path.join(city_dir, INDEX_FILE), encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
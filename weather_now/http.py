@@ -0,0 +1,188 @@
+"""Pooled HTTP client with timeouts, jittered retries and per-host circuit breakers.
+
+One ``HttpClient`` is meant to be shared process-wide, so every session reuses the
+same keep-alive connections to WeatherAPI and Unsplash. An optional
+``ratelimit.RateLimiter`` charges every attempt, retries included, against the
+call quota of the API key the URL belongs to, and an optional ``metrics.Metrics`` registry receives per-endpoint
+latency, status codes and retry counts.
+"""
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+RETRYABLE_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+
+class CircuitOpenError(requests.exceptions.ConnectionError):
+    """Raised without touching the network while a host's circuit is open."""
+
+
+class CircuitBreaker:
+    """Classic closed -> open -> half-open breaker for a single upstream host."""
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._probe_in_flight = False
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._state()
+
+    def allow(self):
+        """Returns True if a request may be sent now (at most one probe while half-open)."""
+        with self._lock:
+            state = self._state()
+            if state == "closed":
+                return True
+            if state == "half_open" and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            return False
+
+    def release(self):
+        """Gives back a probe slot ``allow()`` handed out for a request that was never sent."""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._probe_in_flight = False
+            if self._opened_at is not None or self._failures >= self.failure_threshold:
+                self._opened_at = self._clock()
+
+    def _state(self):
+        if self._opened_at is None:
+            return "closed"
+        if self._clock() - self._opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+
+class HttpClient:
+    """Thin wrapper around a pooled ``requests.Session``."""
+
+    def __init__(self, connect_timeout=3.05, read_timeout=10.0, max_retries=2, backoff_base=0.25,
+                 backoff_max=2.0, pool_size=32, failure_threshold=5, reset_timeout=30.0, limiter=None,
+                 metrics=None):
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.limiter = limiter
+        self.metrics = metrics
+        self._breakers = {}
+        self._breakers_lock = threading.Lock()
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=8, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def breaker_for(self, url):
+        host = urlsplit(url).netloc
+        with self._breakers_lock:
+            breaker = self._breakers.get(host)
+            if breaker is None:
+                breaker = self._breakers[host] = CircuitBreaker(self.failure_threshold, self.reset_timeout)
+            return breaker
+
+    def breaker_states(self):
+        with self._breakers_lock:
+            breakers = dict(self._breakers)
+        return {host: breaker.state for host, breaker in breakers.items()}
+
+    def request(self, method, url, **kwargs):
+        """Sends a request, retrying transient failures. Returns the final ``Response``.
+
+        Raises ``CircuitOpenError`` when the host's breaker is open, ``QuotaExceededError``
+        when the key's call budget is spent, and re-raises the last network error once retries
+        are exhausted. HTTP error statuses are returned, not raised; use ``get_json`` for
+        raise-on-error behaviour. ``cost`` is the number of quota calls one attempt spends
+        (a bulk request is billed per location).
+        """
+        cost = kwargs.pop("cost", 1)
+        kwargs.setdefault("timeout", self.timeout)
+        breaker = self.breaker_for(url)
+        endpoint = urlsplit(url).path
+        attempt = 0
+        while True:
+            if not breaker.allow():
+                self._count(endpoint, "circuit_open")
+                raise CircuitOpenError(f"Circuit open for {urlsplit(url).netloc}; upstream is failing, try again shortly.")
+            if self.limiter is not None:
+                try:
+                    self.limiter.acquire(url, cost)
+                except requests.exceptions.RequestException:
+                    breaker.release()  # otherwise a rejected half-open probe keeps the circuit open for good
+                    self._count(endpoint, "quota")
+                    raise
+            if attempt and self.metrics is not None:
+                self.metrics.inc("weather_upstream_retries_total", endpoint=endpoint)
+            start = time.perf_counter()
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                breaker.record_failure()
+                self._observe(endpoint, start, "timeout" if isinstance(e, requests.exceptions.Timeout) else "network")
+                if attempt >= self.max_retries:
+                    raise
+            except requests.exceptions.RequestException:
+                breaker.record_failure()
+                self._observe(endpoint, start, "network")
+                raise
+            else:
+                self._observe(endpoint, start, response.status_code)
+                if response.status_code not in RETRYABLE_STATUSES:
+                    breaker.record_success()
+                    return response
+                if response.status_code == 429:
+                    # Throttled, not failing: the host neither recovers nor fails the breaker, but a
+                    # half-open probe must give its slot back or the circuit never closes again
+                    breaker.release()
+                else:
+                    breaker.record_failure()
+                if attempt >= self.max_retries:
+                    return response
+            time.sleep(self._backoff(attempt))
+            attempt += 1
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def get_json(self, url, **kwargs):
+        """GETs a URL and returns its decoded JSON body, raising ``HTTPError`` on failure."""
+        response = self.get(url, **kwargs)
+        response.raise_for_status()
+        return response.json()
+
+    def _observe(self, endpoint, start, status):
+        if self.metrics is not None:
+            self.metrics.observe("weather_upstream_request_seconds", time.perf_counter() - start, endpoint=endpoint)
+            self._count(endpoint, status)
+
+    def _count(self, endpoint, status):
+        if self.metrics is not None:
+            self.metrics.inc("weather_upstream_responses_total", endpoint=endpoint, status=status)
+
+    def _backoff(self, attempt):
+        # "Full jitter": spreads retries from many sessions instead of synchronising them.
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
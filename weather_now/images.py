@@ -0,0 +1,254 @@
+"""Image proxy: fetches remote landmark and background images once and serves resized copies.
+
+The page used to hotlink full-size Unsplash and Pexels images on every visit.
+``ImageProxy`` downloads each source once and downscales and recompresses it for
+the slot it is shown in. It keeps the result in ``ImageStore``, a size-bounded
+on-disk LRU shared by every process on the host. It answers
+``/images/<variant>/<digest>``, with the digest derived from the source URL.
+
+A stored copy is never refetched, so it stays up while the upstream is down.
+Because the name never changes meaning, browsers may cache it for a year.
+Pillow is optional: without it, originals are stored and served unchanged.
+"""
+import hashlib
+import io
+import os
+import threading
+from collections import namedtuple
+
+import requests
+
+from weather_now.singleflight import SingleFlight
+
+# Width to downscale to and WebP quality, per display slot
+ImageVariant = namedtuple("ImageVariant", ["width", "quality"])
+
+VARIANTS = {
+    "landmark": ImageVariant(720, 80),    # about a third of the wide layout
+    "background": ImageVariant(960, 60),  # blurred behind the page, like the default background
+}
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+ROUTE_PREFIX = "/images/"
+SOURCE_SUFFIX = ".src"
+
+# Leading bytes -> MIME type, for bodies stored without Pillow
+_SIGNATURES = (
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"GIF8", "image/gif"),
+)
+
+
+def sniff_content_type(data):
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "image/webp"
+    for signature, mime in _SIGNATURES:
+        if data.startswith(signature):
+            return mime
+    return "application/octet-stream"
+
+
+def source_digest(url):
+    return hashlib.sha256(url.encode("utf-8")).hexdigest()[:32]
+
+
+def resize_image(data, variant):
+    """Downscales to ``variant.width`` and re-encodes as WebP; returns ``data`` unchanged without Pillow."""
+    try:
+        from PIL import Image  # optional, like in weather_now.assets
+    except ImportError:
+        return data
+    with Image.open(io.BytesIO(data)) as img:
+        img = img.convert("RGB")
+        if img.width > variant.width:
+            img = img.resize((variant.width, round(img.height * variant.width / img.width)), Image.LANCZOS)
+        out = io.BytesIO()
+        img.save(out, "WEBP", quality=variant.quality, method=4)
+    return out.getvalue()
+
+
+class ImageStore:
+    """Directory of small files, evicted least recently used first once ``max_bytes`` is exceeded.
+
+    Recency is the file's mtime, refreshed on every read, so the order survives restarts
+    and is shared by every process using the directory. Each write re-scans the
+    directory before evicting, so replicas together stay within ``max_bytes`` rather
+    than each keeping its own count. Files ending in ``pinned_suffix`` (the proxy's
+    source URL records, a few dozen bytes each) are never evicted, or an evicted
+    record would leave its image unservable after a restart.
+    """
+
+    def __init__(self, directory, max_bytes=64 * 1024 * 1024, pinned_suffix=SOURCE_SUFFIX):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.pinned_suffix = pinned_suffix
+        self._lock = threading.Lock()
+        self._counters = {"evictions": 0}
+        os.makedirs(directory, exist_ok=True)
+        self._usage = self._scan()[1:]  # (entries, bytes, pinned) as of the last scan
+
+    def get(self, name):
+        path = os.path.join(self.directory, name)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            if not name.endswith(self.pinned_suffix):
+                os.utime(path)
+        except OSError:
+            return None  # never stored, or evicted (possibly by another process sharing the directory)
+        return data
+
+    def put(self, name, data):
+        path = os.path.join(self.directory, name)
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)  # readers never see a half-written file
+        except OSError:
+            return  # a failed write only costs a future upstream fetch
+        if not name.endswith(self.pinned_suffix):
+            self._evict(keep=name)
+
+    def stats(self):
+        with self._lock:
+            entries, total, pinned = self._usage
+            return {"entries": entries, "bytes": total, "pinned": pinned, **self._counters}
+
+    def _scan(self):
+        """Returns (evictable files oldest first as (mtime, name, size), their count, total bytes, pinned count)."""
+        files, total, pinned = [], 0, 0
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".tmp"):
+                continue
+            if entry.name.endswith(self.pinned_suffix):
+                pinned += 1
+                continue
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue  # removed since the listing
+            files.append((stat.st_mtime, entry.name, stat.st_size))
+            total += stat.st_size
+        files.sort()
+        return files, len(files), total, pinned
+
+    def _evict(self, keep):
+        # Writes only happen on an upstream fetch, so a directory scan is cheap next to them
+        with self._lock:
+            files, entries, total, pinned = self._scan()
+            evicted = 0
+            for _, old, size in files:
+                if total <= self.max_bytes:
+                    break
+                if old == keep:
+                    continue
+                try:
+                    os.remove(os.path.join(self.directory, old))
+                except OSError:
+                    pass  # already evicted by another process
+                total -= size
+                entries -= 1
+                evicted += 1
+            self._counters["evictions"] += evicted
+            self._usage = (entries, total, pinned)
+
+
+class ImageProxy:
+    """Maps remote image URLs to local proxy paths and serves them from ``store``.
+
+    ``fallbacks`` maps a variant to local bytes served when an image is neither
+    stored nor fetchable (e.g. the default background while the upstream is down).
+    """
+
+    def __init__(self, http, store, variants=VARIANTS, fallbacks=None, flights=None, metrics=None):
+        self.http = http
+        self.store = store
+        self.variants = variants
+        self.fallbacks = fallbacks or {}
+        self.flights = flights or SingleFlight()
+        self.metrics = metrics
+        self._sources = {}  # digest -> source URL, registered by path_for()
+        self._counters = {"hits": 0, "misses": 0, "fetch_errors": 0, "fallbacks": 0, "not_found": 0}
+        self._lock = threading.Lock()
+
+    def path_for(self, url, variant):
+        """Registers ``url`` and returns the proxy path that serves its ``variant``."""
+        digest = source_digest(url)
+        with self._lock:
+            known = self._sources.get(digest) == url
+            self._sources[digest] = url
+        if not known:
+            # Persisted so other processes sharing the store (and this one after a restart) can serve it
+            self.store.put(digest + SOURCE_SUFFIX, url.encode("utf-8"))
+        return f"{ROUTE_PREFIX}{variant}/{digest}"
+
+    def fetch(self, variant, digest):
+        """Returns the stored or freshly fetched image bytes, or None if unknown or unreachable."""
+        name = f"{variant}-{digest}"
+        data = self.store.get(name)
+        if data is not None:
+            self._count("hits")
+            return data
+        source = self._source(digest)
+        if source is None:
+            self._count("not_found")
+            return None
+        self._count("misses")
+        try:
+            return self.flights.do(name, lambda: self._load(source, variant, name))
+        except (requests.exceptions.RequestException, OSError, ValueError):
+            # Upstream down, refusing us or sending something Pillow cannot decode
+            self._count("fetch_errors")
+            return None
+
+    def mount(self, server):
+        """Serves this proxy's paths from a ``metrics.MetricsServer`` listener."""
+        server.route(ROUTE_PREFIX, self.handle)
+
+    def handle(self, path, headers):
+        """HTTP route for ``MetricsServer``: returns (status, headers, body) for ``/images/<variant>/<digest>``."""
+        variant, _, digest = path[len(ROUTE_PREFIX):].partition("/")
+        if variant not in self.variants or len(digest) != 32 or not digest.isalnum():
+            return 404, {}, b""
+        etag = f'"{variant}-{digest}"'
+        if headers.get("If-None-Match") == etag:
+            return 304, {"ETag": etag, "Cache-Control": IMMUTABLE_CACHE_CONTROL}, b""
+        data = self.fetch(variant, digest)
+        if data is None:
+            fallback = self.fallbacks.get(variant)
+            if fallback is None:
+                return 502, {"Cache-Control": "no-store"}, b""
+            self._count("fallbacks")
+            # Short-lived: the real image should replace it once the upstream is back
+            return 200, {"Content-Type": sniff_content_type(fallback), "Cache-Control": "public, max-age=60"}, fallback
+        return 200, {"Content-Type": sniff_content_type(data), "Cache-Control": IMMUTABLE_CACHE_CONTROL,
+                     "ETag": etag}, data
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+        stats.update({f"store_{k}": v for k, v in self.store.stats().items()})
+        return stats
+
+    def _source(self, digest):
+        with self._lock:
+            source = self._sources.get(digest)
+        if source is None:
+            stored = self.store.get(digest + SOURCE_SUFFIX)
+            source = stored.decode("utf-8") if stored else None
+        return source
+
+    def _load(self, source, variant, name):
+        response = self.http.get(source)
+        response.raise_for_status()
+        data = resize_image(response.content, self.variants[variant])
+        self.store.put(name, data)
+        return data
+
+    def _count(self, event):
+        with self._lock:
+            self._counters[event] += 1
+        if self.metrics is not None:
+            self.metrics.inc("weather_image_proxy_total", event=event)
@@ -0,0 +1,222 @@
+"""Latency histograms, counters and a Prometheus text-format endpoint.
+
+``Metrics`` is a small thread-safe registry: ``span()`` times a block into a
+histogram, ``inc()`` bumps a counter and ``register()`` adds a callback that
+exports existing stats (cache, limiter, scheduler) at scrape time. ``render()``
+produces the Prometheus text exposition format; ``MetricsServer`` serves it from
+a daemon thread so scrapes never go through Streamlit. It listens on loopback
+unless told otherwise. Other process-wide HTTP endpoints (the image proxy) are
+mounted with ``route()``, on a ``MetricsServer`` without a registry when they
+must be public but the metrics must not.
+"""
+import bisect
+import functools
+import math
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Seconds; spans from sub-millisecond cache hits to slow upstream calls
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _format_labels(label_key, extra=()):
+    pairs = [*label_key, *extra]
+    if not pairs:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+class Histogram:
+    """Cumulative-bucket histogram, as Prometheus expects."""
+
+    __slots__ = ("bounds", "counts", "count", "total")
+
+    def __init__(self, bounds=DEFAULT_BUCKETS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # last slot is +Inf
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+
+    def quantile(self, q):
+        """Estimates the q-quantile by linear interpolation inside its bucket."""
+        if not self.count:
+            return math.nan
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            if seen + n >= rank and n:
+                lower = self.bounds[i - 1] if i else 0.0
+                upper = self.bounds[i] if i < len(self.bounds) else self.bounds[-1]
+                return lower + (upper - lower) * (rank - seen) / n
+            seen += n
+        return self.bounds[-1]
+
+
+class Metrics:
+    """Process-wide registry of counters, histograms and scrape-time collectors."""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._help = {}
+        self._counters = {}    # name -> {label_key: value}
+        self._histograms = {}  # name -> {label_key: Histogram}
+        self._collectors = []  # (name, kind, callback)
+
+    def describe(self, name, help_text):
+        self._help[name] = help_text
+
+    def inc(self, name, amount=1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + amount
+
+    def observe(self, name, value, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = Histogram(self.buckets)
+            histogram.observe(value)
+
+    @contextmanager
+    def span(self, phase, name="weather_phase_seconds"):
+        """Times the block into ``name{phase=...}``; failed blocks are recorded too."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, phase=phase)
+
+    def timed(self, phase, name="weather_phase_seconds"):
+        """Decorator form of ``span()``."""
+        def decorator(fn):
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                with self.span(phase, name):
+                    return fn(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def register(self, name, kind, callback, help_text=""):
+        """Adds a scrape-time series; ``callback()`` returns an iterable of (labels_dict, value)."""
+        self._collectors.append((name, kind, callback))
+        if help_text:
+            self.describe(name, help_text)
+
+    def summary(self, name="weather_phase_seconds", quantiles=(0.5, 0.95, 0.99)):
+        """Returns {labels: {"count": n, "p50": s, ...}} for one histogram, for debug views."""
+        with self._lock:
+            series = dict(self._histograms.get(name, {}))
+        result = {}
+        for key, histogram in series.items():
+            row = {"count": histogram.count}
+            row.update({f"p{round(q * 100)}": histogram.quantile(q) for q in quantiles})
+            result[", ".join(v for _, v in key)] = row
+        return result
+
+    def counters(self, name):
+        with self._lock:
+            return {", ".join(str(v) for _, v in key): value for key, value in self._counters.get(name, {}).items()}
+
+    def render(self):
+        """Returns all series in the Prometheus text exposition format (version 0.0.4)."""
+        lines = []
+        with self._lock:
+            counters = {name: dict(series) for name, series in self._counters.items()}
+            histograms = {
+                name: {key: (list(h.counts), h.count, h.total) for key, h in series.items()}
+                for name, series in self._histograms.items()
+            }
+        for name, series in sorted(counters.items()):
+            self._header(lines, name, "counter")
+            lines.extend(f"{name}{_format_labels(key)} {value}" for key, value in series.items())
+        for name, series in sorted(histograms.items()):
+            self._header(lines, name, "histogram")
+            for key, (counts, count, total) in series.items():
+                cumulative = 0
+                for bound, n in zip([*self.buckets, "+Inf"], counts):
+                    cumulative += n
+                    lines.append(f"{name}_bucket{_format_labels(key, [('le', bound)])} {cumulative}")
+                lines.append(f"{name}_sum{_format_labels(key)} {total}")
+                lines.append(f"{name}_count{_format_labels(key)} {count}")
+        for name, kind, callback in self._collectors:
+            try:
+                samples = list(callback())
+            except Exception:
+                continue  # one broken collector must not take the whole scrape down
+            self._header(lines, name, kind)
+            lines.extend(f"{name}{_format_labels(_label_key(labels))} {value}" for labels, value in samples)
+        return "\n".join(lines) + "\n"
+
+    def _header(self, lines, name, kind):
+        if name in self._help:
+            lines.append(f"# HELP {name} {self._help[name]}")
+        lines.append(f"# TYPE {name} {kind}")
+
+
+class MetricsServer:
+    """Serves ``metrics.render()`` at ``/metrics`` (unless ``metrics`` is None), plus any mounted routes, from a daemon thread."""
+
+    def __init__(self, metrics, host="127.0.0.1", port=9464):
+        registry = metrics
+        self.routes = {}  # path prefix -> handler(path, headers) -> (status, headers, body)
+        routes = self.routes
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive: a page loads several images
+
+            def do_GET(self):
+                path = self.path.split("?")[0]
+                if path == "/metrics" and registry is not None:
+                    status, headers = 200, {"Content-Type": "text/plain; version=0.0.4; charset=utf-8"}
+                    body = registry.render().encode("utf-8")
+                else:
+                    handler = next((h for prefix, h in list(routes.items()) if path.startswith(prefix)), None)
+                    if handler is None:
+                        status, headers, body = 404, {}, b""
+                    else:
+                        try:
+                            status, headers, body = handler(path, self.headers)
+                        except Exception:
+                            status, headers, body = 500, {}, b""
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass  # scrapes every few seconds would flood the app log
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+        self.port = self.httpd.server_address[1]
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name="metrics-server", daemon=True)
+
+    def route(self, prefix, handler):
+        """Mounts ``handler(path, headers) -> (status, headers, body)`` for GETs under ``prefix``."""
+        self.routes[prefix] = handler
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
@@ -0,0 +1,173 @@
+"""Popularity-driven cache warming.
+
+``PopularityTracker`` keeps an exponentially decayed request count per city.
+``PrefetchScheduler`` runs on a daemon thread and, every ``interval`` seconds,
+re-fetches the top-N cities with a cache entry (any the fetch mode serves
+searches from) that is missing or expires within ``lead_time``. It spends at most ``max_calls_per_hour`` upstream calls, so
+warming never eats more than its configured share of the API quota. Given a
+``refresh_landmark`` callable it does the same for the same cities' "landmark"
+entries, within a separate ``max_landmark_calls_per_hour`` (the Unsplash quota
+is far smaller than WeatherAPI's, so landmarks are warmed only after the
+weather and only as far as their own budget goes).
+"""
+import heapq
+import threading
+import time
+from collections import deque
+
+from weather_now.ratelimit import QuotaExceededError, background_traffic
+
+
+class PopularityTracker:
+    """Thread-safe, bounded, exponentially decayed popularity counts."""
+
+    def __init__(self, half_life=3600.0, max_keys=5000, clock=time.monotonic):
+        self.half_life = half_life
+        self.max_keys = max_keys
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._scores = {}  # key -> [score, updated_at, label]
+
+    def record(self, key, label, weight=1.0):
+        now = self._clock()
+        with self._lock:
+            item = self._scores.get(key)
+            if item is None:
+                if len(self._scores) >= self.max_keys:
+                    self._prune(now)
+                self._scores[key] = [weight, now, label]
+            else:
+                item[0] = self._decayed(item, now) + weight
+                item[1] = now
+                item[2] = label
+
+    def top(self, n):
+        """Returns up to ``n`` (key, label, score) tuples, most popular first."""
+        now = self._clock()
+        with self._lock:
+            scored = [(self._decayed(item, now), key, item[2]) for key, item in self._scores.items()]
+        return [(key, label, score) for score, key, label in heapq.nlargest(n, scored)]
+
+    def _decayed(self, item, now):
+        return item[0] * 0.5 ** ((now - item[1]) / self.half_life)
+
+    def _prune(self, now):
+        # Drop the least popular quarter so pruning is amortised over many inserts
+        ranked = sorted(self._scores, key=lambda k: self._decayed(self._scores[k], now))
+        for key in ranked[: max(1, len(ranked) // 4)]:
+            del self._scores[key]
+
+
+class PrefetchScheduler:
+    """Keeps the most requested cities' cache entries warm in the background."""
+
+    def __init__(self, service, tracker, top_n=20, lead_time=120.0, interval=30.0,
+                 max_calls_per_hour=100, refresh_landmark=None, max_landmark_calls_per_hour=0,
+                 clock=time.monotonic):
+        self.service = service
+        self.tracker = tracker
+        self.top_n = top_n
+        self.lead_time = lead_time
+        self.interval = interval
+        self.max_calls_per_hour = max_calls_per_hour
+        self.refresh_landmark = refresh_landmark  # (city key, label) -> None; caches the city's landmark
+        self.max_landmark_calls_per_hour = max_landmark_calls_per_hour
+        self._clock = clock
+        self._calls = deque()  # timestamps of upstream calls made by the scheduler
+        self._landmark_calls = deque()
+        self._calls_lock = threading.Lock()  # the /metrics scrape reads the budget from its own thread
+        self._stop = threading.Event()
+        self._thread = None
+        self._counters = {"runs": 0, "refreshed": 0, "landmarks_refreshed": 0, "skipped_fresh": 0,
+                          "skipped_budget": 0, "errors": 0}
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._loop, name="prefetch", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def remaining_budget(self):
+        """Upstream calls still available to the scheduler in the current hour."""
+        return self._remaining(self._calls, self.max_calls_per_hour)
+
+    def remaining_landmark_budget(self):
+        """Landmark lookups still available to the scheduler in the current hour."""
+        return self._remaining(self._landmark_calls, self.max_landmark_calls_per_hour)
+
+    def run_once(self):
+        self._counters["runs"] += 1
+        top = self.tracker.top(self.top_n)
+        self._warm_weather(top)
+        if self.refresh_landmark is not None:
+            self._warm_landmarks(top)
+
+    def stats(self):
+        stats = dict(self._counters)
+        stats["budget_remaining"] = self.remaining_budget()
+        stats["landmark_budget_remaining"] = self.remaining_landmark_budget()
+        return stats
+
+    def _warm_weather(self, top):
+        cache = self.service.cache
+        cost = self.service.calls_per_fetch
+        namespaces = self.service.cached_namespaces
+        for key, label, _ in top:
+            # The shortest-lived entry decides; a missing one counts as expired
+            remaining = [cache.ttl_remaining(namespace, key) for namespace in namespaces] if cache is not None else [None]
+            if None not in remaining and min(remaining) > self.lead_time:
+                self._counters["skipped_fresh"] += 1
+                continue
+            if self.remaining_budget() < cost:
+                self._counters["skipped_budget"] += 1
+                break
+            with self._calls_lock:
+                self._calls.extend([self._clock()] * cost)
+            try:
+                self.service.refresh(label)
+                self._counters["refreshed"] += 1
+            except QuotaExceededError:
+                # The shared limiter is holding its reserve for interactive searches
+                self._counters["skipped_budget"] += 1
+                break
+            except Exception:
+                self._counters["errors"] += 1
+
+    def _warm_landmarks(self, top):
+        cache = self.service.cache
+        for key, label, _ in top:
+            remaining = cache.ttl_remaining("landmark", key) if cache is not None else None
+            if remaining is not None and remaining > self.lead_time:
+                self._counters["skipped_fresh"] += 1
+                continue
+            if self.remaining_landmark_budget() < 1:
+                self._counters["skipped_budget"] += 1
+                break
+            with self._calls_lock:
+                self._landmark_calls.append(self._clock())
+            try:
+                self.refresh_landmark(key, label)
+                self._counters["landmarks_refreshed"] += 1
+            except QuotaExceededError:
+                self._counters["skipped_budget"] += 1
+                break
+            except Exception:
+                self._counters["errors"] += 1
+
+    def _remaining(self, calls, per_hour):
+        cutoff = self._clock() - 3600
+        with self._calls_lock:
+            while calls and calls[0] < cutoff:
+                calls.popleft()
+            return per_hour - len(calls)
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            try:
+                with background_traffic():
+                    self.run_once()
+            except Exception:
+                self._counters["errors"] += 1
@@ -0,0 +1,134 @@
+"""Token-bucket quota enforcement for outbound API calls.
+
+Every API key gets its own bucket, named by the caller and reached through the
+URL prefixes routed to it, that refills at the key's hourly quota. Buckets are
+per process: replicas sharing a key should each be given their share of it.
+Interactive traffic may drain a bucket completely and waits briefly for a
+token; background traffic (prefetch, stale refreshes, batch runs) fails fast
+and leaves a reserve untouched, so a warming burst never starves a user's
+search. The current priority travels in a ``ContextVar`` set with
+``background_traffic()``, so no call signature has to change.
+"""
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
+import requests
+
+INTERACTIVE = "interactive"
+BACKGROUND = "background"
+
+_priority = contextvars.ContextVar("traffic_priority", default=INTERACTIVE)
+
+
+class QuotaExceededError(requests.exceptions.RequestException):
+    """Raised without touching the network when an API key's call budget is exhausted."""
+
+
+@contextmanager
+def background_traffic():
+    """Marks outbound calls made inside the block (on this thread) as background priority."""
+    token = _priority.set(BACKGROUND)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def current_priority():
+    return _priority.get()
+
+
+class TokenBucket:
+    """``capacity`` tokens refilled continuously at ``rate`` tokens per second."""
+
+    def __init__(self, rate, capacity, clock=time.monotonic):
+        self.rate = rate
+        self.capacity = capacity
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._tokens = float(capacity)
+        self._updated = clock()
+
+    @property
+    def tokens(self):
+        with self._lock:
+            self._refill()
+            return self._tokens
+
+    def try_acquire(self, floor=0.0, cost=1):
+        """Takes ``cost`` tokens if that leaves at least ``floor``; otherwise returns seconds until it would."""
+        with self._lock:
+            self._refill()
+            if self._tokens - cost >= floor:
+                self._tokens -= cost
+                return 0.0
+            return (floor + cost - self._tokens) / self.rate if self.rate > 0 else float("inf")
+
+    def _refill(self):
+        now = self._clock()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+
+class RateLimiter:
+    """Per-key token buckets with interactive-over-background priority."""
+
+    def __init__(self, quotas, routes=None, burst_window=300.0, background_reserve=0.25, max_wait=1.0,
+                 clock=time.monotonic):
+        """
+        ``quotas`` maps budget name (one per API key) -> calls allowed per hour; ``routes`` maps
+        URL prefixes to budget names, so two keys served from one host keep separate buckets.
+        Without ``routes`` the names are hosts. URLs no budget covers are unlimited.
+        """
+        self.background_reserve = background_reserve
+        self.max_wait = max_wait
+        self._buckets = {
+            name: TokenBucket(per_hour / 3600.0, max(1.0, per_hour * burst_window / 3600.0), clock)
+            for name, per_hour in quotas.items()
+        }
+        # Longest prefix first, so a more specific route wins
+        self._routes = sorted((routes or {}).items(), key=lambda route: len(route[0]), reverse=True)
+        self._lock = threading.Lock()
+        self._counters = {"granted": 0, "rejected_interactive": 0, "rejected_background": 0}
+
+    def budget_for(self, url):
+        """Name of the budget a request to ``url`` is charged to, or None if it is unlimited."""
+        if not self._routes:
+            return urlsplit(url).netloc if urlsplit(url).netloc in self._buckets else None
+        for prefix, name in self._routes:
+            if url.startswith(prefix):
+                return name
+        return None
+
+    def acquire(self, url, cost=1):
+        """Spends ``cost`` calls from the budget covering ``url`` or raises ``QuotaExceededError``."""
+        name = self.budget_for(url)
+        if name is None:
+            return
+        bucket = self._buckets[name]
+        priority = current_priority()
+        if priority == BACKGROUND:
+            floor, max_wait = bucket.capacity * self.background_reserve, 0.0
+        else:
+            floor, max_wait = 0.0, self.max_wait
+        wait = bucket.try_acquire(floor, cost)
+        if 0 < wait <= max_wait:
+            time.sleep(wait)
+            wait = bucket.try_acquire(floor, cost)
+        with self._lock:
+            if wait == 0:
+                self._counters["granted"] += 1
+                return
+            self._counters[f"rejected_{priority}"] += 1
+        raise QuotaExceededError(f"Call budget for {name} is exhausted; retry in {wait:.0f}s.")
+
+    def remaining(self):
+        """Returns {budget name: (tokens_left, capacity)}."""
+        return {name: (bucket.tokens, bucket.capacity) for name, bucket in self._buckets.items()}
+
+    def stats(self):
+        with self._lock:
+            return dict(self._counters)
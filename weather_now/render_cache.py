@@ -0,0 +1,57 @@
+"""Process-wide LRU cache of rendered HTML fragments.
+
+Every rerun of every session used to rebuild the same card markup from the same
+parsed data. ``RenderCache`` keeps one rendering per key; callers put whatever
+determines the output (city, the parsed data, language) into the key. Each entry
+remembers how long it took to render, so ``stats()`` can report the render
+time the hits avoided.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+
+class RenderCache:
+    """Thread-safe ``key -> rendered value`` LRU bounded by entry count."""
+
+    def __init__(self, max_entries=512, clock=time.perf_counter):
+        self.max_entries = max_entries
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (value, seconds it took to render)
+        self._counters = {"hits": 0, "misses": 0, "evictions": 0}
+        self._render_seconds = 0.0
+        self._saved_seconds = 0.0
+
+    def get_or_render(self, key, render):
+        """Returns the cached rendering for ``key``, calling ``render()`` on a miss."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self._counters["hits"] += 1
+                self._saved_seconds += entry[1]
+                return entry[0]
+        # Rendering is pure and cheap enough that two sessions racing on a miss may both do it
+        start = self._clock()
+        value = render()
+        elapsed = self._clock() - start
+        with self._lock:
+            self._counters["misses"] += 1
+            self._render_seconds += elapsed
+            self._entries[key] = (value, elapsed)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._counters["evictions"] += 1
+        return value
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+            stats["entries"] = len(self._entries)
+            stats["render_seconds"] = self._render_seconds
+            stats["saved_seconds"] = self._saved_seconds
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_ratio"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
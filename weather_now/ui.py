@@ -0,0 +1,245 @@
+"""Invariant UI content and the per-(language, theme) tables resolved from it.
+
+Streamlit re-executes ``corrected.py`` from the top on every interaction, so
+every dict literal in it was rebuilt on every rerun, and every label went
+through a two-level translation lookup. The content lives here instead, in a
+module imported once per process. ``AppContext`` resolves it into one
+``UiTable`` per (language, theme): the strings with the English fallback
+applied, the palette as CSS declarations, radio options and chart specs. A
+rerun then only indexes dicts.
+"""
+import threading
+
+# --- Fallback Landmark Images (these cities also seed the prefetch scheduler) ---
+KNOWN_CITIES = {
+    "amritsar": "https://images.pexels.com/photos/17798305/pexels-photo-17798305/free-photo-of-golden-temple-at-night.jpeg?auto=compress&cs=tinysrgb&w=800",
+    "delhi": "https://images.pexels.com/photos/3476472/pexels-photo-3476472.jpeg?auto=compress&cs=tinysrgb&w=800",
+    "mumbai": "https://images.pexels.com/photos/10203531/pexels-photo-10203531.jpeg?auto=compress&cs=tinysrgb&w=800",
+    "london": "https://images.pexels.com/photos/460672/pexels-photo-460672.jpeg?auto=compress&cs=tinysrgb&w=800",
+}
+
+# --- Dynamic Background Image URLs ---
+BACKGROUND_IMAGES = {
+    "clear": "https://images.pexels.com/photos/281260/pexels-photo-281260.jpeg?auto=compress&cs=tinysrgb&fit=crop&h=1200&w=2000",
+    "clouds": "https://images.pexels.com/photos/531767/pexels-photo-531767.jpeg?auto=compress&cs=tinysrgb&fit=crop&h=1200&w=2000",
+    "rain": "https://images.unsplash.com/photo-1610741083757-1ae88e1a17f7?q=80&w=2000&auto=format&fit=crop",
+    "drizzle": "https://images.unsplash.com/photo-1610741083757-1ae88e1a17f7?q=80&w=2000&auto=format&fit=crop",
+    "thunderstorm": "https://images.pexels.com/photos/1118873/pexels-photo-1118873.jpeg?auto=compress&cs=tinysrgb&fit=crop&h=1200&w=2000",
+    "snow": "https://images.pexels.com/photos/1144211/pexels-photo-1144211.jpeg?auto=compress&cs=tinysrgb&fit=crop&h=1200&w=2000",
+    "mist": "https://images.unsplash.com/photo-1544321045-8664165d5686?q=80&w=2000&auto=format&fit=crop",
+    "haze": "https://images.unsplash.com/photo-1544321045-8664165d5686?q=80&w=2000&auto=format&fit=crop",
+    "fog": "https://images.unsplash.com/photo-1544321045-8664165d5686?q=80&w=2000&auto=format&fit=crop",
+    "default": "https://images.pexels.com/photos/531767/pexels-photo-531767.jpeg?auto=compress&cs=tinysrgb&fit=crop&h=1200&w=2000"
+}
+
+# --- Translations (every language defines every key) ---
+TRANSLATIONS = {
+    "english": {
+        "title": "Weather Now - Smart Forecasting",
+        "tagline": "Get real-time weather and a **3-day outlook** for any city on the globe.",
+        "input_label": "📍 Enter City Name (e.g., Dehradun, Delhi, London)",
+        "input_placeholder": "Type or pick a city",
+        "press_enter": "Pick a city from the list, or type one and choose it, to see its weather!",
+        "welcome": "Welcome! Start by entering a city name above.",
+        "welcome_detail": "Enter a city to see its aesthetic weather forecast and a glimpse of its famous landmark.",
+        "weather": "Weather",
+        "landmark_unavailable": "Landmark image not available.",
+        "feels_like": "Feels Like",
+        "humidity": "Humidity",
+        "wind_speed": "Wind Speed",
+        "pressure": "Pressure",
+        "severe_alert": "🚨 Severe Weather Alert! Take precautions.",
+        "forecast_header": "📅 3-Day Forecast",
+        "forecast_error": "Error: Could not fetch 3-day forecast. Check API configuration or city name.",
+        "city_not_found": "City '{}' not found! Please try again.",
+        "error_fetching": "Error fetching weather data: {}",
+        "theme_selector": "Interface Theme",
+        "language_selector": "Select Language",
+        "light_mode": "🌞 Light Mode",
+        "dark_mode": "🌙 Dark Mode",
+        "max_temp": "Max Temp",
+        "min_temp": "Min Temp",
+        "outlook_header": "📈 {}-Day Outlook",
+        "outlook_temperature": "Temperature, heat index and dew point (°C)",
+        "outlook_comfort": "Comfort score and chance of rain within {} hours (%)",
+        "date": "Date",
+        "dew_point": "Dew Point",
+        "heat_index": "Heat Index",
+        "max_heat_index": "Max Heat Index",
+        "comfort": "Comfort",
+        "rain_risk": "Rain Risk",
+        "precipitation": "Precipitation (mm)",
+        "history_header": "🕰️ Observed History",
+        "history_caption": "Temperature observed over the last {} days (°C)",
+        "history_empty": "History builds up each time this city is searched.",
+        "vs_last_week": "Now vs. a Week Ago",
+        "mode_selector": "Search Mode",
+        "single_mode": "🔍 Single City",
+        "compare_mode": "📊 Compare Cities",
+        "compare_label": "📍 Enter up to {} cities, one per line or separated by semicolons",
+        "compare_button": "Compare",
+        "compare_progress": "Fetched {} of {} cities",
+        "compare_empty": "Enter at least one city to compare.",
+        "city": "City",
+        "condition": "Condition",
+        "temperature": "Temperature",
+        "error": "Error",
+        "did_you_mean": "Did you mean:",
+        "api_budget": "API Budget",
+        "api_budget_detail": "{}: {:,} of {:,} calls left",
+        "quota_exhausted": "The weather service is busy right now (call budget used up). Please try again in a few minutes.",
+    },
+    "hindi": {
+        "title": "मौसम अब - स्मार्ट पूर्वानुमान",
+        "tagline": "दुनिया के किसी भी शहर के लिए वास्तविक समय का मौसम और **3-दिन का पूर्वानुमान** प्राप्त करें।",
+        "input_label": "📍 शहर का नाम दर्ज करें (उदाहरण: देहरादून, दिल्ली, लंदन)",
+        "input_placeholder": "शहर का नाम लिखें या सूची से चुनें",
+        "press_enter": "शहर का मौसम देखने के लिए सूची से कोई शहर चुनें, या नाम लिखकर उसे चुनें!",
+        "welcome": "स्वागत है! ऊपर शहर का नाम दर्ज करके शुरुआत करें।",
+        "welcome_detail": "इसके सौंदर्यपूर्ण मौसम पूर्वानुमान और प्रसिद्ध स्थल की झलक देखने के लिए एक शहर दर्ज करें।",
+        "weather": "मौसम",
+        "landmark_unavailable": "पहचान चिह्न की तस्वीर उपलब्ध नहीं है।",
+        "feels_like": "महसूस होता है",
+        "humidity": "आर्द्रता",
+        "wind_speed": "हवा की गति",
+        "pressure": "दबाव",
+        "severe_alert": "🚨 गंभीर मौसम चेतावनी! सावधानी बरतें।",
+        "forecast_header": "📅 3-दिन का पूर्वानुमान",
+        "forecast_error": "त्रुटि: 3-दिन का पूर्वानुमान प्राप्त नहीं किया जा सका। एपीआई कॉन्फ़िगरेशन या शहर का नाम जाँच करें।",
+        "city_not_found": "शहर '{}' नहीं मिला! कृपया पुनः प्रयास करें।",
+        "error_fetching": "मौसम डेटा प्राप्त करने में त्रुटि: {}",
+        "theme_selector": "इंटरफ़ेस थीम",
+        "language_selector": "भाषा चुनें",
+        "light_mode": "🌞 हल्का मोड",
+        "dark_mode": "🌙 गहरा मोड",
+        "max_temp": "अधिकतम तापमान",
+        "min_temp": "न्यूनतम तापमान",
+        "outlook_header": "📈 {}-दिन का विस्तृत पूर्वानुमान",
+        "outlook_temperature": "तापमान, ताप सूचकांक और ओसांक (°C)",
+        "outlook_comfort": "आराम स्कोर और {} घंटों के भीतर बारिश की संभावना (%)",
+        "date": "तारीख",
+        "dew_point": "ओसांक",
+        "heat_index": "ताप सूचकांक",
+        "max_heat_index": "अधिकतम ताप सूचकांक",
+        "comfort": "आराम",
+        "rain_risk": "बारिश का जोखिम",
+        "precipitation": "वर्षा (मिमी)",
+        "history_header": "🕰️ दर्ज मौसम इतिहास",
+        "history_caption": "पिछले {} दिनों में दर्ज तापमान (°C)",
+        "history_empty": "हर बार इस शहर को खोजने पर इतिहास बनता जाता है।",
+        "vs_last_week": "अभी बनाम एक सप्ताह पहले",
+        "mode_selector": "खोज मोड",
+        "single_mode": "🔍 एकल शहर",
+        "compare_mode": "📊 शहरों की तुलना",
+        "compare_label": "📍 अधिकतम {} शहर दर्ज करें, प्रति पंक्ति एक या अर्धविराम से अलग",
+        "compare_button": "तुलना करें",
+        "compare_progress": "{1} में से {0} शहरों का डेटा प्राप्त हुआ",
+        "compare_empty": "तुलना के लिए कम से कम एक शहर दर्ज करें।",
+        "city": "शहर",
+        "condition": "स्थिति",
+        "temperature": "तापमान",
+        "error": "त्रुटि",
+        "did_you_mean": "क्या आपका मतलब था:",
+        "api_budget": "एपीआई बजट",
+        "api_budget_detail": "{}: {:,} में से {:,} कॉल शेष",
+        "quota_exhausted": "मौसम सेवा अभी व्यस्त है (कॉल बजट समाप्त)। कृपया कुछ मिनट बाद पुनः प्रयास करें।",
+    }
+}
+
+# Theme colors, exposed to the stylesheet as CSS custom properties (--name)
+THEME_PALETTES = {
+    'light': {
+        "main-color": "#333333",
+        "text-color": "#333333",
+        "accent-color": "#6A5ACD",
+        "card-bg": "rgba(255, 255, 255, 0.7)",
+        "input-bg": "rgba(255, 255, 255, 0.4)",
+        "border-color": "rgba(255, 255, 255, 0.8)",
+        "metric-bg": "rgba(255, 255, 255, 0.4)",
+        "bg-brightness": "1.0",
+    },
+    'dark': {
+        "main-color": "#1e1e1e",
+        "text-color": "#f0f2f6",
+        "accent-color": "#4CAF50",
+        "card-bg": "rgba(0, 0, 0, 0.4)",
+        "input-bg": "rgba(50, 50, 50, 0.7)",
+        "border-color": "rgba(255, 255, 255, 0.2)",
+        "metric-bg": "rgba(50, 50, 50, 0.7)",
+        "bg-brightness": "0.6",
+    },
+}
+
+
+LANGUAGE_NAMES = {"english": "English", "hindi": "हिंदी (Hindi)"}
+
+
+def chart_spec(series, height, mark="line", y_domain=None):
+    """
+    Vega-Lite spec plotting each column named in ``series`` against a "time" column,
+    one color per column. Charting through a prebuilt spec skips the per-call
+    Altair chart construction of ``st.line_chart`` (about 30-130 ms per chart).
+    """
+    y = {"field": "value", "type": "quantitative", "title": None, "stack": None}
+    if y_domain is not None:
+        y["scale"] = {"domain": list(y_domain)}
+    return {
+        "height": height,
+        "transform": [{"fold": list(series), "as": ["series", "value"]}],
+        "mark": {"type": mark, "interpolate": "monotone", "opacity": 0.5 if mark == "area" else 1, "tooltip": True},
+        "encoding": {
+            "x": {"field": "time", "type": "temporal", "title": None},
+            "y": y,
+            # Empty rather than null titles: Streamlit patches null legend titles in place
+            "color": {"field": "series", "type": "nominal", "sort": list(series),
+                      "legend": {"orient": "bottom", "title": ""}},
+        },
+    }
+
+
+class UiTable:
+    """Everything a rerun renders for one (language, theme), resolved once per process."""
+
+    def __init__(self, language, theme):
+        self.language = language
+        self.theme = theme
+        self.strings = {**TRANSLATIONS["english"], **TRANSLATIONS.get(language, {})}
+        self.text = self.strings.__getitem__  # T = ui.text; T("key")
+        self.palette = THEME_PALETTES.get(theme, THEME_PALETTES["light"])
+        self.theme_variables = "".join(f"--{name}: {value}; " for name, value in self.palette.items())
+        self.theme_options = (self.strings["light_mode"], self.strings["dark_mode"])
+        self.mode_options = (self.strings["single_mode"], self.strings["compare_mode"])
+
+        # Chart columns are named by their translated labels, so the legend needs no lookup
+        T = self.text
+        self.chart_series = {
+            "outlook_temperature": (T("temperature"), T("heat_index"), T("dew_point")),
+            "outlook_comfort": (T("comfort"), T("rain_risk")),
+            "history": (T("temperature"), T("feels_like")),
+        }
+        self.charts = {
+            "outlook_temperature": chart_spec(self.chart_series["outlook_temperature"], 260),
+            "outlook_comfort": chart_spec(self.chart_series["outlook_comfort"], 220, mark="area", y_domain=(0, 100)),
+            "history": chart_spec(self.chart_series["history"], 220),
+        }
+
+
+class AppContext:
+    """Process-wide lookup tables over the content above; ``table()`` memoizes one UiTable per (language, theme)."""
+
+    def __init__(self):
+        self._tables = {}
+        self._lock = threading.Lock()
+        # Radio labels of every language -> internal value, for the widgets' callbacks
+        self.theme_by_label = {}
+        self.mode_by_label = {}
+        for strings in TRANSLATIONS.values():
+            self.theme_by_label.update({strings["light_mode"]: "light", strings["dark_mode"]: "dark"})
+            self.mode_by_label.update({strings["single_mode"]: "single", strings["compare_mode"]: "compare"})
+
+    def table(self, language, theme):
+        table = self._tables.get((language, theme))
+        if table is None:
+            with self._lock:
+                table = self._tables.setdefault((language, theme), UiTable(language, theme))
+        return table
@@ -0,0 +1,273 @@
+"""Headless WeatherAPI access: URL configuration, cached fetching and payload parsing.
+
+Nothing in here touches Streamlit, so the same code path serves the app, the
+comparison view and the batch CLI.
+"""
+import os
+from collections import namedtuple
+from datetime import date
+
+import requests
+
+from weather_now.cache import normalize_city
+from weather_now.conditions import classify
+from weather_now.gazetteer import place_query
+from weather_now.ratelimit import QuotaExceededError
+
+# Overridable so benchmarks and local development can point at ``bench/stub_server.py``
+WEATHERAPI_BASE_URL = os.environ.get("WEATHERAPI_BASE_URL", "http://api.weatherapi.com/v1").rstrip("/")
+WEATHERAPI_CURRENT_URL = f"{WEATHERAPI_BASE_URL}/current.json"
+WEATHERAPI_FORECAST_URL = f"{WEATHERAPI_BASE_URL}/forecast.json"
+UNSPLASH_API_URL = os.environ.get("UNSPLASH_API_URL", "https://api.unsplash.com/search/photos")
+
+# WeatherAPI error code for "No matching location found."
+UNKNOWN_LOCATION_CODE = 1006
+NOT_FOUND_PAYLOAD = {"error": {"code": UNKNOWN_LOCATION_CODE, "message": "No matching location found."}}
+
+
+class WeatherService:
+    """Fetches current and forecast payloads for a city through a shared cache and HTTP client.
+
+    With a ``gazetteer``, names are resolved to canonical coordinates before any
+    request. Names WeatherAPI does not know are remembered in the cache's
+    ``"not_found"`` namespace and answered locally from then on. When the call
+    budget is exhausted, the last cached payload is served regardless of its age.
+    With a ``history`` store, every payload handed out is also offered to it; the
+    store keeps only observations newer than the ones it already has.
+    With a ``batcher`` (a ``batching.BulkDispatcher``), concurrent lookups of
+    different cities may share one bulk request upstream.
+    """
+
+    def __init__(self, api_key, http, cache=None, fetch_mode="combined", forecast_days=3, gazetteer=None,
+                 current_url=WEATHERAPI_CURRENT_URL, forecast_url=WEATHERAPI_FORECAST_URL, history=None,
+                 batcher=None):
+        self.api_key = api_key
+        self.http = http
+        self.cache = cache
+        self.fetch_mode = fetch_mode
+        self.forecast_days = forecast_days
+        self.gazetteer = gazetteer
+        self.current_url = current_url
+        self.forecast_url = forecast_url
+        self.history = history
+        self.batcher = batcher
+
+    def resolve(self, city):
+        """Returns (query, cache_key, place) for free-text input; place is None if not bundled."""
+        place = self.gazetteer.resolve(city) if self.gazetteer is not None else None
+        if place is not None:
+            query = place_query(place)
+            return query, query, place
+        return city.strip(), normalize_city(city), None
+
+    def fetch_payloads(self, city):
+        """
+        Returns (current_data, forecast_data) for a city. In "combined" mode a single
+        forecast.json call supplies both payloads. If WeatherAPI reports an error, its
+        payload is returned as current_data with forecast_data set to None.
+        Safe to call from worker threads.
+        """
+        query, city_key, _ = self.resolve(city)
+        current_data, forecast_data = self._guarded(city_key, lambda: self._fetch(query, city_key))
+        self._record(city_key, current_data, forecast_data)
+        return current_data, forecast_data
+
+    def fetch_current(self, city):
+        """
+        Returns only the current_data payload, from current.json or a fresh cached forecast.
+        Used to paint current conditions before the (larger) forecast has arrived.
+        """
+        query, city_key, _ = self.resolve(city)
+        forecast_data = self.cache.get("forecast", city_key) if self.cache is not None else None
+        if forecast_data is not None and 'error' not in forecast_data:
+            return {"location": forecast_data.get("location"), "current": forecast_data["current"]}
+        params = {"key": self.api_key, "q": query, "aqi": "no"}
+
+        def fetch():
+            return self._cached("current", city_key, lambda: self._get(self.current_url, params)), None
+
+        current_data = self._guarded(city_key, fetch)[0]
+        self._record(city_key, current_data, None)
+        return current_data
+
+    def fetch_forecast(self, city):
+        """Returns only the forecast_data payload (None if WeatherAPI does not know the city)."""
+        query, city_key, _ = self.resolve(city)
+        params = {"key": self.api_key, "q": query, "days": self.forecast_days}
+
+        def fetch():
+            return None, self._cached("forecast", city_key, lambda: self._get(self.forecast_url, params))
+
+        not_found, forecast_data = self._guarded(city_key, fetch)
+        if not_found is not None or 'error' in forecast_data:
+            return None
+        # forecast.json carries a 'current' block too
+        self._record(city_key, forecast_data, forecast_data)
+        return forecast_data
+
+    def refresh(self, city):
+        """Re-fetches a city's payloads from upstream even if cached copies are still fresh."""
+        query, city_key, _ = self.resolve(city)
+        current_data, forecast_data = self._fetch(query, city_key, force=True)
+        self._record(city_key, current_data, forecast_data)
+        return current_data, forecast_data
+
+    @property
+    def calls_per_fetch(self):
+        """Upstream requests one uncached city costs in the current fetch mode."""
+        return 1 if self.fetch_mode == "combined" else 2
+
+    @property
+    def cached_namespaces(self):
+        """Cache namespaces a search is served from in the current fetch mode."""
+        return ("forecast",) if self.fetch_mode == "combined" else ("current", "forecast")
+
+    def _guarded(self, city_key, fetch):
+        """Runs ``fetch() -> (current, forecast)``, answering and recording unknown cities locally."""
+        if self.cache is not None and self.cache.get("not_found", city_key):
+            return NOT_FOUND_PAYLOAD, None
+        try:
+            current_data, forecast_data = fetch()
+        except requests.exceptions.HTTPError as e:
+            if not _is_unknown_location(e.response):
+                raise
+            current_data, forecast_data = NOT_FOUND_PAYLOAD, None
+        if current_data is not None and 'error' in current_data and self.cache is not None:
+            self.cache.set("not_found", city_key, True)
+        return current_data, forecast_data
+
+    def _record(self, city_key, current_data, forecast_data):
+        if self.history is not None and current_data is not None and 'error' not in current_data:
+            self.history.record(city_key, current_data, forecast_data)
+
+    def _get(self, url, params):
+        if self.batcher is not None:
+            return self.batcher.get_json(url, params)
+        return self.http.get_json(url, params=params)
+
+    def _fetch(self, query, city_key, force=False):
+        current_params = {"key": self.api_key, "q": query, "aqi": "no"}
+        forecast_params = {"key": self.api_key, "q": query, "days": self.forecast_days}
+
+        def fetch_forecast():
+            return self._get(self.forecast_url, forecast_params)
+
+        if self.fetch_mode == "combined":
+            # One forecast.json round trip carries both the 'current' and 'forecast' blocks
+            forecast_data = self._cached("forecast", city_key, fetch_forecast, force)
+            if 'error' in forecast_data:
+                return forecast_data, None
+            # No separate "current" entry: fetch_current reads the cached forecast too
+            return {"location": forecast_data.get("location"), "current": forecast_data["current"]}, forecast_data
+
+        current_data = self._cached(
+            "current", city_key, lambda: self._get(self.current_url, current_params), force
+        )
+        if 'error' in current_data:
+            return current_data, None
+        forecast_data = self._cached("forecast", city_key, fetch_forecast, force)
+        return current_data, forecast_data
+
+    def _cached(self, namespace, city_key, fetch, force=False):
+        if self.cache is None:
+            return fetch()
+        try:
+            if force:
+                return self.cache.refresh(namespace, city_key, fetch)
+            return self.cache.get_or_fetch(namespace, city_key, fetch)
+        except QuotaExceededError:
+            value = None if force else self.cache.last_known(namespace, city_key)
+            if value is None:
+                raise
+            return value
+
+
+def _is_unknown_location(response):
+    try:
+        return response.json()['error']['code'] == UNKNOWN_LOCATION_CODE
+    except (ValueError, KeyError, TypeError):
+        return False
+
+
+def parse_current_conditions(current_res):
+    """Extracts the display values shown for a city from a current.json-style payload."""
+    current = current_res['current']
+    return {
+        "temp": current['temp_c'],
+        "feels_like": current['feelslike_c'],
+        "humidity": current['humidity'],
+        "wind_speed": current['wind_kph'] * 1000 / 3600, # Convert kph to m/s
+        "pressure": current['pressure_mb'] * 1.0, # Convert mb to hPa (1mb = 1hPa)
+        "condition_description": current['condition']['text'].title(),
+        "condition_code": current['condition'].get('code'),
+        "severe": classify(current['condition']).severe,
+    }
+
+
+# Compact per-session view of a search: only what render_weather_results reads.
+# Raw payloads (72 hourly rows, astro data, ...) stay in the shared cache instead
+# of being copied into every session's state.
+ForecastDay = namedtuple("ForecastDay", ["date", "max_temp", "min_temp", "condition", "icon"])
+WeatherView = namedtuple("WeatherView", [
+    "temp", "feels_like", "humidity", "wind_speed", "pressure", "condition_description", "severe", "forecast",
+])
+
+
+def build_weather_view(current_data, forecast_data):
+    """Parses payloads into a WeatherView; ``forecast`` is None when the forecast block is missing."""
+    conditions = parse_current_conditions(current_data)
+    forecast = None
+    if forecast_data and 'forecastday' in forecast_data.get('forecast', {}):
+        forecast = tuple(
+            ForecastDay(
+                date.fromisoformat(day['date']),
+                day['day']['maxtemp_c'],
+                day['day']['mintemp_c'],
+                day['day']['condition']['text'].title(),
+                classify(day['day']['condition']).icon,
+            )
+            for day in forecast_data['forecast']['forecastday']
+        )
+    return WeatherView(
+        conditions['temp'],
+        conditions['feels_like'],
+        conditions['humidity'],
+        conditions['wind_speed'],
+        conditions['pressure'],
+        conditions['condition_description'],
+        conditions['severe'],
+        forecast,
+    )
+
+
+def build_weather_record(query, current_data, forecast_data):
+    """Flattens one city's payloads into a stable, JSON-serialisable record."""
+    conditions = parse_current_conditions(current_data)
+    location = current_data.get('location') or {}
+    forecast_days = ((forecast_data or {}).get('forecast') or {}).get('forecastday') or []
+    return {
+        "query": query,
+        "city": location.get('name'),
+        "region": location.get('region'),
+        "country": location.get('country'),
+        "lat": location.get('lat'),
+        "lon": location.get('lon'),
+        "localtime": location.get('localtime'),
+        "condition": conditions['condition_description'],
+        "condition_code": conditions['condition_code'],
+        "severe": conditions['severe'],
+        "temp_c": conditions['temp'],
+        "feels_like_c": conditions['feels_like'],
+        "humidity": conditions['humidity'],
+        "wind_ms": round(conditions['wind_speed'], 2),
+        "pressure_hpa": conditions['pressure'],
+        "forecast": [
+            {
+                "date": day['date'],
+                "max_temp_c": day['day']['maxtemp_c'],
+                "min_temp_c": day['day']['mintemp_c'],
+                "condition": day['day']['condition']['text'],
+            }
+            for day in forecast_days
+        ],
+    }